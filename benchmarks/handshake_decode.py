@@ -0,0 +1,62 @@
+"""Compares handshake message decoding with the former PyFunctional path.
+
+Usage:
+    PYTHONPATH=. python benchmarks/handshake_decode.py
+"""
+
+from functools import partial
+from operator import add
+import timeit
+
+from functional import seq
+
+from quic.handshake import read_packet, decode_handshake_message, \
+    decode_tag_values, tag_at, tag_value_at, int32_little_endian
+
+
+ROUNDS = 10000
+
+
+def seq_tag_positions(tag_count: int):
+    return seq(range(0, tag_count)).map(lambda tag_nr: 8 + tag_nr * 8)
+
+
+def seq_decode_tags(raw_data: bytes) -> dict:
+    """Tag decoding as it used to be done by decode_handshake_message()."""
+    tag_count = (raw_data[5] << 8) | raw_data[4]
+    values_offset = 8 + tag_count * 8
+
+    value_positions = seq(values_offset) + seq_tag_positions(tag_count)\
+        .map(lambda pos: int32_little_endian(pos + 4, raw_data))\
+        .map(partial(add, values_offset))
+
+    return seq_tag_positions(tag_count)\
+        .map(partial(tag_at, data=raw_data))\
+        .zip(value_positions\
+            .zip(value_positions.drop(1))\
+            .map(partial(tag_value_at, data=raw_data))
+        )\
+        .dict()
+
+
+def report(name: str, seconds: float) -> None:
+    per_call = seconds / ROUNDS
+    print('{:<28} {:>8.2f} us/message {:>10.0f} messages/s'.format(
+        name, per_call * 1e6, 1 / per_call))
+
+
+def main() -> None:
+    message = read_packet('tests/integration/fixtures/chlo.raw')[30:]
+    assert seq_decode_tags(message) == decode_handshake_message(message).tags
+
+    report('PyFunctional pipeline',
+        timeit.timeit(lambda: seq_decode_tags(message), number=ROUNDS))
+    report('decode_tag_values',
+        timeit.timeit(lambda: decode_tag_values(message), number=ROUNDS))
+    report('decode_handshake_message',
+        timeit.timeit(lambda: decode_handshake_message(message),
+            number=ROUNDS))
+
+
+if __name__ == '__main__':
+    main()
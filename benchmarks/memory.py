@@ -0,0 +1,91 @@
+"""Measures memory taken by packet header and handshake message objects.
+
+Compares the current slot based classes against their former __dict__
+based layout.
+
+Usage:
+    PYTHONPATH=. python benchmarks/memory.py
+"""
+
+import collections
+import tracemalloc
+from typing import Callable
+
+from quic.packet import PublicHeader, StreamFrameHeader
+from quic.handshake import Message
+
+
+INSTANCES = 100000
+
+
+class DictPublicHeader:
+    def __init__(self):
+        self.public_flags = 0x0d
+        self.connection_id = b''
+        self.protocol_version = b'Q034'
+        self.diversification_nonces = []
+        self.packet_number = 0
+
+
+class DictStreamFrameHeader:
+    id = 0
+    finish = False
+    has_data_length = False
+    data_length = 0
+    offset_length = 0
+    id_length = 0
+
+
+class DictMessage:
+    tag = None
+    tags = collections.OrderedDict()
+
+
+def bytes_per_instance(factory: Callable[[], object]) -> float:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory() for _ in range(INSTANCES)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    # Exclude the list holding the objects.
+    allocated -= objects.__sizeof__()
+    return allocated / INSTANCES
+
+
+def new_stream_frame_header() -> object:
+    header = DictStreamFrameHeader()
+    header.id = 1
+    header.has_data_length = True
+    header.data_length = 1300
+    header.id_length = 1
+    return header
+
+
+def new_dict_message() -> object:
+    msg = DictMessage()
+    msg.tag = b'CHLO'
+    msg.tags = {}
+    return msg
+
+
+def main() -> None:
+    cases = [
+        ('PublicHeader', DictPublicHeader,
+            lambda: PublicHeader(connection_id=b'')),
+        ('StreamFrameHeader', new_stream_frame_header,
+            lambda: StreamFrameHeader(id=1, has_data_length=True,
+                data_length=1300, id_length=1)),
+        ('Message', new_dict_message,
+            lambda: Message(b'CHLO', {})),
+    ]
+
+    print('{:<20} {:>10} {:>10}'.format('class', 'before', 'after'))
+    for name, before, after in cases:
+        print('{:<20} {:>8.0f} B {:>8.0f} B'.format(name,
+            bytes_per_instance(before), bytes_per_instance(after)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Compares packet hashing with PacketHasher against fnv.hash().
+
+Usage:
+    PYTHONPATH=. python benchmarks/packet_hash.py
+"""
+
+import timeit
+
+import fnv
+
+from quic.handshake import read_packet
+from quic.packet import Parser, bytes_excluded, hash_packet, verify_many, \
+    PACKET_HASH_SIZE
+
+
+ROUNDS = 200
+
+
+def fnv_packet_hash(data: bytes, hash_offset: int) -> int:
+    """Packet hash as it used to be calculated."""
+    without_hash = bytes_excluded(data, hash_offset, PACKET_HASH_SIZE)
+    return fnv.ensure_bits_count(fnv.hash(without_hash), PACKET_HASH_SIZE * 8)
+
+
+def report(name: str, seconds: float, packets: int) -> None:
+    per_packet = seconds / packets
+    print('{:<24} {:>10.1f} us/packet {:>10.0f} packets/s'.format(
+        name, per_packet * 1e6, 1 / per_packet))
+
+
+def main() -> None:
+    packet = read_packet('tests/integration/fixtures/chlo_q034.raw')
+    parser = Parser(packet)
+    parser.parse_public_header()
+    parser.parse_packet_hash()
+    hash_offset = parser.packet_hash_offset
+
+    assert fnv_packet_hash(packet, hash_offset) \
+        == hash_packet(packet, hash_offset)
+
+    report('fnv.hash',
+        timeit.timeit(lambda: fnv_packet_hash(packet, hash_offset),
+            number=ROUNDS), ROUNDS)
+    report('hash_packet',
+        timeit.timeit(lambda: hash_packet(packet, hash_offset),
+            number=ROUNDS), ROUNDS)
+
+    packets = [packet] * ROUNDS
+    report('verify_many', timeit.timeit(lambda: verify_many(packets),
+        number=1), ROUNDS)
+
+
+if __name__ == '__main__':
+    main()
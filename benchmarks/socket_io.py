@@ -0,0 +1,120 @@
+"""Loopback throughput of batched socket I/O against naive loops.
+
+Receive benchmarks run a sender process flooding the receiver for a fixed
+time and count datagrams received per second. Send benchmarks count how
+many datagrams per second the sending side pushes out.
+
+Usage:
+    PYTHONPATH=. python benchmarks/socket_io.py
+"""
+
+import multiprocessing
+import select
+import socket
+import time
+from typing import Callable
+
+from quic import chlo
+from quic.sockio import ReceiveRing, SendBatcher
+
+
+DURATION = 2.0 # seconds
+BATCH = 32
+
+
+def flood(address, stop: multiprocessing.Event) -> None:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    batcher = SendBatcher(sock)
+    packet = chlo.make_message()
+    while not stop.is_set():
+        for _ in range(BATCH):
+            batcher.send(packet, address)
+        batcher.flush()
+
+
+def naive_receive(sock: socket.socket, deadline: float) -> int:
+    received = 0
+    sock.settimeout(0.1)
+    while time.monotonic() < deadline:
+        try:
+            sock.recvfrom(2048)
+        except socket.timeout:
+            continue
+        received += 1
+    return received
+
+
+def ring_receive(sock: socket.socket, deadline: float) -> int:
+    received = 0
+    sock.setblocking(False)
+    ring = ReceiveRing(sock, slots=BATCH * 2)
+    while time.monotonic() < deadline:
+        select.select([sock], [], [], 0.1)
+        received += len(ring.receive(BATCH))
+    return received
+
+
+def bench_receive(receive: Callable[[socket.socket, float], int]) -> float:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind(('127.0.0.1', 0))
+
+    stop = multiprocessing.Event()
+    sender = multiprocessing.Process(target=flood,
+        args=(sock.getsockname(), stop))
+    sender.start()
+    try:
+        start = time.monotonic()
+        received = receive(sock, start + DURATION)
+        elapsed = time.monotonic() - start
+    finally:
+        stop.set()
+        sender.join()
+        sock.close()
+    return received / elapsed
+
+
+def bench_send(use_batcher: bool) -> float:
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    address = receiver.getsockname()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    batcher = SendBatcher(sock)
+    packet = chlo.make_message()
+
+    sent = 0
+    start = time.monotonic()
+    deadline = start + DURATION
+    while time.monotonic() < deadline:
+        if use_batcher:
+            for _ in range(BATCH):
+                batcher.send(packet, address)
+            sent += batcher.flush()
+        else:
+            for _ in range(BATCH):
+                try:
+                    sock.sendto(packet, address)
+                    sent += 1
+                except BlockingIOError:
+                    pass
+    elapsed = time.monotonic() - start
+
+    sock.close()
+    receiver.close()
+    return sent / elapsed
+
+
+def main() -> None:
+    print('{:<28} {:>12.0f} packets/s'.format('receive: recvfrom loop',
+        bench_receive(naive_receive)))
+    print('{:<28} {:>12.0f} packets/s'.format('receive: ReceiveRing',
+        bench_receive(ring_receive)))
+    print('{:<28} {:>12.0f} packets/s'.format('send: sendto loop',
+        bench_send(use_batcher=False)))
+    print('{:<28} {:>12.0f} packets/s'.format('send: SendBatcher',
+        bench_send(use_batcher=True)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Benchmark suite of packet parsing, hashing and serialization hot paths.
+
+Every benchmark reports operations per second, memory blocks per call
+still referenced once the call returns (i.e. the result objects, not every
+allocation) and peak memory taken by a single call.
+
+Throughput is compared against a stored baseline relative to a fixed pure
+Python calibration loop timed in the same run, so baselines recorded on
+one machine are meaningful on another. With --check the suite exits with
+status 1 when any benchmark slows down by more than the tolerance.
+
+Usage:
+    PYTHONPATH=. python benchmarks/suite.py [--save-baseline] [--check]
+        [--baseline benchmarks/baseline.json] [--tolerance 0.3]
+        [--filter hash]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from quic import chlo, handshake, packet, tags
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'tests',
+    'integration', 'fixtures', 'chlo.raw')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Offsets in the fixture packet.
+FRAME_OFFSET = 26
+MESSAGE_OFFSET = 30
+
+REPEATS = 5
+RETENTION_CALLS = 1000
+# Baseline entry holding calibration loop throughput.
+CALIBRATION = '_calibration'
+
+Benchmark = Callable[[], object]
+
+
+def _benchmarks(data: bytes) -> List[Tuple[str, Benchmark]]:
+    """Creates benchmarked operations over the fixture packet."""
+    def parse_public_header():
+        return packet.Parser(data).parse_public_header()
+
+    stream_parser = packet.Parser(data)
+    stream_parser.parse_public_header()
+    stream_parser.parse_packet_hash()
+
+    def parse_stream_frame_header():
+        stream_parser.data_offset = FRAME_OFFSET
+        return stream_parser.parse_stream_frame_header()
+
+    def calc_packet_hash():
+        return stream_parser.calc_packet_hash()
+
+    raw_message = data[MESSAGE_OFFSET:]
+
+    def decode_handshake_message():
+        return handshake.decode_handshake_message(raw_message)
+
+    tag_values = handshake.decode_handshake_message(raw_message).tags
+    message = handshake.Message(b'CHLO', tags.Container(tag_values))
+
+    def message_to_bytes():
+        return message.to_bytes()
+
+    tag_items = list(tag_values.items())
+
+    def container_operations():
+        container = tags.Container()
+        for tag, value in tag_items:
+            container[tag] = value
+        for tag, _ in tag_items:
+            container[tag]
+        return container.items()
+
+    return [
+        ('parse_public_header', parse_public_header),
+        ('parse_stream_frame_header', parse_stream_frame_header),
+        ('calc_packet_hash', calc_packet_hash),
+        ('decode_handshake_message', decode_handshake_message),
+        ('message_to_bytes', message_to_bytes),
+        ('container_operations', container_operations),
+        ('make_message', chlo.make_message),
+    ]
+
+
+def _calibration() -> int:
+    """Fixed interpreter workload benchmarks are measured relative to."""
+    total = 0
+    for i in range(100):
+        total += i * i
+    return total
+
+
+def ops_per_second(benchmark: Benchmark) -> float:
+    """Best throughput out of several timing runs."""
+    timer = timeit.Timer(benchmark)
+    number, _ = timer.autorange()
+    return number / min(timer.repeat(REPEATS, number))
+
+
+def retained_blocks_per_call(benchmark: Benchmark) -> float:
+    """Counts memory blocks per call still referenced after it returns.
+
+    Call results are kept alive, so objects built by the call are counted,
+    while temporaries freed before the call returns are not. It's a measure
+    of what calls leave behind, not of how many allocations they make.
+    """
+    results = [None] * RETENTION_CALLS
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i in range(RETENTION_CALLS):
+        results[i] = benchmark()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before,
+        'filename') if stat.count_diff > 0)
+    return blocks / RETENTION_CALLS
+
+
+def peak_memory(benchmark: Benchmark) -> int:
+    """Measures peak bytes allocated by a single call."""
+    benchmark()
+    tracemalloc.start()
+    benchmark()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run(name_filter: str='') -> Dict[str, Dict[str, float]]:
+    with open(FIXTURE, 'rb') as f:
+        data = f.read()
+
+    results = {CALIBRATION: {'ops_per_second': round(
+        ops_per_second(_calibration))}}
+    for name, benchmark in _benchmarks(data):
+        if name_filter not in name:
+            continue
+        results[name] = {
+            'ops_per_second': round(ops_per_second(benchmark)),
+            'retained_blocks_per_call': round(
+                retained_blocks_per_call(benchmark), 2),
+            'peak_memory': peak_memory(benchmark),
+        }
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]],
+        baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Prints results next to baseline.
+
+    Change is the difference of throughputs relative to the calibration
+    loop of the respective run, so it doesn't depend on machine speed.
+
+    Returns:
+        names of benchmarks which slowed down more than tolerance allows.
+    """
+    print('{:28} {:>14} {:>10} {:>12} {:>10}'.format('benchmark', 'ops/s',
+        'change', 'kept/call', 'peak B'))
+    speedup = 1.0
+    if CALIBRATION in baseline:
+        speedup = results[CALIBRATION]['ops_per_second'] \
+            / baseline[CALIBRATION]['ops_per_second']
+
+    regressions = []
+    for name, result in results.items():
+        if name == CALIBRATION:
+            continue
+        change = ''
+        base = baseline.get(name)
+        if base:
+            ratio = result['ops_per_second'] \
+                / (base['ops_per_second'] * speedup) - 1
+            change = '{:+.1%}'.format(ratio)
+            if ratio < -tolerance:
+                regressions.append(name)
+                change += ' !'
+        print('{:28} {:14.0f} {:>10} {:12.1f} {:10d}'.format(name,
+            result['ops_per_second'], change,
+            result['retained_blocks_per_call'], result['peak_memory']))
+    return regressions
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    arg_parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    arg_parser.add_argument('--save-baseline', action='store_true',
+        help='store results as the new baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.3,
+        help='allowed relative ops/s drop, 0.3 by default')
+    arg_parser.add_argument('--check', action='store_true',
+        help='exit with status 1 when a benchmark regressed')
+    arg_parser.add_argument('--filter', default='',
+        help='run only benchmarks whose name contains this string')
+    args = arg_parser.parse_args()
+
+    results = run(args.filter)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    elif regressions:
+        print('Regressed: {}'.format(', '.join(regressions)))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Received packet tracking and ACK frame generation.
+
+Received packet numbers are kept as sorted, non-adjacent ranges, so memory
+depends on how many holes there are rather than on how many packets were
+received. The number of ranges is capped: under heavy loss the oldest
+ranges are forgotten, which only makes peer retransmit packets it could
+have considered acknowledged.
+
+Ranges are found with bisect, but a new range is inserted into plain lists,
+which costs O(max_ranges) element moves. With the range cap in the low
+hundreds that's a short memmove, and packets arriving in order, which is
+the common case, extend the last range in O(1).
+"""
+
+from bisect import bisect_right
+import time
+from typing import Callable, List, Tuple
+
+from quic.frames import encode_ufloat16
+from quic.packet import FRAME_FLAG_ACK
+
+
+# ACK frame type byte flags.
+FRAME_FLAG_ACK_MULTIPLE_BLOCKS = 0x20
+
+MAX_ACK_BLOCKS = 255
+# Longest gap a single ACK block can express.
+_MAX_GAP = 255
+
+# Largest acked and ACK block length field sizes and their 2 bit codes.
+_FIELD_LENGTH_CODES = ((1, 0), (2, 1), (4, 2), (6, 3))
+
+
+class ReceivedPackets:
+    """Set of received packet numbers of a connection."""
+
+    def __init__(self, max_ranges: int=256,
+            clock: Callable[[], float]=time.monotonic) -> None:
+        """
+        Args:
+            max_ranges: maximum number of packet number ranges kept. The
+                lowest ranges are dropped when exceeded.
+            clock: returns current time in seconds, used for ACK delay.
+        """
+        self.max_ranges = max_ranges
+        self.clock = clock
+        # Inclusive range bounds in ascending order. Ranges never touch:
+        # _starts[i + 1] > _ends[i] + 1.
+        self._starts = [] # type: List[int]
+        self._ends = [] # type: List[int]
+        self.largest_received_at = None # type: float
+
+    def add(self, packet_number: int) -> bool:
+        """Records received packet number.
+
+        Packets extending the highest range take O(1), others O(log n)
+        lookup plus O(n) insert or merge, where n <= max_ranges.
+
+        Returns:
+            False if packet was already received, e.g. it's a duplicate.
+        """
+        starts = self._starts
+        ends = self._ends
+        if ends and ends[-1] == packet_number - 1:
+            ends[-1] = packet_number
+            self.largest_received_at = self.clock()
+            return True
+
+        i = bisect_right(starts, packet_number) - 1
+        if i >= 0 and ends[i] >= packet_number:
+            return False
+
+        if not ends or packet_number > ends[-1]:
+            self.largest_received_at = self.clock()
+
+        joins_left = i >= 0 and ends[i] == packet_number - 1
+        joins_right = i + 1 < len(starts) \
+            and starts[i + 1] == packet_number + 1
+        if joins_left and joins_right:
+            ends[i] = ends[i + 1]
+            del starts[i + 1]
+            del ends[i + 1]
+        elif joins_left:
+            ends[i] = packet_number
+        elif joins_right:
+            starts[i + 1] = packet_number
+        else:
+            starts.insert(i + 1, packet_number)
+            ends.insert(i + 1, packet_number)
+            if len(starts) > self.max_ranges:
+                del starts[0]
+                del ends[0]
+        return True
+
+    def remove_below(self, packet_number: int) -> None:
+        """Forgets packet numbers below the given one.
+
+        Used when peer stops waiting for acknowledgements of older packets.
+        """
+        starts = self._starts
+        ends = self._ends
+        i = bisect_right(ends, packet_number - 1)
+        del starts[:i]
+        del ends[:i]
+        if starts and starts[0] < packet_number:
+            starts[0] = packet_number
+
+    @property
+    def largest(self) -> int:
+        """
+        Returns:
+            largest received packet number or None if nothing was received.
+        """
+        return self._ends[-1] if self._ends else None
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """
+        Returns:
+            inclusive (smallest, largest) ranges of received packet numbers
+            in descending order, like frames.AckFrame.acked_ranges().
+        """
+        return list(zip(reversed(self._starts), reversed(self._ends)))
+
+    def __contains__(self, packet_number: int) -> bool:
+        i = bisect_right(self._starts, packet_number) - 1
+        return i >= 0 and self._ends[i] >= packet_number
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            number of packet number ranges.
+        """
+        return len(self._starts)
+
+    def ack_frame(self, max_blocks: int=MAX_ACK_BLOCKS) -> bytes:
+        """Serializes ACK frame acknowledging the received packets.
+
+        Gaps longer than a single ACK block can express are bridged with
+        empty blocks. Ranges which don't fit into max_blocks are left out,
+        starting with the lowest ones.
+
+        Returns:
+            ACK frame without timestamps.
+
+        Raises:
+            ValueError: if no packets were received.
+        """
+        if not self._ends:
+            raise ValueError('No packets were received to acknowledge.')
+
+        largest = self._ends[-1]
+        first_block = largest - self._starts[-1] + 1
+        blocks = [] # type: List[Tuple[int, int]]
+        for i in range(len(self._starts) - 2, -1, -1):
+            gap = self._starts[i + 1] - self._ends[i] - 1
+            bridges = (gap - 1) // _MAX_GAP
+            if len(blocks) + bridges + 1 > max_blocks:
+                break
+            for _ in range(bridges):
+                blocks.append((_MAX_GAP, 0))
+            blocks.append((gap - bridges * _MAX_GAP,
+                self._ends[i] - self._starts[i] + 1))
+
+        largest_length, largest_code = _field_length(largest)
+        block_length, block_code = _field_length(max(
+            [first_block] + [length for _, length in blocks]))
+
+        frame_type = FRAME_FLAG_ACK | (largest_code << 2) | block_code
+        if blocks:
+            frame_type |= FRAME_FLAG_ACK_MULTIPLE_BLOCKS
+
+        ack_delay = 0
+        if self.largest_received_at is not None:
+            ack_delay = int((self.clock() - self.largest_received_at) * 1e6)
+
+        frame = bytearray([frame_type])
+        frame += largest.to_bytes(largest_length, 'little')
+        frame += encode_ufloat16(max(ack_delay, 0)).to_bytes(2, 'little')
+        if blocks:
+            frame.append(len(blocks))
+        frame += first_block.to_bytes(block_length, 'little')
+        for gap, length in blocks:
+            frame.append(gap)
+            frame += length.to_bytes(block_length, 'little')
+        # No timestamps.
+        frame.append(0)
+        return bytes(frame)
+
+
+def _field_length(value: int) -> Tuple[int, int]:
+    """Picks the shortest ACK frame field which fits the value.
+
+    Returns:
+        field length in bytes and its 2 bit code.
+    """
+    for length, code in _FIELD_LENGTH_CODES:
+        if value < 1 << 8 * length:
+            return length, code
+    raise ValueError('{} does not fit into 6 bytes.'.format(value))
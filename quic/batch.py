@@ -0,0 +1,139 @@
+"""Batch public header decoding.
+
+Decodes public headers of many datagrams at once into columnar arrays, so
+that load balancer style routing pays Python call overhead once per batch
+rather than once per packet.
+"""
+
+from array import array
+import struct
+from typing import Sequence, Tuple
+
+from quic.packet import PUBLIC_FLAG_VERSION, PUBLIC_FLAG_RESET, \
+    PUBLIC_FLAG_CONNECTION_ID_8_BYTES, PUBLIC_FLAG_DIVERSIFICATION_NONCE, \
+    DIVERSIFICATION_NONCE_SIZE
+
+
+_PACKET_NUMBER_FORMATS = ('B', 'H', 'I', 'IH')
+
+
+class PublicHeaders:
+    """Struct of arrays holding public headers of a datagram batch.
+
+    Every column is an array.array, so it can be wrapped by NumPy without
+    copying, e.g. numpy.frombuffer(headers.connection_ids, dtype='<u8').
+    Fields which are absent from a packet are set to 0. Packets too short
+    to hold the header their flags announce have valid set to 0.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.public_flags = array('B', bytes(size))
+        self.connection_ids = array('Q', bytes(8 * size))
+        self.protocol_versions = array('I', bytes(4 * size))
+        self.packet_numbers = array('Q', bytes(8 * size))
+        self.valid = array('B', bytes(size))
+
+    def __len__(self) -> int:
+        return len(self.public_flags)
+
+
+class _HeaderLayout:
+    """Precomputed header decoding info for a single public flags value."""
+
+    def __init__(self, public_flags: int) -> None:
+        fmt = '<B'
+        # Number of unpacked fields so far, padding bytes are not unpacked.
+        fields = 1
+        self.connection_id_index = None
+        self.version_index = None
+        self.packet_number_indexes = () # type: Tuple[int, ...]
+
+        if public_flags & PUBLIC_FLAG_CONNECTION_ID_8_BYTES:
+            self.connection_id_index = fields
+            fmt += 'Q'
+            fields += 1
+
+        if public_flags & PUBLIC_FLAG_RESET:
+            self.struct = struct.Struct(fmt)
+            return
+
+        if public_flags & PUBLIC_FLAG_VERSION:
+            self.version_index = fields
+            fmt += 'I'
+            fields += 1
+
+        if public_flags & PUBLIC_FLAG_DIVERSIFICATION_NONCE:
+            fmt += '{}x'.format(DIVERSIFICATION_NONCE_SIZE)
+
+        packet_number_format = _PACKET_NUMBER_FORMATS[
+            (public_flags & 0x30) >> 4]
+        self.packet_number_indexes = tuple(
+            range(fields, fields + len(packet_number_format)))
+        fmt += packet_number_format
+
+        self.struct = struct.Struct(fmt)
+
+
+_LAYOUTS = tuple(_HeaderLayout(flags) for flags in range(256))
+
+
+def parse_public_headers(datagrams: Sequence[bytes]) -> PublicHeaders:
+    """Decodes public headers of every datagram in a batch.
+
+    Unlike Parser.parse_public_header(), version and connection ID fields
+    are decoded only when public flags announce them.
+
+    Args:
+        datagrams: UDP datagrams. Any objects supporting buffer protocol.
+    """
+    headers = PublicHeaders(len(datagrams))
+    for i, datagram in enumerate(datagrams):
+        _decode_into(headers, i, datagram, 0, len(datagram))
+    return headers
+
+
+def parse_packed_public_headers(buff: bytes,
+        offsets: Sequence[int]) -> PublicHeaders:
+    """Decodes public headers of datagrams packed into a single buffer.
+
+    Args:
+        buff: datagrams placed one after another.
+        offsets: ascending datagram start positions in buff. Every
+            datagram ends where the next one starts, the last one ends at
+            the end of the buffer.
+    """
+    headers = PublicHeaders(len(offsets))
+    ends = list(offsets[1:]) + [len(buff)]
+    for i, (start, end) in enumerate(zip(offsets, ends)):
+        _decode_into(headers, i, buff, start, end)
+    return headers
+
+
+def _decode_into(headers: PublicHeaders, i: int, buff: bytes, start: int,
+        end: int) -> None:
+    """Decodes public header located at buff[start:end] into i-th row."""
+    if start >= end:
+        return
+
+    layout = _LAYOUTS[buff[start]]
+    if start + layout.struct.size > end:
+        return
+
+    fields = layout.struct.unpack_from(buff, start)
+    headers.public_flags[i] = fields[0]
+    if layout.connection_id_index is not None:
+        headers.connection_ids[i] = fields[layout.connection_id_index]
+    if layout.version_index is not None:
+        headers.protocol_versions[i] = fields[layout.version_index]
+    headers.packet_numbers[i] = _packet_number(fields,
+        layout.packet_number_indexes)
+    headers.valid[i] = 1
+
+
+def _packet_number(fields: tuple, indexes: Tuple[int, ...]) -> int:
+    """Combines packet number parts unpacked in little endian order."""
+    if not indexes:
+        return 0
+    if len(indexes) == 1:
+        return fields[indexes[0]]
+    return fields[indexes[0]] | (fields[indexes[1]] << 32)
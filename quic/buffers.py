@@ -0,0 +1,125 @@
+"""Reusable packet buffers.
+
+Buffers are grouped into size classes, each with its own bounded free
+list. A request is served from the smallest class that fits, so steady
+state packet processing keeps reusing the same few bytearrays instead of
+allocating new ones.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import traceback
+from typing import Iterator, List, Sequence, Union
+
+
+DEFAULT_SIZE_CLASSES = (128, 512, 1500, 4096, 16384, 65536)
+
+
+class BufferPool:
+    """Size classed free lists of bytearrays.
+
+    Buffers are handed out with acquire() and given back with release().
+    Acquired buffers are at least as long as requested and keep their old
+    contents, the user is expected to overwrite what it uses. Requests
+    bigger than the largest size class are allocated every time and are not
+    pooled.
+
+    In debug mode the pool remembers where every outstanding buffer was
+    acquired, which leaks() reports, and rejects foreign or double released
+    buffers.
+    """
+
+    def __init__(self,
+            size_classes: Union[int, Sequence[int]]=DEFAULT_SIZE_CLASSES,
+            max_free: int=256, debug: bool=False) -> None:
+        """
+        Args:
+            size_classes: buffer sizes the pool serves, or a single size.
+            max_free: maximum number of released buffers kept for reuse per
+                size class. Buffers released over the limit are left to the
+                garbage collector.
+            debug: whether to track outstanding buffers.
+        """
+        if isinstance(size_classes, int):
+            size_classes = (size_classes,)
+        self.size_classes = tuple(sorted(size_classes))
+        self.max_free = max_free
+        self.debug = debug
+
+        free_lists = [[] for _ in self.size_classes] # type: List[List]
+        self._free = tuple(free_lists)
+        self._class_of_size = {size: i for i, size in
+            enumerate(self.size_classes)} # type: dict
+        # Outstanding buffers and stacks they were acquired at by buffer ID.
+        self._outstanding = {} # type: dict
+
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, size: int) -> bytearray:
+        """
+        Returns:
+            buffer of the smallest size class fitting size bytes.
+        """
+        size_class = bisect_left(self.size_classes, size)
+        if size_class == len(self.size_classes):
+            buff = bytearray(size)
+            self.allocated += 1
+        elif self._free[size_class]:
+            buff = self._free[size_class].pop()
+            self.reused += 1
+        else:
+            buff = bytearray(self.size_classes[size_class])
+            self.allocated += 1
+
+        if self.debug:
+            self._outstanding[id(buff)] = (buff,
+                traceback.extract_stack()[:-1])
+        return buff
+
+    def release(self, buff: bytearray) -> None:
+        """Returns buffer to the pool.
+
+        Raises:
+            ValueError: if buffer was not acquired from this pool. Outside
+                debug mode only buffers of unknown size are detected.
+        """
+        if self.debug and self._outstanding.pop(id(buff), None) is None:
+            raise ValueError('Buffer was not acquired from the pool or was '
+                'already released.')
+
+        size_class = self._class_of_size.get(len(buff))
+        if size_class is None:
+            if len(buff) > self.size_classes[-1]:
+                return
+            raise ValueError('Buffer of {} bytes does not belong to the '
+                'pool.'.format(len(buff)))
+
+        free = self._free[size_class]
+        if len(free) < self.max_free:
+            free.append(buff)
+
+    @contextmanager
+    def buffer(self, size: int) -> Iterator[bytearray]:
+        """Acquires buffer for the duration of with block."""
+        buff = self.acquire(size)
+        try:
+            yield buff
+        finally:
+            self.release(buff)
+
+    def leaks(self) -> List[str]:
+        """
+        Returns:
+            formatted stacks where buffers not released yet were acquired.
+            Always empty outside debug mode.
+        """
+        return [''.join(traceback.format_list(stack))
+            for _, stack in self._outstanding.values()]
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            number of free buffers in all size classes.
+        """
+        return sum(len(free) for free in self._free)
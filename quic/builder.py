@@ -0,0 +1,265 @@
+"""Packet assembly.
+
+Pending frames from any number of streams are packed greedily into packets
+of up to max packet size. Stream data is split across packets when it
+doesn't fit, so every packet but the last is filled up. Packets are
+assembled in pooled buffers with no intermediate byte strings.
+"""
+
+from collections import deque
+import struct
+from typing import List, Tuple, Union
+
+from quic.buffers import BufferPool
+from quic.packet import PublicHeader, StreamFrameHeader, PacketHasher, \
+    PACKET_HASH_SIZE, PUBLIC_FLAG_CONNECTION_ID_8_BYTES
+
+
+MAX_PACKET_SIZE = 1350
+
+_PACKET_HASH = struct.Struct('<QI')
+_ZEROS = memoryview(bytes(MAX_PACKET_SIZE))
+
+
+class StreamData:
+    """Pending stream data."""
+
+    __slots__ = ('stream_id', 'offset', 'data', 'finish')
+
+    def __init__(self, stream_id: int, offset: int, data: bytes,
+            finish: bool=False) -> None:
+        """
+        Args:
+            stream_id: stream the data belongs to.
+            offset: stream offset of the first data byte.
+            data: any object supporting buffer protocol. It's not copied
+                until the packet is assembled.
+            finish: whether data ends the stream.
+        """
+        self.stream_id = stream_id
+        self.offset = offset
+        self.data = memoryview(data)
+        self.finish = finish
+
+    def frame_header(self) -> StreamFrameHeader:
+        """
+        Returns:
+            the shortest stream frame header for this data, with data
+            length included.
+        """
+        return StreamFrameHeader(id=self.stream_id, finish=self.finish,
+            has_data_length=True, data_length=len(self.data),
+            offset_length=_offset_length(self.offset),
+            id_length=_stream_id_length(self.stream_id), offset=self.offset)
+
+
+class SerializedFrame:
+    """Pending frame serialized in advance, e.g. ACK or WINDOW_UPDATE.
+
+    Such frames are never split across packets.
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+    @property
+    def length(self) -> int:
+        return len(self.data)
+
+
+PendingFrame = Union[StreamData, SerializedFrame]
+
+
+class PacketBuilder:
+    """Packs pending frames of a connection into packets."""
+
+    def __init__(self, connection_id: int, pool: BufferPool=None,
+            max_packet_size: int=MAX_PACKET_SIZE,
+            public_flags: int=PUBLIC_FLAG_CONNECTION_ID_8_BYTES,
+            protocol_version: bytes=b'Q034', packet_number: int=1) -> None:
+        """
+        Args:
+            connection_id: connection ID written to every packet.
+            pool: buffers packets are assembled in.
+            max_packet_size: maximum packet size, i.e. path MTU minus IP and
+                UDP headers.
+            public_flags: public flags of every packet. Packet number length
+                bits are picked by the builder.
+            protocol_version: written if public flags have version flag.
+            packet_number: packet number of the first packet.
+        """
+        if max_packet_size > len(_ZEROS):
+            raise ValueError('Packets can not be longer than {} bytes.'\
+                .format(len(_ZEROS)))
+
+        self.pool = pool if pool is not None \
+            else BufferPool(max_packet_size)
+        self.max_packet_size = max_packet_size
+        self.header = PublicHeader(public_flags=public_flags,
+            connection_id=connection_id, protocol_version=protocol_version,
+            packet_number=packet_number)
+        # Smallest packet number not acknowledged by peer yet. Packet
+        # number length is picked to cover the gap up to it.
+        self.least_unacked = packet_number
+
+        self._pending = deque() # type: deque
+
+    @property
+    def packet_number(self) -> int:
+        """
+        Returns:
+            packet number of the next packet.
+        """
+        return self.header.packet_number
+
+    def add_stream_data(self, stream_id: int, offset: int, data: bytes,
+            finish: bool=False) -> None:
+        """Queues stream data. It's sent in the next build().
+
+        Raises:
+            ValueError: if not even a frame with a single data byte fits
+                into a packet.
+        """
+        stream_data = StreamData(stream_id, offset, data, finish)
+        # Frames of split data have growing offsets, the last one has the
+        # longest header.
+        end_offset = offset + len(stream_data.data)
+        min_frame_length = 1 + _stream_id_length(stream_id) \
+            + _offset_length(end_offset) + min(len(stream_data.data), 1)
+        if min_frame_length > self.max_packet_size - self._packet_overhead():
+            raise ValueError('Stream {} frames do not fit into packets of {} '
+                'bytes.'.format(stream_id, self.max_packet_size))
+        self._pending.append(stream_data)
+
+    def add_frame(self, data: bytes) -> None:
+        """Queues frame serialized in advance. It's sent in the next build().
+
+        Raises:
+            ValueError: if frame can not fit into any packet.
+        """
+        if len(data) > self.max_packet_size - self._packet_overhead():
+            raise ValueError('Frame of {} bytes does not fit into a '
+                'packet.'.format(len(data)))
+        self._pending.append(SerializedFrame(data))
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            number of pending frames.
+        """
+        return len(self._pending)
+
+    def build(self, pad: bool=False) -> List[memoryview]:
+        """Packs all pending frames into packets.
+
+        Args:
+            pad: whether to fill every packet up to max packet size with
+                PADDING frame, e.g. for client hello.
+
+        Returns:
+            packet views over pooled buffers. Buffers should be released to
+            the pool, e.g. pool.release(packet.obj), once packets are sent.
+        """
+        packets = []
+        while self._pending:
+            packets.append(self._build_packet(pad))
+        return packets
+
+    def _packet_overhead(self) -> int:
+        header = self.header
+        return 1 + 8 + 4 + len(b''.join(header.diversification_nonces)) \
+            + 6 + PACKET_HASH_SIZE
+
+    def _build_packet(self, pad: bool) -> memoryview:
+        buff = self.pool.acquire(self.max_packet_size)
+        header_length = self.header.write_into(buff, 0, self.least_unacked)
+        frames_offset = header_length + PACKET_HASH_SIZE
+        end = self.max_packet_size
+
+        position = frames_offset
+        pending = self._pending
+        while pending and position < end:
+            frame = pending[0]
+            if isinstance(frame, SerializedFrame):
+                if position + frame.length > end:
+                    break
+                buff[position:position + frame.length] = frame.data
+                position += frame.length
+                pending.popleft()
+                continue
+
+            written, done = self._write_stream_data(frame, buff, position,
+                end)
+            if not written:
+                break
+            position += written
+            if done:
+                pending.popleft()
+
+        if pad and position < end:
+            buff[position:end] = _ZEROS[:end - position]
+            position = end
+
+        packet = memoryview(buff)[:position]
+        hasher = PacketHasher()
+        hasher.update(packet[:header_length])
+        hasher.update(packet[frames_offset:])
+        packet_hash = hasher.digest()
+        _PACKET_HASH.pack_into(buff, header_length,
+            packet_hash & 0xffffffffffffffff, packet_hash >> 64)
+
+        self.header.packet_number += 1
+        return packet
+
+    def _write_stream_data(self, stream_data: StreamData, buff: bytearray,
+            position: int, end: int) -> Tuple[int, bool]:
+        """Writes as much stream data as fits into the packet.
+
+        Written data is cut off the pending stream data. Only the frame
+        which fills the packet up to the end goes without data length field,
+        so it's always the last one in the packet.
+
+        Returns:
+            number of bytes written, 0 if not even a frame header with a
+            byte of data fits, and whether all the data was written.
+        """
+        header = stream_data.frame_header()
+        data = stream_data.data
+        available = end - position
+
+        if header.length + len(data) <= available:
+            data_length = len(data)
+        else:
+            data_length = available - (header.length - 2)
+            if data_length <= len(data):
+                header.has_data_length = False
+            else:
+                # Data would leave a single byte free without data length
+                # field, so send one byte less with it to fill the packet.
+                data_length = len(data) - 1
+        if data_length < 0 or (data and not data_length):
+            return 0, False
+
+        header.data_length = data_length
+        header.finish = header.finish and data_length == len(data)
+        header_length = header.length
+        header.write_into(buff, position)
+        data_start = position + header_length
+        buff[data_start:data_start + data_length] = data[:data_length]
+
+        stream_data.data = data[data_length:]
+        stream_data.offset += data_length
+        return header_length + data_length, data_length == len(data)
+
+
+def _stream_id_length(stream_id: int) -> int:
+    return max((stream_id.bit_length() + 7) // 8, 1)
+
+
+def _offset_length(offset: int) -> int:
+    """Offset length is 0 or 2 to 8 bytes."""
+    if not offset:
+        return 0
+    return max((offset.bit_length() + 7) // 8, 2)
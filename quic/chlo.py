@@ -1,17 +1,21 @@
 """QUIC client hello (CHLO) message related utilities."""
 
 import random
+import re
 import time
 from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple, Union
 
-import fnv
-
-from quic.packet import PublicHeader, StreamFrameHeader
+from quic.packet import PublicHeader, StreamFrameHeader, PacketHasher, \
+    PACKET_HASH_SIZE
 import quic.handshake as handshake
 import quic.tags as tags
+from quic.versions import VersionRegistry
 
 
-VERSION = 'Q034'
+# Client hellos ask for the version the endpoint prefers.
+VERSION = str(VersionRegistry().preferred, 'ascii')
+PACKET_SIZE = 1300
 
 
 def make_message() -> bytes:
@@ -23,8 +27,8 @@ def make_message() -> bytes:
     chlo_msg = handshake.Message()
     chlo_msg.tag = b'CHLO'
     chlo_msg.tags = tags.Container({
-        'VER': VERSION, 'PDMD': 'X509',
-        'PAD': b'\x00' * 1000
+        tags.VER: VERSION, tags.PDMD: 'X509',
+        tags.PAD: b'\x00' * 1000
     })
     chlo_msg_buff = chlo_msg.to_bytes()
 
@@ -37,9 +41,193 @@ def make_message() -> bytes:
 
     pub_header_buff = pub_header.to_bytes()
     stream_header_buff = stream_header.to_bytes()
-    padding = b'\x00' * (1300 - (len(pub_header_buff) + 12 \
-        + len(stream_header_buff) + len(chlo_msg_buff)))
-    packet_hash = fnv.hash(pub_header_buff + stream_header_buff + chlo_msg_buff + padding)
+    padding_length = PACKET_SIZE - (len(pub_header_buff) + PACKET_HASH_SIZE \
+        + len(stream_header_buff) + len(chlo_msg_buff))
+    packet_hash = PacketHasher().update(pub_header_buff) \
+        .update(stream_header_buff).update(chlo_msg_buff) \
+        .update_zeros(padding_length).digest()
+
+    return pub_header_buff \
+        + packet_hash.to_bytes(PACKET_HASH_SIZE, byteorder='little') \
+        + stream_header_buff + chlo_msg_buff + b'\x00' * padding_length
+
+
+class Template:
+    """Reusable CHLO packet template.
+
+    Packet is serialized once. Rendering only patches connection ID,
+    packet number and variable tag values in place and rehashes the packet
+    starting from the connection ID. Zero filled regions (PAD tag and
+    packet padding) are hashed in constant time.
+
+    Rendered packets share a single buffer, so a packet has to be sent
+    before the next one is rendered.
+    """
+
+    def __init__(self, tag_values: dict=None,
+            variable_tags: Iterable[Union[str, int]]=()) -> None:
+        """
+        Args:
+            tag_values: CHLO tags added to or overriding default ones.
+            variable_tags: tags whose values may be replaced when rendering.
+                Replacement values must have the same length as the
+                template values.
+
+        Raises:
+            ValueError: if the message does not fit into a packet of
+                PACKET_SIZE bytes.
+        """
+        chlo_tags = tags.Container({
+            tags.VER: VERSION, tags.PDMD: 'X509',
+            tags.PAD: b'\x00' * 1000
+        })
+        chlo_tags.update(tag_values or {})
+
+        pub_header = PublicHeader(
+            protocol_version=bytes(VERSION, 'ascii'), packet_number=1,
+            connection_id=0)
+        pub_header_buff = pub_header.to_bytes()
+        self._connection_id_offset = 1
+        self._packet_number_offset = len(pub_header_buff) - 1
+        self._hash_offset = len(pub_header_buff)
+
+        chlo_msg = handshake.Message(b'CHLO', chlo_tags)
+        chlo_msg_buff = chlo_msg.to_bytes()
+        stream_header_buff = StreamFrameHeader(id=1, has_data_length=True,
+            data_length=len(chlo_msg_buff), id_length=1).to_bytes()
+
+        msg_offset = self._hash_offset + PACKET_HASH_SIZE \
+            + len(stream_header_buff)
+        if msg_offset + len(chlo_msg_buff) > PACKET_SIZE:
+            raise ValueError('CHLO message of {} bytes does not fit into a '
+                '{} byte packet.'.format(len(chlo_msg_buff), PACKET_SIZE))
+
+        self._buffer = bytearray(PACKET_SIZE)
+        self._buffer[:len(pub_header_buff)] = pub_header_buff
+        self._buffer[self._hash_offset + PACKET_HASH_SIZE:msg_offset] = \
+            stream_header_buff
+        self._buffer[msg_offset:msg_offset + len(chlo_msg_buff)] = \
+            chlo_msg_buff
+
+        self._tag_locations = self._locate_tags(chlo_msg, msg_offset,
+            variable_tags)
+        variable_regions = [
+            (self._connection_id_offset, self._connection_id_offset + 8),
+            (self._packet_number_offset, self._packet_number_offset + 1),
+        ] + list(self._tag_locations.values())
+
+        self._prefix_state = PacketHasher().update(
+            self._buffer[:self._connection_id_offset]).state
+        self._segments = self._hash_segments(variable_regions)
+
+    def render(self, connection_id: int, packet_number: int=1,
+            tag_values: Dict[Union[str, int], bytes]=None) -> bytearray:
+        """Patches variable fields and packet hash into template buffer.
+
+        Args:
+            connection_id: 64 bit connection ID.
+            packet_number: packet number which fits into 1 byte.
+            tag_values: new values of variable tags.
+
+        Returns:
+            template buffer holding the rendered packet.
+
+        Raises:
+            ValueError: if tag is not variable or value length differs from
+                the template value length.
+        """
+        buff = self._buffer
+        buff[self._connection_id_offset:self._connection_id_offset + 8] = \
+            connection_id.to_bytes(8, byteorder='little')
+        buff[self._packet_number_offset] = packet_number
+
+        for tag, value in (tag_values or {}).items():
+            location = self._tag_locations.get(tags.tag_number(tag))
+            if location is None:
+                raise ValueError('Tag {} is not variable.'.format(tag))
+            value = handshake.serialize_tag_value(value)
+            if len(value) != location[1] - location[0]:
+                raise ValueError('Value of tag {} must be {} bytes ' \
+                    'long.'.format(tag, location[1] - location[0]))
+            buff[location[0]:location[1]] = value
+
+        self._update_hash()
+        return buff
+
+    def _update_hash(self) -> None:
+        view = memoryview(self._buffer)
+        hasher = PacketHasher(self._prefix_state)
+        for start, end, is_zero in self._segments:
+            if is_zero:
+                hasher.update_zeros(end - start)
+            else:
+                hasher.update(view[start:end])
+
+        self._buffer[self._hash_offset:self._hash_offset + PACKET_HASH_SIZE] \
+            = hasher.digest().to_bytes(PACKET_HASH_SIZE, byteorder='little')
+
+    def _locate_tags(self, chlo_msg: handshake.Message, msg_offset: int,
+            variable_tags: Iterable[Union[str, int]]) \
+            -> Dict[int, Tuple[int, int]]:
+        """Finds variable tag value locations in the packet buffer."""
+        variable_tag_numbers = set(map(tags.tag_number, variable_tags))
+        locations = {}
+        value_start = msg_offset + chlo_msg.values_offset
+        for tag, value in chlo_msg.tags.items():
+            value_end = value_start + len(handshake.serialize_tag_value(value))
+            if tag in variable_tag_numbers:
+                locations[tag] = (value_start, value_end)
+            value_start = value_end
+
+        missing_tags = variable_tag_numbers - set(locations)
+        if missing_tags:
+            raise ValueError('Variable tags {} are not in the template.'\
+                .format(', '.join(map(tags.tag_name, missing_tags))))
+
+        return locations
+
+    def _hash_segments(self, variable_regions: List[Tuple[int, int]]) \
+            -> List[Tuple[int, int, bool]]:
+        """Splits hashed part of the packet into data and zero runs.
+
+        Hashing starts at the first variable field. Zero runs are searched
+        for only outside of variable regions, since those change.
+        """
+        hash_end = self._hash_offset + PACKET_HASH_SIZE
+        boundaries = sorted(set([self._connection_id_offset,
+            self._hash_offset, hash_end, len(self._buffer)]
+            + [offset for region in variable_regions for offset in region]))
+        variable_starts = dict(variable_regions)
+
+        segments = [] # type: List[Tuple[int, int, bool]]
+        for start, end in zip(boundaries, boundaries[1:]):
+            if start == self._hash_offset:
+                continue
+            if variable_starts.get(start) == end:
+                _append_segment(segments, start, end, False)
+                continue
+
+            position = start
+            for zero_run in _ZERO_RUN.finditer(self._buffer, start, end):
+                _append_segment(segments, position, zero_run.start(), False)
+                _append_segment(segments, zero_run.start(), zero_run.end(),
+                    True)
+                position = zero_run.end()
+            _append_segment(segments, position, end, False)
+
+        return segments
+
+
+_ZERO_RUN = re.compile(b'\x00{16,}')
+
+
+def _append_segment(segments: List[Tuple[int, int, bool]], start: int,
+        end: int, is_zero: bool) -> None:
+    """Appends hashing segment merging it with the previous one if possible."""
+    if start == end:
+        return
 
-    return pub_header_buff + packet_hash.to_bytes(16, byteorder='little')[:12] \
-        + stream_header_buff + chlo_msg_buff + padding
+    if segments and segments[-1][1] == start and segments[-1][2] == is_zero:
+        segments[-1] = (segments[-1][0], end, is_zero)
+    else:
+        segments.append((start, end, is_zero))
@@ -0,0 +1,149 @@
+"""Connection registry keyed by connection ID."""
+
+from collections import OrderedDict
+import struct
+import time
+from typing import Any, Callable, Iterator, Optional
+
+
+_CONNECTION_ID = struct.Struct('<Q')
+
+
+def connection_id_of(datagram: bytes) -> int:
+    """Extracts 64 bit connection ID from datagram without copying it.
+
+    Connection ID is expected right after public flags, as
+    Parser.parse_public_header() expects it.
+    """
+    return _CONNECTION_ID.unpack_from(datagram, 1)[0]
+
+
+class _Entry:
+    __slots__ = ('value', 'last_seen')
+
+    def __init__(self, value: Any, last_seen: float) -> None:
+        self.value = value
+        self.last_seen = last_seen
+
+
+class ConnectionTable:
+    """Connection state registry with LRU and idle eviction.
+
+    Connections are kept in least recently used order, so the ones idle for
+    the longest are always at the front. Every lookup and insertion evicts
+    at most a few idle connections from the front, which keeps eviction
+    amortised O(1) per packet without a separate sweeper.
+    """
+
+    def __init__(self, capacity: int=100000, idle_timeout: float=30.0,
+            on_evict: Callable[[int, Any], None]=None,
+            clock: Callable[[], float]=time.monotonic,
+            evictions_per_call: int=2) -> None:
+        """
+        Args:
+            capacity: maximum number of connections. Least recently used
+                connection is evicted when capacity is exceeded.
+            idle_timeout: seconds after which connection without packets is
+                evicted.
+            on_evict: called with connection ID and its state whenever
+                connection is evicted.
+            clock: returns current time in seconds.
+            evictions_per_call: maximum number of idle connections evicted
+                per lookup or insertion.
+        """
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.on_evict = on_evict
+        self.clock = clock
+        self.evictions_per_call = evictions_per_call
+
+        self._entries = OrderedDict() # type: OrderedDict
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, connection_id: int) -> Optional[Any]:
+        """Looks up connection state and marks connection as active.
+
+        Returns:
+            connection state or None if connection is unknown.
+        """
+        now = self.clock()
+        self._evict_idle(now)
+
+        entry = self._entries.get(connection_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry.last_seen = now
+        self._entries.move_to_end(connection_id)
+        return entry.value
+
+    def put(self, connection_id: int, value: Any) -> None:
+        """Inserts or replaces connection state."""
+        now = self.clock()
+        self._evict_idle(now)
+
+        entry = self._entries.get(connection_id)
+        if entry is not None:
+            entry.value = value
+            entry.last_seen = now
+            self._entries.move_to_end(connection_id)
+            return
+
+        self._entries[connection_id] = _Entry(value, now)
+        if len(self._entries) > self.capacity:
+            self._evict_oldest()
+
+    def remove(self, connection_id: int) -> Optional[Any]:
+        """Removes connection without counting it as eviction.
+
+        Returns:
+            removed connection state or None if connection is unknown.
+        """
+        entry = self._entries.pop(connection_id, None)
+        return entry.value if entry is not None else None
+
+    def expire(self) -> int:
+        """Evicts all idle connections.
+
+        Returns:
+            number of evicted connections.
+        """
+        return self._evict_idle(self.clock(), len(self._entries))
+
+    def values(self) -> Iterator[Any]:
+        return (entry.value for entry in self._entries.values())
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __contains__(self, connection_id: int) -> bool:
+        return connection_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict_idle(self, now: float, limit: int=None) -> int:
+        """Evicts up to limit connections idle for longer than timeout."""
+        if limit is None:
+            limit = self.evictions_per_call
+
+        deadline = now - self.idle_timeout
+        evicted = 0
+        while evicted < limit and self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.last_seen > deadline:
+                break
+            self._evict_oldest()
+            evicted += 1
+        return evicted
+
+    def _evict_oldest(self) -> None:
+        connection_id, entry = self._entries.popitem(last=False)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(connection_id, entry.value)
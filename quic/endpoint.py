@@ -0,0 +1,240 @@
+"""asyncio UDP endpoint receiving and dispatching QUIC packets."""
+
+import asyncio
+from typing import Awaitable, Callable, Tuple
+
+from quic.connections import ConnectionTable, connection_id_of
+from quic.instrumentation import InstrumentedParser, Metrics
+from quic.packet import PublicHeader, ViewParser
+from quic.timers import TimerWheel
+from quic.versions import VersionRegistry, ACCEPT, NEGOTIATE
+
+
+class Packet:
+    """Received packet which passed packet hash verification."""
+
+    __slots__ = ('header', 'parser', 'address')
+
+    def __init__(self, header: PublicHeader, parser: ViewParser,
+            address: Tuple[str, int]) -> None:
+        """
+        Args:
+            header: parsed public header.
+            parser: packet parser with data offset pointing just after the
+                packet hash.
+            address: address packet was received from.
+        """
+        self.header = header
+        self.parser = parser
+        self.address = address
+
+
+PacketHandler = Callable[[Packet], Awaitable[None]]
+
+
+class Connection:
+    """Per connection ID packet queue served by a single handler task."""
+
+    def __init__(self, endpoint: 'Endpoint', connection_id: int,
+            address: Tuple[str, int], max_queue_size: int) -> None:
+        self.endpoint = endpoint
+        self.connection_id = connection_id
+        self.address = address
+        self.queue = asyncio.Queue(max_queue_size) # type: asyncio.Queue
+        self.task = None # type: asyncio.Task
+
+    @property
+    def timers(self) -> TimerWheel:
+        """
+        Returns:
+            timer wheel shared by all connections of the endpoint, e.g. for
+            recovery.LossDetector and recovery.DelayedAck timers.
+        """
+        return self.endpoint.timers
+
+    async def send(self, data: bytes) -> None:
+        """Sends datagram to the address connection was last seen from."""
+        await self.endpoint.send(data, self.address)
+
+    async def serve(self, handler: PacketHandler) -> None:
+        """Feeds queued packets to the handler one by one."""
+        while True:
+            packet = await self.queue.get()
+            self.endpoint.pending -= 1
+            try:
+                await handler(packet)
+            except Exception as e:
+                self.endpoint.handler_errors += 1
+                self.endpoint.loop.call_exception_handler({
+                    'message': 'Unhandled exception in packet handler',
+                    'exception': e,
+                })
+
+
+class Endpoint(asyncio.DatagramProtocol):
+    """QUIC endpoint protocol.
+
+    Datagrams with unsupported protocol version get a version negotiation
+    reply and malformed ones are dropped before they are parsed. The rest
+    are parsed, their packet hashes are verified and they are queued to the
+    handler of their connection ID. Every connection gets its own handler,
+    created by handler factory when the first packet of the connection
+    arrives. Connections idle for longer than idle timeout are
+    evicted and their handlers are cancelled.
+
+    Queues are bounded both per connection and in total. Packets that don't
+    fit are dropped, which is how UDP endpoints push back on senders.
+    Sending waits while the transport write buffer is over its high-water
+    mark.
+
+    Connection handlers schedule their retransmission and ACK delay timers
+    on the endpoint timer wheel, which is driven by the event loop while
+    the endpoint is open.
+    """
+
+    def __init__(self,
+            handler_factory: Callable[[Connection], PacketHandler],
+            max_queue_size: int=64, max_pending: int=4096,
+            max_connections: int=100000, idle_timeout: float=30.0,
+            metrics: Metrics=None, versions: VersionRegistry=None) -> None:
+        """
+        Args:
+            handler_factory: creates packet handler for a new connection.
+            max_queue_size: maximum number of packets queued for a single
+                connection.
+            max_pending: maximum number of packets queued for all
+                connections.
+            max_connections: maximum number of concurrent connections.
+                Least recently active connection is evicted when exceeded.
+            idle_timeout: seconds without packets after which connection
+                is evicted.
+            metrics: collects parsing stage metrics if given.
+            versions: supported protocol versions. Defaults to
+                versions.SUPPORTED_VERSIONS.
+        """
+        self.handler_factory = handler_factory
+        self.max_queue_size = max_queue_size
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.versions = versions or VersionRegistry()
+
+        self.connections = ConnectionTable(max_connections, idle_timeout,
+            on_evict=self._connection_evicted)
+        self.transport = None # type: asyncio.DatagramTransport
+        self.loop = None # type: asyncio.AbstractEventLoop
+        self.timers = TimerWheel()
+        self.pending = 0
+        self._writable = None # type: asyncio.Event
+
+        self.received = 0
+        self.invalid = 0
+        self.dropped = 0
+        self.handler_errors = 0
+        self.version_negotiations = 0
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.timers.start(self.loop)
+
+    def connection_lost(self, exc: Exception) -> None:
+        self.timers.stop()
+        for connection in self.connections.values():
+            self._stop(connection)
+        self.connections.clear()
+
+    def pause_writing(self) -> None:
+        self._writable.clear()
+
+    def resume_writing(self) -> None:
+        self._writable.set()
+
+    def datagram_received(self, data: bytes, address: Tuple[str, int]) -> None:
+        self.received += 1
+
+        verdict = self.versions.classify(data)
+        if verdict != ACCEPT:
+            if verdict == NEGOTIATE:
+                self.version_negotiations += 1
+                self._sendto(self.versions.negotiation_reply(data), address)
+            else:
+                self.invalid += 1
+            return
+
+        if self.metrics is None:
+            parser = ViewParser(data)
+        else:
+            parser = InstrumentedParser(data, self.metrics)
+        try:
+            header = parser.parse_public_header()
+            packet_hash = parser.parse_packet_hash()
+            hash_is_valid = packet_hash == parser.calc_packet_hash()
+        except (IndexError, ValueError):
+            hash_is_valid = False
+
+        if not hash_is_valid:
+            self.invalid += 1
+            return
+
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            return
+
+        connection = self._connection(connection_id_of(data), address)
+        try:
+            connection.queue.put_nowait(Packet(header, parser, address))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+
+        connection.address = address
+        self.pending += 1
+
+    async def send(self, data: bytes, address: Tuple[str, int]) -> None:
+        """Sends datagram waiting for the transport to drain if needed."""
+        await self._writable.wait()
+        self._sendto(data, address)
+
+    def close(self) -> None:
+        """Closes the transport and stops connection handlers."""
+        self.transport.close()
+
+    def _sendto(self, data: bytes, address: Tuple[str, int]) -> None:
+        self.transport.sendto(data, address)
+
+    def _connection(self, connection_id: int,
+            address: Tuple[str, int]) -> Connection:
+        """Finds connection or creates a new one with its handler task."""
+        connection = self.connections.get(connection_id)
+        if connection is None:
+            connection = Connection(self, connection_id, address,
+                self.max_queue_size)
+            connection.task = self.loop.create_task(
+                connection.serve(self.handler_factory(connection)))
+            self.connections.put(connection_id, connection)
+        return connection
+
+    def _connection_evicted(self, connection_id: int,
+            connection: Connection) -> None:
+        self._stop(connection)
+
+    def _stop(self, connection: Connection) -> None:
+        """Cancels connection handler and forgets its queued packets."""
+        connection.task.cancel()
+        self.pending -= connection.queue.qsize()
+
+
+async def serve(handler_factory: Callable[[Connection], PacketHandler],
+        host: str, port: int, **kwargs) -> Endpoint:
+    """Starts QUIC endpoint listening on the given UDP address.
+
+    Args:
+        handler_factory: creates packet handler for a new connection.
+        kwargs: passed to Endpoint constructor.
+    """
+    loop = asyncio.get_running_loop()
+    _, endpoint = await loop.create_datagram_endpoint(
+        lambda: Endpoint(handler_factory, **kwargs), local_addr=(host, port))
+    return endpoint
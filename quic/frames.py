@@ -0,0 +1,388 @@
+"""Frame views and packet payload frame iteration.
+
+Every frame in a packet payload is returned as a lightweight view over the
+packet buffer. Frame length is determined while iterating, frame fields are
+decoded only when accessed.
+"""
+
+from abc import ABC, abstractmethod
+import struct
+from typing import Iterator, List, Tuple
+
+from quic.packet import StreamFrameView, FRAME_TYPE_NAMES
+
+
+_UINT16 = struct.Struct('<H')
+_UINT32 = struct.Struct('<I')
+_UINT64 = struct.Struct('<Q')
+
+# Packet number and ACK field lengths indexed by their 2 bit encoding.
+_FIELD_LENGTHS = (1, 2, 4, 6)
+
+
+class Frame(ABC):
+    """Frame view over the packet buffer."""
+
+    __slots__ = ('data', 'offset', 'length')
+
+    frame_type = None # type: str
+
+    def __init__(self, data: memoryview, offset: int, length: int) -> None:
+        """
+        Args:
+            data: packet buffer.
+            offset: position of the frame type byte.
+            length: frame length including frame type byte.
+        """
+        self.data = data
+        self.offset = offset
+        self.length = length
+
+    @classmethod
+    @abstractmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        """Determines frame length from the frame header.
+
+        Args:
+            data: packet buffer.
+            offset: position of the frame type byte.
+            packet_number_length: packet number length of the packet frame
+                belongs to.
+        """
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns:
+            copy of the whole serialized frame.
+        """
+        return self.data[self.offset:self.offset + self.length].tobytes()
+
+    def _uint32_at(self, position: int) -> int:
+        return _UINT32.unpack_from(self.data, self.offset + position)[0]
+
+    def _uint64_at(self, position: int) -> int:
+        return _UINT64.unpack_from(self.data, self.offset + position)[0]
+
+
+class PaddingFrame(Frame):
+    """Padding which extends to the end of the packet."""
+
+    __slots__ = ()
+
+    frame_type = 'PADDING'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return len(data) - offset
+
+
+class RstStreamFrame(Frame):
+    __slots__ = ()
+
+    frame_type = 'RST_STREAM'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return 17
+
+    @property
+    def stream_id(self) -> int:
+        return self._uint32_at(1)
+
+    @property
+    def byte_offset(self) -> int:
+        return self._uint64_at(5)
+
+    @property
+    def error_code(self) -> int:
+        return self._uint32_at(13)
+
+
+class ConnectionCloseFrame(Frame):
+    __slots__ = ()
+
+    frame_type = 'CONNECTION_CLOSE'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return 7 + _UINT16.unpack_from(data, offset + 5)[0]
+
+    @property
+    def error_code(self) -> int:
+        return self._uint32_at(1)
+
+    @property
+    def reason(self) -> memoryview:
+        return self.data[self.offset + 7:self.offset + self.length]
+
+
+class GoAwayFrame(Frame):
+    __slots__ = ()
+
+    frame_type = 'GOAWAY'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return 11 + _UINT16.unpack_from(data, offset + 9)[0]
+
+    @property
+    def error_code(self) -> int:
+        return self._uint32_at(1)
+
+    @property
+    def last_good_stream_id(self) -> int:
+        return self._uint32_at(5)
+
+    @property
+    def reason(self) -> memoryview:
+        return self.data[self.offset + 11:self.offset + self.length]
+
+
+class WindowUpdateFrame(Frame):
+    __slots__ = ()
+
+    frame_type = 'WINDOW_UPDATE'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return 13
+
+    @property
+    def stream_id(self) -> int:
+        return self._uint32_at(1)
+
+    @property
+    def byte_offset(self) -> int:
+        return self._uint64_at(5)
+
+
+class BlockedFrame(Frame):
+    __slots__ = ()
+
+    frame_type = 'BLOCKED'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return 5
+
+    @property
+    def stream_id(self) -> int:
+        return self._uint32_at(1)
+
+
+class StopWaitingFrame(Frame):
+    __slots__ = ()
+
+    frame_type = 'STOP_WAITING'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return 1 + packet_number_length
+
+    @property
+    def least_unacked_delta(self) -> int:
+        """Delta to subtract from packet number to get least unacked."""
+        return int.from_bytes(
+            self.data[self.offset + 1:self.offset + self.length], 'little')
+
+
+class PingFrame(Frame):
+    __slots__ = ()
+
+    frame_type = 'PING'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        return 1
+
+
+class AckFrame(Frame):
+    """ACK frame.
+
+    Type byte is 01ntllmm: n - has multiple ACK blocks, ll - largest acked
+    length, mm - ACK block length length.
+    """
+
+    __slots__ = ()
+
+    frame_type = 'ACK'
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        type_byte = data[offset]
+        block_length = _FIELD_LENGTHS[type_byte & 0x03]
+
+        position = offset + 1 + _FIELD_LENGTHS[(type_byte >> 2) & 0x03] + 2
+        block_count = 0
+        if type_byte & 0x20:
+            block_count = data[position]
+            position += 1
+        position += block_length + block_count * (1 + block_length)
+
+        timestamp_count = data[position]
+        position += 1
+        if timestamp_count:
+            position += 5 + (timestamp_count - 1) * 3
+
+        return position - offset
+
+    @property
+    def largest_acked_length(self) -> int:
+        return _FIELD_LENGTHS[(self.data[self.offset] >> 2) & 0x03]
+
+    @property
+    def ack_block_length_length(self) -> int:
+        return _FIELD_LENGTHS[self.data[self.offset] & 0x03]
+
+    @property
+    def largest_acked(self) -> int:
+        start = self.offset + 1
+        return int.from_bytes(
+            self.data[start:start + self.largest_acked_length], 'little')
+
+    @property
+    def ack_delay(self) -> int:
+        """
+        Returns:
+            time in microseconds since largest acked packet was received.
+        """
+        raw = _UINT16.unpack_from(self.data,
+            self.offset + 1 + self.largest_acked_length)[0]
+        return decode_ufloat16(raw)
+
+    @property
+    def ack_blocks(self) -> List[Tuple[int, int]]:
+        """
+        Returns:
+            (gap, ack block length) pairs starting with the first block,
+            whose gap is always 0.
+        """
+        length = self.ack_block_length_length
+        position = self.offset + 1 + self.largest_acked_length + 2
+        block_count = 0
+        if self.data[self.offset] & 0x20:
+            block_count = self.data[position]
+            position += 1
+
+        blocks = [(0, int.from_bytes(self.data[position:position + length],
+            'little'))]
+        position += length
+        for _ in range(block_count):
+            gap = self.data[position]
+            blocks.append((gap, int.from_bytes(
+                self.data[position + 1:position + 1 + length], 'little')))
+            position += 1 + length
+        return blocks
+
+    def acked_ranges(self) -> List[Tuple[int, int]]:
+        """
+        Returns:
+            inclusive (smallest, largest) ranges of acknowledged packet
+            numbers in descending order.
+        """
+        ranges = []
+        largest = self.largest_acked
+        for gap, block_length in self.ack_blocks:
+            largest -= gap
+            if block_length:
+                ranges.append((largest - block_length + 1, largest))
+            largest -= block_length
+        return ranges
+
+
+class StreamFrame(StreamFrameView):
+    """Stream frame view with its total length known."""
+
+    __slots__ = ('length',)
+
+    frame_type = 'STREAM'
+
+    def __init__(self, data: memoryview, offset: int, length: int) -> None:
+        super().__init__(data, offset)
+        self.length = length
+
+    @classmethod
+    def frame_length(cls, data: memoryview, offset: int,
+            packet_number_length: int) -> int:
+        frame = StreamFrameView(data, offset)
+        return frame.header_length + frame.data_length
+
+
+_FRAME_CLASSES = {
+    frame_class.frame_type: frame_class for frame_class in (
+        PaddingFrame, RstStreamFrame, ConnectionCloseFrame, GoAwayFrame,
+        WindowUpdateFrame, BlockedFrame, StopWaitingFrame, PingFrame,
+        AckFrame, StreamFrame,
+    )
+}
+
+# Frame view classes indexed by frame type byte.
+FRAME_CLASSES = tuple(_FRAME_CLASSES.get(name) for name in FRAME_TYPE_NAMES)
+
+
+def iter_frames(data: bytes, offset: int=0,
+        packet_number_length: int=1) -> Iterator[Frame]:
+    """Walks every frame in the packet payload.
+
+    Args:
+        data: packet buffer. Any object supporting buffer protocol.
+        offset: position of the first frame, e.g. Parser.data_offset after
+            packet hash was parsed.
+        packet_number_length: packet number length from the public header,
+            needed to decode STOP_WAITING frames.
+
+    Raises:
+        ValueError: if frame type is unknown or frame is truncated.
+    """
+    data = memoryview(data)
+    end = len(data)
+    while offset < end:
+        frame_class = FRAME_CLASSES[data[offset]]
+        if frame_class is None:
+            raise ValueError('Unknown frame type 0x{:02x} at offset {}.'\
+                .format(data[offset], offset))
+
+        try:
+            length = frame_class.frame_length(data, offset,
+                packet_number_length)
+        except (IndexError, struct.error):
+            length = end - offset + 1
+        if offset + length > end:
+            raise ValueError('{} frame at offset {} is truncated.'.format(
+                frame_class.frame_type, offset))
+
+        yield frame_class(data, offset, length)
+        offset += length
+
+
+def decode_ufloat16(value: int) -> int:
+    """Decodes 16 bit unsigned float with 11 bit mantissa and 5 bit exponent.
+
+    Values below 2^12 are encoded as is.
+    """
+    exponent = value >> 11
+    mantissa = value & 0x7ff
+    if exponent == 0:
+        return mantissa
+    return (mantissa | 0x800) << (exponent - 1)
+
+
+def encode_ufloat16(value: int) -> int:
+    """Encodes integer as 16 bit unsigned float rounding it down."""
+    if value < 0x1000:
+        return value
+
+    exponent = value.bit_length() - 12
+    if exponent >= 0x1f:
+        return 0xffff
+    return ((exponent + 1) << 11) | ((value >> exponent) & 0x7ff)
@@ -1,18 +1,28 @@
 """QUIC handshake message utilities."""
 
-import collections
-from functools import partial, reduce
-from operator import add
-from typing import Tuple
+from bisect import bisect_left
+from collections.abc import Mapping
+import struct
+from typing import Dict, Iterator, List, Tuple, Union
 
-from functional import seq
+from quic.buffers import BufferPool
+import quic.tags
 
 
 class Message:
     """Crypto handshake message."""
-    tag = None # type: bytes
-    tags = collections.OrderedDict() # type: collections.OrderedDict
 
+    __slots__ = ('tag', 'tags')
+
+    def __init__(self, tag: bytes=None, tags: dict=None) -> None:
+        """
+        Args:
+            tag: message tag, e.g. b'CHLO'.
+            tags: message tags. Every message gets its own empty
+                tags.Container if not specified.
+        """
+        self.tag = tag
+        self.tags = tags if tags is not None else quic.tags.Container()
 
     @property
     def tag_count(self) -> int:
@@ -28,28 +38,321 @@ class Message:
 
     def to_bytes(self) -> bytes:
         """Serializes client handhsake message to bytes."""
-        return self.tag + self.tag_count.to_bytes(2, byteorder='little') \
-            + b'\x00\x00' + self._serialize_tags() + self._serialize_tag_values()
+        tag_items = self._serialized_tag_items()
+        buff = bytearray(_serialized_size(tag_items))
+        self._write(buff, 0, tag_items)
+        return bytes(buff)
 
-    def _serialize_tags(self):
-        buff = b''
-        value_end_offset = 0
+    def serialize_into(self, buff: bytearray, offset: int=0) -> int:
+        """Serializes message directly into the given buffer.
+
+        Args:
+            buff: writable buffer, e.g. bytearray or memoryview of an
+                outgoing packet.
+            offset: position in the buffer to write message at.
+
+        Returns:
+            number of bytes written.
+
+        Raises:
+            ValueError: if message does not fit into the buffer.
+        """
+        tag_items = self._serialized_tag_items()
+        size = _serialized_size(tag_items)
+        if offset + size > len(buff):
+            raise ValueError('Message takes {} bytes, but only {} are ' \
+                'available in the buffer.'.format(size, len(buff) - offset))
+
+        self._write(buff, offset, tag_items)
+        return size
+
+    def to_buffer(self, pool: BufferPool) -> memoryview:
+        """Serializes message into a buffer drawn from the pool.
 
-        for tag, value in self.tags.items():
+        Returns:
+            view of the serialized message. Its buffer, view.obj, should be
+            released to the pool when no longer needed.
+        """
+        tag_items = self._serialized_tag_items()
+        size = _serialized_size(tag_items)
+        buff = pool.acquire(size)
+        self._write(buff, 0, tag_items)
+        return memoryview(buff)[:size]
+
+    def _serialized_tag_items(self) -> List[Tuple[int, bytes]]:
+        """Sorts tags once and serializes their values."""
+        return [(tag, serialize_tag_value(value))
+            for tag, value in self.tags.items()]
+
+    def _write(self, buff: bytearray, offset: int,
+            tag_items: List[Tuple[int, bytes]]) -> None:
+        """Writes message header, tag index and tag values into buff."""
+        _MESSAGE_HEADER.pack_into(buff, offset, self.tag, len(tag_items))
+
+        index_offset = offset + _MESSAGE_HEADER.size
+        value_offset = index_offset + len(tag_items) * _TAG_INDEX_ENTRY.size
+        value_end_offset = 0
+        for tag, value in tag_items:
+            value_start = value_offset + value_end_offset
             value_end_offset += len(value)
-            buff += serialize_tag(tag, value_end_offset)
+            _TAG_INDEX_ENTRY.pack_into(buff, index_offset, tag,
+                value_end_offset)
+            index_offset += _TAG_INDEX_ENTRY.size
+            buff[value_start:value_offset + value_end_offset] = value
+
+
+_MESSAGE_HEADER = struct.Struct('<4sH2x')
+_TAG_INDEX_ENTRY = struct.Struct('<II')
+_TAG_NAME_INDEX_ENTRY = struct.Struct('<4sI')
+
+
+def _serialized_size(tag_items: List[Tuple[int, bytes]]) -> int:
+    """Calculates serialized message size from serialized tag values."""
+    return _MESSAGE_HEADER.size + len(tag_items) * _TAG_INDEX_ENTRY.size \
+        + sum(len(value) for _, value in tag_items)
+
+
+class TagIndex(Mapping):
+    """Read only tag mapping backed by serialized handshake message.
+
+    Only the tag index is decoded up front. Tags are found by binary
+    search over the index, which is sorted by tag number like
+    tags.Container, and values are sliced on access.
+    """
+
+    __slots__ = ('_data', '_tags', '_end_offsets', '_values_offset')
+
+    def __init__(self, raw_data: bytes) -> None:
+        """
+        Args:
+            raw_data: QUIC message without public header.
+
+        Raises:
+            ValueError: if message is truncated or tag index is not sorted.
+        """
+        self._data = memoryview(raw_data)
+        if len(self._data) < _MESSAGE_HEADER.size:
+            raise ValueError('Message is too short to hold message header.')
+
+        _, tag_count = _MESSAGE_HEADER.unpack_from(self._data)
+        self._values_offset = _MESSAGE_HEADER.size \
+            + tag_count * _TAG_INDEX_ENTRY.size
+        if self._values_offset > len(self._data):
+            raise ValueError('Message is too short to hold {} tags.'.format(
+                tag_count))
+
+        index = struct.unpack_from('<{}I'.format(tag_count * 2), self._data,
+            _MESSAGE_HEADER.size)
+        self._tags = index[0::2]
+        self._end_offsets = index[1::2]
+        if list(self._tags) != sorted(self._tags):
+            raise ValueError('Message tags are not sorted.')
+
+    def __getitem__(self, tag: Union[str, int]) -> memoryview:
+        """
+        Args:
+            tag: tag name or tag number.
+
+        Raises:
+            KeyError: if message has no such tag.
+            ValueError: if tag value location is invalid.
+        """
+        tag_nr = quic.tags.tag_number(tag)
+        i = bisect_left(self._tags, tag_nr)
+        if i == len(self._tags) or self._tags[i] != tag_nr:
+            raise KeyError(tag)
+
+        start = self._end_offsets[i - 1] if i else 0
+        end = self._end_offsets[i]
+        if start > end or self._values_offset + end > len(self._data):
+            raise ValueError('Invalid end offset {} of tag {}.'.format(
+                end, tag))
+
+        return self._data[self._values_offset + start
+            :self._values_offset + end]
+
+    def __iter__(self) -> Iterator[str]:
+        for tag_nr in self._tags:
+            yield quic.tags.tag_name(tag_nr)
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+
+class MessageView:
+    """Lazily decoded crypto handshake message.
+
+    Keeps the raw message buffer and decodes tag values only when they are
+    looked up, e.g. msg.tags['SNI'].
+    """
+
+    __slots__ = ('tag', 'tags')
+
+    def __init__(self, raw_data: bytes) -> None:
+        """
+        Args:
+            raw_data: QUIC message without public header.
+
+        Raises:
+            ValueError: if message is truncated or tag index is not sorted.
+        """
+        self.tags = TagIndex(raw_data)
+        self.tag = bytes(raw_data[:4])
+
+    @property
+    def tag_count(self) -> int:
+        return len(self.tags)
 
-        return buff
 
-    def _serialize_tag_values(self):
-        return reduce(lambda buff, tag_value: buff + serialize_tag_value(tag_value),
-            self.tags.values(), b'')
+class MessageDecoder:
+    """Incremental handshake message decoder.
+
+    Crypto stream data is fed in chunks as it arrives. Message header and
+    tag index are decoded as soon as their bytes are available, after which
+    the whole message length is known. Buffers are drawn from a pool and
+    returned to it when message is decoded, so decoding a stream of
+    messages reuses the same buffers.
+
+    Fed bytes are copied into the message buffer. The buffer may grow twice
+    per message, once for the tag index and once for the values, and each
+    time the bytes received so far are moved, which is just the header and
+    index. Tag values are copied out of the buffer once more when message
+    completes: the buffer goes back to the pool, so values can't be views
+    into it.
+    """
+
+    __slots__ = ('max_message_size', 'pool', 'tag_count', 'message_length',
+        '_buff', '_expected', '_received', '_tags', '_end_offsets')
+
+    def __init__(self, max_message_size: int=64 * 1024,
+            pool: BufferPool=None) -> None:
+        """
+        Args:
+            max_message_size: messages declaring a bigger length are
+                rejected before their buffer is allocated.
+            pool: buffers messages are assembled in. Decoder gets its own
+                pool if not given.
+        """
+        self.max_message_size = max_message_size
+        self.pool = pool if pool is not None else BufferPool()
+        self._buff = None # type: bytearray
+        self._reset()
+
+    def _reset(self) -> None:
+        self.tag_count = None # type: int
+        self.message_length = None # type: int
+        if self._buff is not None:
+            self.pool.release(self._buff)
+        self._buff = self.pool.acquire(_MESSAGE_HEADER.size)
+        # Bytes needed to complete the current message part.
+        self._expected = _MESSAGE_HEADER.size
+        self._received = 0
+        self._tags = () # type: Tuple[int, ...]
+        self._end_offsets = () # type: Tuple[int, ...]
+
+    @property
+    def required_length(self) -> int:
+        """
+        Returns:
+            number of bytes needed to complete the current message or, if
+            tag index is not decoded yet, to complete the header or index.
+        """
+        return self._expected - self._received
+
+    def feed(self, data: bytes) -> List[Message]:
+        """Consumes next chunk of crypto stream data.
+
+        Args:
+            data: any object supporting buffer protocol.
+
+        Returns:
+            messages completed by this chunk, usually zero or one.
+
+        Raises:
+            ValueError: if message header or tag index is malformed. Decoder
+                can not be used afterwards.
+        """
+        data = memoryview(data)
+        messages = []
+        position = 0
+        while position < len(data):
+            size = min(len(data) - position, self._expected - self._received)
+            self._buff[self._received:self._received + size] = \
+                data[position:position + size]
+            self._received += size
+            position += size
+
+            if self._received == self._expected:
+                message = self._advance()
+                if message is not None:
+                    messages.append(message)
+        return messages
+
+    def _advance(self) -> Message:
+        """Decodes the completed part and grows buffer to the next one.
+
+        Returns:
+            decoded message if it is complete.
+        """
+        if self.tag_count is None:
+            _, self.tag_count = _MESSAGE_HEADER.unpack_from(self._buff)
+            self._grow(_MESSAGE_HEADER.size
+                + self.tag_count * _TAG_INDEX_ENTRY.size)
+            if self.tag_count:
+                return None
+
+        if self.message_length is None:
+            index = struct.unpack_from('<{}I'.format(self.tag_count * 2),
+                self._buff, _MESSAGE_HEADER.size)
+            self._tags = index[0::2]
+            self._end_offsets = index[1::2]
+            prev_end_offset = 0
+            for end_offset in self._end_offsets:
+                if end_offset < prev_end_offset:
+                    raise ValueError('Tag value end offsets decrease.')
+                prev_end_offset = end_offset
+
+            self.message_length = self._expected + prev_end_offset
+            self._grow(self.message_length)
+            if prev_end_offset:
+                return None
+
+        message = self._message()
+        self._reset()
+        return message
+
+    def _grow(self, size: int) -> None:
+        if size > self.max_message_size:
+            raise ValueError('Message length {} exceeds the limit of {} '
+                'bytes.'.format(size, self.max_message_size))
+        if size > len(self._buff):
+            buff = self.pool.acquire(size)
+            buff[:self._received] = memoryview(self._buff)[:self._received]
+            self.pool.release(self._buff)
+            self._buff = buff
+        self._expected = size
+
+    def _message(self) -> Message:
+        """Copies tag values out of the message buffer."""
+        values_offset = _MESSAGE_HEADER.size \
+            + self.tag_count * _TAG_INDEX_ENTRY.size
+        msg = Message()
+        msg.tags = {}
+        with memoryview(self._buff) as buff:
+            value_start = values_offset
+            for tag_nr, end_offset in zip(self._tags, self._end_offsets):
+                value_end = values_offset + end_offset
+                msg.tags[quic.tags.tag_name(tag_nr)] = \
+                    buff[value_start:value_end].tobytes()
+                value_start = value_end
+            msg.tag = buff[:4].tobytes()
+        return msg
 
 
 def serialize_tag_value(tag_val) -> bytes:
     if type(tag_val) is str:
         return bytes(tag_val, 'ascii')
-    elif type(tag_val) is bytes:
+    elif isinstance(tag_val, (bytes, bytearray, memoryview)):
         return tag_val
 
     return None
@@ -79,34 +382,67 @@ def int32_little_endian(position: int, data: bytes) -> int:
     return int.from_bytes(data[position:position + 4], 'little')
 
 
-def tag_positions(tag_count: int):
+def tag_positions(tag_count: int) -> range:
     """Generates tag positions in QUIC message buffer."""
-    return seq(range(0, tag_count)).map(lambda tag_nr: 8 + tag_nr * 8)
+    return range(8, 8 + tag_count * 8, 8)
+
+
+def decode_tag_values(raw_data: bytes) -> Dict[str, memoryview]:
+    """Decodes handshake message tags without copying their values.
+
+    Tag index is walked once. Tag value end offsets must not decrease and
+    must stay within the message.
+
+    Args:
+        raw_data: QUIC message without public header.
+
+    Returns:
+        tag name to tag value view mapping.
+
+    Raises:
+        ValueError: if message is truncated or tag index is malformed.
+    """
+    data = memoryview(raw_data)
+    if len(data) < _MESSAGE_HEADER.size:
+        raise ValueError('Message is too short to hold message header.')
+
+    _, tag_count = _MESSAGE_HEADER.unpack_from(data)
+    values_offset = _MESSAGE_HEADER.size + tag_count * _TAG_INDEX_ENTRY.size
+    if values_offset > len(data):
+        raise ValueError('Message is too short to hold {} tags.'.format(
+            tag_count))
+
+    max_end_offset = len(data) - values_offset
+    tag_values = {}
+    value_start = values_offset
+    prev_end_offset = 0
+    for position in tag_positions(tag_count):
+        tag, end_offset = _TAG_NAME_INDEX_ENTRY.unpack_from(data, position)
+        if end_offset < prev_end_offset or end_offset > max_end_offset:
+            raise ValueError('Invalid end offset {} of tag {}.'.format(
+                end_offset, tag))
+
+        value_end = values_offset + end_offset
+        tag_values[str(tag, 'ascii').strip('\x00')] = \
+            data[value_start:value_end]
+        value_start = value_end
+        prev_end_offset = end_offset
+
+    return tag_values
 
 
 def decode_handshake_message(raw_data: bytes) -> Message:
     """
     Args:
         raw_data: QUIC message without public header.
+
+    Raises:
+        ValueError: if message is truncated or tag index is malformed.
     """
     msg = Message()
     msg.tag = raw_data[:4]
-
-    tag_count = (raw_data[5] << 8) | raw_data[4]
-    values_offset = 8 + tag_count * 8
-
-    value_positions = seq(values_offset) + tag_positions(tag_count)\
-        .map(lambda pos: int32_little_endian(pos + 4, raw_data))\
-        .map(partial(add, values_offset))
-
-    msg.tags = tag_positions(tag_count)\
-        .map(partial(tag_at, data=raw_data))\
-        .zip(value_positions\
-            .zip(value_positions.drop(1))\
-            .map(partial(tag_value_at, data=raw_data))
-        )\
-        .dict()
-
+    msg.tags = {tag: value.tobytes()
+        for tag, value in decode_tag_values(raw_data).items()}
     return msg
 
 
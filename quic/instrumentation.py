@@ -0,0 +1,194 @@
+"""Opt-in packet processing instrumentation.
+
+Metrics are kept in fixed size arrays: per stage call, error and byte
+counters and a latency histogram with power of two nanosecond buckets.
+Nothing is measured unless InstrumentedParser or wrapped functions are
+used, so the regular parsers carry no instrumentation overhead.
+"""
+
+from array import array
+from functools import wraps
+import json
+from time import perf_counter_ns
+from typing import Callable, Dict, List
+
+from quic.packet import PublicHeader, StreamFrameView, ViewParser
+
+
+STAGE_PUBLIC_HEADER = 0
+STAGE_PACKET_HASH = 1
+STAGE_HASH_VERIFY = 2
+STAGE_FRAME = 3
+STAGE_HANDSHAKE = 4
+
+STAGE_NAMES = ('public_header', 'packet_hash', 'hash_verify', 'frame',
+    'handshake')
+
+# Bucket i counts latencies of less than 2^i nanoseconds. The last bucket
+# also takes everything above 2^30 ns, roughly a second.
+HISTOGRAM_BUCKETS = 32
+
+
+class Metrics:
+    """Per stage counters and latency histograms."""
+
+    __slots__ = ('calls', 'errors', 'bytes', 'total_ns', 'histograms')
+
+    def __init__(self) -> None:
+        stages = len(STAGE_NAMES)
+        self.calls = array('Q', bytes(8 * stages))
+        self.errors = array('Q', bytes(8 * stages))
+        self.bytes = array('Q', bytes(8 * stages))
+        self.total_ns = array('Q', bytes(8 * stages))
+        self.histograms = array('Q', bytes(8 * stages * HISTOGRAM_BUCKETS))
+
+    def record(self, stage: int, elapsed_ns: int, size: int=0) -> None:
+        """Records a single stage run.
+
+        Args:
+            stage: one of STAGE_* constants.
+            elapsed_ns: how long the stage took.
+            size: number of bytes processed.
+        """
+        self.calls[stage] += 1
+        self.bytes[stage] += size
+        self.total_ns[stage] += elapsed_ns
+        bucket = elapsed_ns.bit_length()
+        if bucket >= HISTOGRAM_BUCKETS:
+            bucket = HISTOGRAM_BUCKETS - 1
+        self.histograms[stage * HISTOGRAM_BUCKETS + bucket] += 1
+
+    def record_error(self, stage: int) -> None:
+        self.errors[stage] += 1
+
+    def wrap(self, stage: int, func: Callable) -> Callable:
+        """Instruments function taking a data buffer as its first argument.
+
+        Returns:
+            function which records latency, processed bytes and errors of
+            every call, e.g.
+            metrics.wrap(STAGE_HANDSHAKE, decode_handshake_message).
+        """
+        @wraps(func)
+        def instrumented(data, *args, **kwargs):
+            started_at = perf_counter_ns()
+            try:
+                result = func(data, *args, **kwargs)
+            except Exception:
+                self.errors[stage] += 1
+                raise
+            self.record(stage, perf_counter_ns() - started_at, len(data))
+            return result
+        return instrumented
+
+    def reset(self) -> None:
+        for counters in (self.calls, self.errors, self.bytes, self.total_ns,
+                self.histograms):
+            counters[:] = array('Q', bytes(8 * len(counters)))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Returns:
+            copy of all the metrics keyed by stage name. Histogram buckets
+            are not cumulative.
+        """
+        return {
+            name: {
+                'calls': self.calls[stage],
+                'errors': self.errors[stage],
+                'bytes': self.bytes[stage],
+                'total_ns': self.total_ns[stage],
+                'histogram': self._histogram(stage),
+            }
+            for stage, name in enumerate(STAGE_NAMES)
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def to_prometheus(self, prefix: str='quic') -> str:
+        """Exports metrics in Prometheus text exposition format."""
+        lines = []
+        for metric, counters in (('calls_total', self.calls),
+                ('errors_total', self.errors),
+                ('bytes_total', self.bytes)):
+            name = '{}_stage_{}'.format(prefix, metric)
+            lines.append('# TYPE {} counter'.format(name))
+            for stage, stage_name in enumerate(STAGE_NAMES):
+                lines.append('{}{{stage="{}"}} {}'.format(name, stage_name,
+                    counters[stage]))
+
+        name = '{}_stage_duration_seconds'.format(prefix)
+        lines.append('# TYPE {} histogram'.format(name))
+        for stage, stage_name in enumerate(STAGE_NAMES):
+            cumulative = 0
+            for bucket, count in enumerate(self._histogram(stage)):
+                cumulative += count
+                if bucket == HISTOGRAM_BUCKETS - 1:
+                    break
+                lines.append('{}_bucket{{stage="{}",le="{:.9f}"}} {}'.format(
+                    name, stage_name, (1 << bucket) / 1e9, cumulative))
+            lines.append('{}_bucket{{stage="{}",le="+Inf"}} {}'.format(name,
+                stage_name, cumulative))
+            lines.append('{}_sum{{stage="{}"}} {:.9f}'.format(name,
+                stage_name, self.total_ns[stage] / 1e9))
+            lines.append('{}_count{{stage="{}"}} {}'.format(name, stage_name,
+                self.calls[stage]))
+        return '\n'.join(lines) + '\n'
+
+    def _histogram(self, stage: int) -> List[int]:
+        start = stage * HISTOGRAM_BUCKETS
+        return self.histograms[start:start + HISTOGRAM_BUCKETS].tolist()
+
+
+class InstrumentedParser(ViewParser):
+    """ViewParser which records metrics of every parsing stage."""
+
+    def __init__(self, data: bytes, metrics: Metrics) -> None:
+        super().__init__(data)
+        self.metrics = metrics
+
+    def parse_public_header(self) -> PublicHeader:
+        started_at = perf_counter_ns()
+        try:
+            header = super().parse_public_header()
+        except Exception:
+            self.metrics.record_error(STAGE_PUBLIC_HEADER)
+            raise
+        self.metrics.record(STAGE_PUBLIC_HEADER,
+            perf_counter_ns() - started_at, len(self.data))
+        return header
+
+    def parse_packet_hash(self) -> int:
+        started_at = perf_counter_ns()
+        try:
+            packet_hash = super().parse_packet_hash()
+        except Exception:
+            self.metrics.record_error(STAGE_PACKET_HASH)
+            raise
+        self.metrics.record(STAGE_PACKET_HASH,
+            perf_counter_ns() - started_at)
+        return packet_hash
+
+    def calc_packet_hash(self) -> int:
+        started_at = perf_counter_ns()
+        try:
+            packet_hash = super().calc_packet_hash()
+        except Exception:
+            self.metrics.record_error(STAGE_HASH_VERIFY)
+            raise
+        self.metrics.record(STAGE_HASH_VERIFY,
+            perf_counter_ns() - started_at, len(self.data))
+        return packet_hash
+
+    def parse_stream_frame_header(self) -> StreamFrameView:
+        started_at = perf_counter_ns()
+        try:
+            frame = super().parse_stream_frame_header()
+            size = frame.header_length + frame.data_length
+        except Exception:
+            self.metrics.record_error(STAGE_FRAME)
+            raise
+        self.metrics.record(STAGE_FRAME, perf_counter_ns() - started_at,
+            size)
+        return frame
@@ -1,7 +1,8 @@
 """Packet parsing and construction utilities."""
 
 from functools import reduce
-from typing import Tuple
+import struct
+from typing import Iterable, List, Sequence, Tuple, Union
 
 import fnv
 
@@ -16,26 +17,52 @@ PUBLIC_FLAG_PACKET_NUMBER_4_BYTE = 0x20
 PUBLIC_FLAG_PACKET_NUMBER_6_BYTE = 0x30
 
 PACKET_HASH_SIZE = 12 # bytes
+DIVERSIFICATION_NONCE_SIZE = 32 # bytes
+PACKET_HASH_MASK = (1 << PACKET_HASH_SIZE * 8) - 1
+
+FNV1A_128_OFFSET_BASIS = fnv.OFFSET_BASIS[128]
+FNV1A_128_PRIME = fnv.PRIMES[128]
+FNV1A_128_MASK = (1 << 128) - 1
 
 FRAME_FLAG_STREAM = 0x80
 FRAME_FLAG_STREAM_FINISHED = 0x40
 FRAME_FLAG_STREAM_DATA_LENGTH_PRESENT = 0x20
 FRAME_FLAG_STREAM_DATA_OFFSET_LENGTH = 0x1C
 FRAME_FLAG_STREAM_ID_LENGTH = 0x03
+FRAME_FLAG_ACK = 0x40
+
+FRAME_TYPE_PADDING = 0x00
+FRAME_TYPE_RST_STREAM = 0x01
+FRAME_TYPE_CONNECTION_CLOSE = 0x02
+FRAME_TYPE_GOAWAY = 0x03
+FRAME_TYPE_WINDOW_UPDATE = 0x04
+FRAME_TYPE_BLOCKED = 0x05
+FRAME_TYPE_STOP_WAITING = 0x06
+FRAME_TYPE_PING = 0x07
+
+
+DEFAULT_PUBLIC_FLAGS = PUBLIC_FLAG_VERSION \
+    | PUBLIC_FLAG_CONNECTION_ID_8_BYTES \
+    | PUBLIC_FLAG_DIVERSIFICATION_NONCE \
+    | PUBLIC_FLAG_PACKET_NUMBER_1_BYTE
 
 
 class PublicHeader:
     """Public QUIC packet header."""
 
-    def __init__(self):
-        self.public_flags = PUBLIC_FLAG_VERSION \
-            | PUBLIC_FLAG_CONNECTION_ID_8_BYTES \
-            | PUBLIC_FLAG_DIVERSIFICATION_NONCE \
-            | PUBLIC_FLAG_PACKET_NUMBER_1_BYTE
-        self.connection_id = b''
-        self.protocol_version = b'Q034'
-        self.diversification_nonces = []
-        self.packet_number = 0
+    __slots__ = ('public_flags', 'connection_id', 'protocol_version',
+        'diversification_nonces', 'packet_number')
+
+    def __init__(self, public_flags: int=DEFAULT_PUBLIC_FLAGS,
+            connection_id: Union[int, bytes]=b'',
+            protocol_version: bytes=b'Q034',
+            diversification_nonces: Sequence[bytes]=(),
+            packet_number: int=0) -> None:
+        self.public_flags = public_flags
+        self.connection_id = connection_id
+        self.protocol_version = protocol_version
+        self.diversification_nonces = diversification_nonces
+        self.packet_number = packet_number
 
     @property
     def has_version(self) -> bool:
@@ -61,27 +88,165 @@ class PublicHeader:
             + self.packet_number.to_bytes(1, byteorder='little')
         # TODO: get the actual packet number field length
 
+    def write_into(self, buff: bytearray, offset: int=0,
+            least_unacked: int=None) -> int:
+        """Serializes public header directly into the given buffer.
+
+        Connection ID, version and packet number are written according to
+        public flags. Diversification nonce is written only if the nonce
+        flag is set and header has a nonce. Clients used to set the flag
+        without sending one, so then the flag is cleared in the written
+        header, for peers not to read packet number as a nonce.
+
+        Args:
+            buff: writable buffer, e.g. bytearray of an outgoing packet.
+            offset: position in the buffer to write header at.
+            least_unacked: if given, the smallest packet number length able
+                to represent packet number to the peer which hasn't
+                acknowledged packets since least_unacked is picked and
+                public flags are updated accordingly.
+
+        Returns:
+            number of bytes written.
+
+        Raises:
+            ValueError: if header does not fit into the buffer, connection
+                ID bytes are not 8, version is not 4 or nonce is not 32
+                bytes long.
+        """
+        if least_unacked is not None:
+            self.public_flags = (self.public_flags & ~0x30) \
+                | _PACKET_NUMBER_FLAGS[packet_number_length_for(
+                    self.packet_number, least_unacked)]
+
+        flags = self.public_flags
+        nonce = b''.join(self.diversification_nonces) \
+            if flags & PUBLIC_FLAG_DIVERSIFICATION_NONCE else b''
+        if not nonce:
+            flags &= ~PUBLIC_FLAG_DIVERSIFICATION_NONCE
+        elif len(nonce) != DIVERSIFICATION_NONCE_SIZE:
+            raise ValueError('Diversification nonce must be {} bytes '
+                'long.'.format(DIVERSIFICATION_NONCE_SIZE))
+
+        has_connection_id = flags & PUBLIC_FLAG_CONNECTION_ID_8_BYTES
+        if has_connection_id and not isinstance(self.connection_id, int) \
+                and len(self.connection_id) != 8:
+            raise ValueError('Connection ID must be 8 bytes long, got '
+                '{}.'.format(len(self.connection_id)))
+        has_version = flags & PUBLIC_FLAG_VERSION
+        if has_version and len(self.protocol_version) != 4:
+            raise ValueError('Protocol version must be 4 bytes long, got '
+                '{}.'.format(len(self.protocol_version)))
+        packet_number_length = self.packet_number_length
+        size = 1 + (8 if has_connection_id else 0) \
+            + (4 if has_version else 0) + len(nonce) + packet_number_length
+        if offset + size > len(buff):
+            raise ValueError('Public header takes {} bytes, but only {} are '
+                'available in the buffer.'.format(size, len(buff) - offset))
+
+        buff[offset] = flags
+        position = offset + 1
+        if has_connection_id:
+            if isinstance(self.connection_id, int):
+                _UINT64.pack_into(buff, position, self.connection_id)
+            else:
+                buff[position:position + 8] = self.connection_id
+            position += 8
+        if has_version:
+            buff[position:position + 4] = self.protocol_version
+            position += 4
+        if nonce:
+            buff[position:position + len(nonce)] = nonce
+            position += len(nonce)
+
+        packet_number = self.packet_number \
+            & ((1 << 8 * packet_number_length) - 1)
+        if packet_number_length == 6:
+            _UINT48.pack_into(buff, position, packet_number & 0xffffffff,
+                packet_number >> 32)
+        else:
+            _PACKET_NUMBER_STRUCTS[packet_number_length].pack_into(buff,
+                position, packet_number)
+        return size
+
 
 class StreamFrameHeader:
-    id = 0
-    finish = False
-    has_data_length = False
-    data_length = 0
-    offset_length = 0
-    id_length = 0
+    """Stream frame header."""
+
+    __slots__ = ('id', 'finish', 'has_data_length', 'data_length',
+        'offset_length', 'id_length', 'offset')
+
+    def __init__(self, id: int=0, finish: bool=False,
+            has_data_length: bool=False, data_length: int=0,
+            offset_length: int=0, id_length: int=0, offset: int=0) -> None:
+        """
+        Args:
+            offset_length: 0 or 2 to 8 bytes.
+            offset: stream data offset.
+        """
+        self.id = id
+        self.finish = finish
+        self.has_data_length = has_data_length
+        self.data_length = data_length
+        self.offset_length = offset_length
+        self.id_length = id_length
+        self.offset = offset
 
     def to_bytes(self) -> bytes:
         """Serializes stream frame header to byte array."""
         buff = self._serialized_type_byte() \
             + self.id.to_bytes(self.id_length, byteorder='little') \
+            + self.offset.to_bytes(self.offset_length, byteorder='little')
 
         if self.has_data_length:
             buff += self.data_length.to_bytes(2, byteorder='little')
 
         return buff
 
+    @property
+    def length(self) -> int:
+        """
+        Returns:
+            serialized stream frame header length.
+        """
+        return 1 + self.id_length + self.offset_length \
+            + (2 if self.has_data_length else 0)
+
+    def write_into(self, buff: bytearray, offset: int=0) -> int:
+        """Serializes stream frame header directly into the given buffer.
+
+        Args:
+            buff: writable buffer, e.g. bytearray of an outgoing packet.
+            offset: position in the buffer to write header at.
+
+        Returns:
+            number of bytes written.
+
+        Raises:
+            ValueError: if header does not fit into the buffer.
+        """
+        size = self.length
+        if offset + size > len(buff):
+            raise ValueError('Stream frame header takes {} bytes, but only '
+                '{} are available in the buffer.'.format(size,
+                    len(buff) - offset))
+
+        buff[offset] = self._type_byte()
+        position = offset + 1
+        _write_uint(buff, position, self.id, self.id_length)
+        position += self.id_length
+        _write_uint(buff, position, self.offset, self.offset_length)
+        position += self.offset_length
+        if self.has_data_length:
+            _PACKET_NUMBER_STRUCTS[2].pack_into(buff, position,
+                self.data_length)
+        return size
+
     def _serialized_type_byte(self) -> bytes:
         """Serializes the stream frame type byte."""
+        return self._type_byte().to_bytes(1, byteorder='little')
+
+    def _type_byte(self) -> int:
         flags = FRAME_FLAG_STREAM
 
         if self.finish:
@@ -91,11 +256,12 @@ class StreamFrameHeader:
             flags |= FRAME_FLAG_STREAM_DATA_LENGTH_PRESENT
 
         if self.offset_length:
-            flags |= (self.offset_length << 2) & FRAME_FLAG_STREAM_DATA_OFFSET_LENGTH
+            flags |= ((self.offset_length - 1) << 2) \
+                & FRAME_FLAG_STREAM_DATA_OFFSET_LENGTH
 
         flags |= (self.id_length - 1) & FRAME_FLAG_STREAM_ID_LENGTH
 
-        return flags.to_bytes(1, byteorder='little')
+        return flags
 
 
 class Parser:
@@ -162,7 +328,11 @@ class Parser:
             'little'
         )
 
-        self.data_offset += 1 + header.id_length + header.offset_length
+        self.data_offset += 1 + header.id_length
+        offset_end = self.data_offset + header.offset_length
+        header.offset = int.from_bytes(self.data[self.data_offset:offset_end],
+            'little')
+        self.data_offset += header.offset_length
 
         if header.has_data_length:
             header.data_length = int.from_bytes(
@@ -182,10 +352,7 @@ class Parser:
             96 bit packet hash.
         """
         self._ensure_packet_hash_offset_is_set()
-        without_hash = bytes_excluded(self.data, self.packet_hash_offset,
-            PACKET_HASH_SIZE)
-        return fnv.ensure_bits_count(
-            fnv.hash(without_hash), PACKET_HASH_SIZE * 8)
+        return hash_packet(self.data, self.packet_hash_offset)
 
     def _parse_packet_number(self, data_offset:int,
             packet_number_length: int) -> int:
@@ -205,12 +372,317 @@ class Parser:
                 'Be sure to parse packet hash before calling this function.')
 
 
+class StreamFrameView:
+    """Lazily decoded stream frame backed by the packet buffer.
+
+    Header fields are decoded from the underlying buffer on access and frame
+    data is returned as a memoryview. Bytes are copied only when
+    data_bytes() is called.
+    """
+
+    __slots__ = ('_data', '_offset', '_type_byte')
+
+    def __init__(self, data: memoryview, offset: int) -> None:
+        """
+        Args:
+            data: packet buffer.
+            offset: position of the frame type byte in the buffer.
+        """
+        self._data = data
+        self._offset = offset
+        self._type_byte = data[offset]
+
+    @property
+    def finish(self) -> bool:
+        return bool(self._type_byte & FRAME_FLAG_STREAM_FINISHED)
+
+    @property
+    def has_data_length(self) -> bool:
+        return bool(self._type_byte & FRAME_FLAG_STREAM_DATA_LENGTH_PRESENT)
+
+    @property
+    def offset_length(self) -> int:
+        offset_length = (self._type_byte >> 2) & 7
+        if offset_length:
+            offset_length += 1
+        return offset_length
+
+    @property
+    def id_length(self) -> int:
+        return (self._type_byte & FRAME_FLAG_STREAM_ID_LENGTH) + 1
+
+    @property
+    def id(self) -> int:
+        start = self._offset + 1
+        return int.from_bytes(self._data[start:start + self.id_length],
+            'little')
+
+    @property
+    def offset(self) -> int:
+        """
+        Returns:
+            stream data offset.
+        """
+        start = self._offset + 1 + self.id_length
+        return int.from_bytes(self._data[start:start + self.offset_length],
+            'little')
+
+    @property
+    def data_length(self) -> int:
+        """
+        Returns:
+            stream data length. If frame has no data length field, data
+            extends to the end of the packet.
+        """
+        if not self.has_data_length:
+            return len(self._data) - self._offset - self.header_length
+
+        start = self._offset + 1 + self.id_length + self.offset_length
+        return int.from_bytes(self._data[start:start + 2], 'little')
+
+    @property
+    def header_length(self) -> int:
+        """
+        Returns:
+            how many bytes frame header takes including frame type byte.
+        """
+        length = 1 + self.id_length + self.offset_length
+        if self.has_data_length:
+            length += 2
+        return length
+
+    @property
+    def data(self) -> memoryview:
+        """
+        Returns:
+            stream data without copying it.
+        """
+        start = self._offset + self.header_length
+        return self._data[start:start + self.data_length]
+
+    def data_bytes(self) -> bytes:
+        """
+        Returns:
+            a copy of stream data.
+        """
+        return self.data.tobytes()
+
+
+class ViewParser(Parser):
+    """Zero-copy QUIC packet parser.
+
+    Datagram is wrapped in a memoryview, so parsed header fields are views
+    into the datagram rather than fresh bytes objects.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        """
+        Args:
+            data: UDP datagram. Any object supporting buffer protocol.
+        """
+        super().__init__(memoryview(data))
+
+    def parse_stream_frame_header(self) -> StreamFrameView:
+        """Advances data offset pointer to stream frame data.
+
+        Returns:
+            lazily decoded stream frame.
+        """
+        frame = StreamFrameView(self.data, self.data_offset)
+        self.data_offset += frame.header_length
+        return frame
+
+    def payload(self) -> memoryview:
+        """
+        Returns:
+            packet data starting from the current data offset.
+        """
+        return self.data[self.data_offset:]
+
+
+class PacketHasher:
+    """Incremental FNV-1a 128 bit hasher.
+
+    Produces the same values as fnv.hash() but is fed buffer by buffer,
+    so packet regions don't need to be concatenated before hashing.
+    """
+
+    def __init__(self, state: int=FNV1A_128_OFFSET_BASIS) -> None:
+        """
+        Args:
+            state: intermediate 128 bit hash value to continue from.
+        """
+        self.state = state
+
+    def update(self, data: bytes) -> 'PacketHasher':
+        """Feeds bytes to the hasher.
+
+        Args:
+            data: any object supporting buffer protocol.
+        """
+        self.state = _fnv1a_128(data, self.state)
+        return self
+
+    def update_zeros(self, count: int) -> 'PacketHasher':
+        """Feeds count 0x00 bytes to the hasher in constant time.
+
+        XOR with zero is a no-op, so hashing a run of zeros is a single
+        multiplication by the FNV prime raised to the run length.
+        """
+        self.state = (self.state * _fnv1a_128_prime_power(count)) \
+            & FNV1A_128_MASK
+        return self
+
+    def copy(self) -> 'PacketHasher':
+        return PacketHasher(self.state)
+
+    def digest(self) -> int:
+        """
+        Returns:
+            96 bit packet hash of the data fed so far.
+        """
+        return self.state & PACKET_HASH_MASK
+
+
+def hash_packet(data: bytes, hash_offset: int) -> int:
+    """Calculates packet hash skipping the hash field itself.
+
+    Bytes on either side of the hash field are hashed in place, without
+    building a copy of the packet.
+
+    Args:
+        data: QUIC packet.
+        hash_offset: position of the 12 byte packet hash field.
+
+    Returns:
+        96 bit packet hash.
+    """
+    view = memoryview(data)
+    state = _fnv1a_128(view[:hash_offset], FNV1A_128_OFFSET_BASIS)
+    state = _fnv1a_128(view[hash_offset + PACKET_HASH_SIZE:], state)
+    return state & PACKET_HASH_MASK
+
+
+def packet_number_length_for(packet_number: int, least_unacked: int) -> int:
+    """Picks the shortest packet number encoding peer can decode.
+
+    Peer reconstructs the full packet number from the one closest to the
+    largest it has seen, so the encoding has to cover twice the number of
+    packets in flight.
+
+    Args:
+        packet_number: packet number to encode.
+        least_unacked: the smallest packet number not acknowledged by peer.
+
+    Returns:
+        1, 2, 4 or 6 bytes.
+    """
+    range_needed = 2 * max(packet_number - least_unacked, 1)
+    for length in _PACKET_NUMBER_LENGTHS:
+        if range_needed < 1 << 8 * length:
+            return length
+    return _PACKET_NUMBER_LENGTHS[-1]
+
+
+def verify_many(packets: Iterable[bytes]) -> List[bool]:
+    """Verifies packet hashes of multiple packets.
+
+    Packets are expected to have public header layout understood by
+    Parser.parse_public_header() with packet hash following it.
+
+    Returns:
+        for every packet whether its hash field matches the content.
+    """
+    results = []
+    for packet in packets:
+        hash_offset = 13 + _PACKET_NUMBER_LENGTHS[(packet[0] & 0x30) >> 4]
+        if len(packet) < hash_offset + PACKET_HASH_SIZE:
+            results.append(False)
+            continue
+
+        expected = int.from_bytes(
+            packet[hash_offset:hash_offset + PACKET_HASH_SIZE], 'little')
+        results.append(hash_packet(packet, hash_offset) == expected)
+
+    return results
+
+
 def frame_type(frame_type_byte: int) -> str:
-    """Identifies frame type from frame type byte."""
-    if frame_type_byte >> 7 == 1:
-        return 'STREAM'
+    """Identifies frame type from frame type byte.
+
+    Returns:
+        frame type name or None if type byte is not a known frame type.
+    """
+    return FRAME_TYPE_NAMES[frame_type_byte]
 
 
 def bytes_excluded(data: bytes, start: int, length: int) -> bytes:
     """Excludes the specified bytes region and returns what's left."""
     return data[:start] + data[start + length:]
+
+
+def _frame_type_name(frame_type_byte: int) -> str:
+    if frame_type_byte & FRAME_FLAG_STREAM:
+        return 'STREAM'
+    if frame_type_byte & FRAME_FLAG_ACK:
+        return 'ACK'
+    return _REGULAR_FRAME_TYPE_NAMES.get(frame_type_byte)
+
+
+_REGULAR_FRAME_TYPE_NAMES = {
+    FRAME_TYPE_PADDING: 'PADDING',
+    FRAME_TYPE_RST_STREAM: 'RST_STREAM',
+    FRAME_TYPE_CONNECTION_CLOSE: 'CONNECTION_CLOSE',
+    FRAME_TYPE_GOAWAY: 'GOAWAY',
+    FRAME_TYPE_WINDOW_UPDATE: 'WINDOW_UPDATE',
+    FRAME_TYPE_BLOCKED: 'BLOCKED',
+    FRAME_TYPE_STOP_WAITING: 'STOP_WAITING',
+    FRAME_TYPE_PING: 'PING',
+}
+
+# Frame type names indexed by frame type byte.
+FRAME_TYPE_NAMES = tuple(map(_frame_type_name, range(256)))
+
+_PACKET_NUMBER_LENGTHS = (1, 2, 4, 6)
+_PACKET_NUMBER_FLAGS = {
+    1: PUBLIC_FLAG_PACKET_NUMBER_1_BYTE,
+    2: PUBLIC_FLAG_PACKET_NUMBER_2_BYTE,
+    4: PUBLIC_FLAG_PACKET_NUMBER_4_BYTE,
+    6: PUBLIC_FLAG_PACKET_NUMBER_6_BYTE,
+}
+_PACKET_NUMBER_STRUCTS = {
+    1: struct.Struct('<B'),
+    2: struct.Struct('<H'),
+    4: struct.Struct('<I'),
+}
+_UINT48 = struct.Struct('<IH')
+_UINT64 = struct.Struct('<Q')
+
+_FNV1A_128_PRIME_POWERS = {} # type: dict
+
+
+def _fnv1a_128(data: bytes, state: int, prime: int=FNV1A_128_PRIME,
+        mask: int=FNV1A_128_MASK) -> int:
+    """FNV-1a 128 bit inner loop.
+
+    Constants are bound as default arguments to make them fast locals.
+    """
+    for byte in data:
+        state = ((state ^ byte) * prime) & mask
+    return state
+
+
+def _fnv1a_128_prime_power(exponent: int) -> int:
+    """Returns FNV prime raised to the given power modulo 2^128."""
+    power = _FNV1A_128_PRIME_POWERS.get(exponent)
+    if power is None:
+        power = pow(FNV1A_128_PRIME, exponent, 1 << 128)
+        _FNV1A_128_PRIME_POWERS[exponent] = power
+    return power
+
+
+def _write_uint(buff: bytearray, position: int, value: int,
+        length: int) -> None:
+    """Writes little endian unsigned integer of any length up to 8 bytes."""
+    for i in range(length):
+        buff[position + i] = (value >> 8 * i) & 0xff
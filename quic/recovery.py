@@ -0,0 +1,362 @@
+"""Sent packet history, RTT estimation and loss detection.
+
+Sent packets are kept in a dict keyed by packet number, which also keeps
+them in the order they were sent, so acknowledging a packet is a single
+lookup and loss detection only walks the oldest packets. Loss detection,
+retransmission and ACK delay timers are scheduled on a shared TimerWheel
+rather than getting an event loop handle each.
+"""
+
+from typing import Any, Callable, Iterable, List, Tuple
+
+from quic.timers import TimerWheel
+
+
+INITIAL_RTT = 0.1
+# Smallest retransmission timeout variance allowance, in seconds.
+TIMER_GRANULARITY = 0.001
+MAX_ACK_DELAY = 0.025
+
+# Packet is lost once a packet sent that many packets later is acknowledged.
+PACKET_THRESHOLD = 3
+# Packet is lost once a later packet is acknowledged and it was sent that
+# many RTTs before.
+TIME_THRESHOLD = 9 / 8
+
+
+class RttEstimator:
+    """Smoothed round trip time and its variance."""
+
+    __slots__ = ('initial_rtt', 'latest', 'smoothed', 'variance', 'min_rtt')
+
+    def __init__(self, initial_rtt: float=INITIAL_RTT) -> None:
+        """
+        Args:
+            initial_rtt: RTT assumed until the first sample, in seconds.
+        """
+        self.initial_rtt = initial_rtt
+        self.latest = None # type: float
+        self.smoothed = None # type: float
+        self.variance = None # type: float
+        self.min_rtt = None # type: float
+
+    def update(self, sample: float, ack_delay: float=0.0) -> None:
+        """Adds RTT sample.
+
+        Args:
+            sample: time from sending a packet to receiving its ACK.
+            ack_delay: how long peer held the ACK back. It's subtracted
+                unless that would make the sample smaller than min RTT.
+        """
+        if self.min_rtt is None or sample < self.min_rtt:
+            self.min_rtt = sample
+        if sample - ack_delay >= self.min_rtt:
+            sample -= ack_delay
+        self.latest = sample
+
+        if self.smoothed is None:
+            self.smoothed = sample
+            self.variance = sample / 2
+        else:
+            self.variance = 3 / 4 * self.variance \
+                + 1 / 4 * abs(self.smoothed - sample)
+            self.smoothed = 7 / 8 * self.smoothed + 1 / 8 * sample
+
+    @property
+    def retransmission_timeout(self) -> float:
+        """
+        Returns:
+            time to wait for an ACK before retransmitting, without backoff.
+        """
+        if self.smoothed is None:
+            return 2 * self.initial_rtt
+        return self.smoothed + max(4 * self.variance, TIMER_GRANULARITY)
+
+
+class SentPacket:
+    """Sent packet waiting for acknowledgement."""
+
+    __slots__ = ('packet_number', 'sent_at', 'size', 'frames',
+        'retransmittable')
+
+    def __init__(self, packet_number: int, sent_at: float, size: int,
+            frames: Any=None, retransmittable: bool=True) -> None:
+        """
+        Args:
+            packet_number: packet number.
+            sent_at: clock time the packet was sent at.
+            size: packet size in bytes.
+            frames: whatever the sender needs to retransmit packet
+                contents, e.g. builder.StreamData.
+            retransmittable: whether packet carries frames which must be
+                retransmitted if lost. Packets with only ACK or PADDING
+                frames don't.
+        """
+        self.packet_number = packet_number
+        self.sent_at = sent_at
+        self.size = size
+        self.frames = frames
+        self.retransmittable = retransmittable
+
+
+class LossDetector:
+    """Sent packet history of a connection.
+
+    Packets are declared lost by packet or time threshold once later packets
+    are acknowledged, or when retransmission timeout expires with no ACK.
+    Lost packets are forgotten and handed to on_lost, which is expected to
+    send their frames again in new packets.
+    """
+
+    def __init__(self, timers: TimerWheel,
+            on_lost: Callable[[List[SentPacket]], None],
+            rtt: RttEstimator=None,
+            packet_threshold: int=PACKET_THRESHOLD,
+            time_threshold: float=TIME_THRESHOLD,
+            clock: Callable[[], float]=None) -> None:
+        """
+        Args:
+            timers: wheel loss detection and retransmission timers are
+                scheduled on.
+            on_lost: called with lost packets in the order they were sent.
+            rtt: RTT estimator updated with ACKs. Created if not given.
+            packet_threshold: packet reordering threshold.
+            time_threshold: time reordering threshold as a fraction of RTT.
+            clock: returns current time in seconds. Defaults to the timer
+                wheel clock.
+        """
+        self.timers = timers
+        self.on_lost = on_lost
+        self.rtt = rtt if rtt is not None else RttEstimator()
+        self.packet_threshold = packet_threshold
+        self.time_threshold = time_threshold
+        self.clock = clock or timers.clock
+
+        # Packets not acknowledged or declared lost yet by packet number.
+        self.sent = {} # type: dict
+        self.bytes_in_flight = 0
+        self.largest_sent = None # type: int
+        self.largest_acked = None # type: int
+        # Number of retransmission timeouts since the last ACK.
+        self.timeouts = 0
+
+        self._least_unacked = None # type: int
+        self._retransmittable = 0
+        self._last_retransmittable_sent_at = None # type: float
+        self._loss_time = None # type: float
+        self._timer = None
+
+    @property
+    def least_unacked(self) -> int:
+        """
+        Returns:
+            smallest packet number neither acknowledged nor declared lost,
+            or the next packet number if all are. None before the first
+            packet is sent.
+        """
+        return self._least_unacked
+
+    def on_packet_sent(self, packet_number: int, size: int, frames: Any=None,
+            retransmittable: bool=True) -> SentPacket:
+        """Records sent packet.
+
+        Packet numbers must increase.
+        """
+        now = self.clock()
+        packet = SentPacket(packet_number, now, size, frames,
+            retransmittable)
+        self.sent[packet_number] = packet
+        self.bytes_in_flight += size
+        self.largest_sent = packet_number
+        if self._least_unacked is None:
+            self._least_unacked = packet_number
+
+        if retransmittable:
+            self._retransmittable += 1
+            self._last_retransmittable_sent_at = now
+            if self._loss_time is None:
+                self._set_timer()
+        return packet
+
+    def on_ack_received(self, acked_ranges: Iterable[Tuple[int, int]],
+            ack_delay: float=0.0) -> List[SentPacket]:
+        """Processes ACK frame.
+
+        Args:
+            acked_ranges: inclusive (smallest, largest) acknowledged packet
+                number ranges in descending order, e.g.
+                frames.AckFrame.acked_ranges().
+            ack_delay: ACK delay reported by peer, in seconds.
+
+        Returns:
+            newly acknowledged packets.
+        """
+        now = self.clock()
+        sent = self.sent
+        acked = []
+        largest = None
+        for smallest, largest_in_range in acked_ranges:
+            if largest is None:
+                largest = largest_in_range
+            if self._least_unacked is None:
+                break
+            # Already acknowledged or lost packets are skipped without
+            # looking them up.
+            smallest = max(smallest, self._least_unacked)
+            largest_in_range = min(largest_in_range, self.largest_sent)
+            for packet_number in range(largest_in_range, smallest - 1, -1):
+                packet = sent.pop(packet_number, None)
+                if packet is not None:
+                    acked.append(packet)
+                    self._forget(packet)
+        if not acked:
+            return acked
+
+        acked.reverse()
+        if acked[-1].packet_number == largest:
+            self.rtt.update(now - acked[-1].sent_at, ack_delay)
+        if self.largest_acked is None or largest > self.largest_acked:
+            self.largest_acked = largest
+        self.timeouts = 0
+
+        self._advance_least_unacked()
+        self._detect_lost(now)
+        return acked
+
+    def clear(self) -> None:
+        """Forgets all sent packets and cancels the timer."""
+        self.sent.clear()
+        self.bytes_in_flight = 0
+        self._retransmittable = 0
+        self._loss_time = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.largest_sent is not None:
+            self._least_unacked = self.largest_sent + 1
+
+    def _forget(self, packet: SentPacket) -> None:
+        self.bytes_in_flight -= packet.size
+        if packet.retransmittable:
+            self._retransmittable -= 1
+
+    def _advance_least_unacked(self) -> None:
+        """Amortized O(1): every packet number is passed once."""
+        packet_number = self._least_unacked
+        while packet_number <= self.largest_sent \
+                and packet_number not in self.sent:
+            packet_number += 1
+        self._least_unacked = packet_number
+
+    def _detect_lost(self, now: float) -> None:
+        rtt = self.rtt
+        loss_delay = self.time_threshold * max(
+            rtt.latest or rtt.initial_rtt, rtt.smoothed or rtt.initial_rtt)
+        lost_before = now - loss_delay
+        lost_packet_number = self.largest_acked - self.packet_threshold
+
+        lost = []
+        self._loss_time = None
+        for packet_number, packet in self.sent.items():
+            if packet_number > self.largest_acked:
+                break
+            if packet_number <= lost_packet_number \
+                    or packet.sent_at <= lost_before:
+                lost.append(packet)
+            else:
+                self._loss_time = packet.sent_at + loss_delay
+                break
+
+        self._declare_lost(lost)
+        self._set_timer()
+
+    def _declare_lost(self, lost: List[SentPacket]) -> None:
+        if not lost:
+            return
+        for packet in lost:
+            del self.sent[packet.packet_number]
+            self._forget(packet)
+        self._advance_least_unacked()
+        self.on_lost(lost)
+
+    def _set_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._loss_time is not None:
+            self._timer = self.timers.call_at(self._loss_time,
+                self._on_loss_timeout)
+        elif self._retransmittable:
+            timeout = self.rtt.retransmission_timeout * 2 ** self.timeouts
+            self._timer = self.timers.call_at(
+                self._last_retransmittable_sent_at + timeout,
+                self._on_retransmission_timeout)
+
+    def _on_loss_timeout(self) -> None:
+        self._timer = None
+        self._detect_lost(self.clock())
+
+    def _on_retransmission_timeout(self) -> None:
+        """Declares all retransmittable packets lost and backs off."""
+        self._timer = None
+        self.timeouts += 1
+        lost = [packet for packet in self.sent.values()
+            if packet.retransmittable]
+        self._declare_lost(lost)
+        self._set_timer()
+
+
+class DelayedAck:
+    """Decides when to send ACK frames for received packets.
+
+    Every other retransmittable packet is acknowledged right away, others
+    after at most max ACK delay, so a single ACK often covers several
+    packets.
+    """
+
+    def __init__(self, timers: TimerWheel, send_ack: Callable[[], None],
+            max_ack_delay: float=MAX_ACK_DELAY, ack_every: int=2) -> None:
+        """
+        Args:
+            timers: wheel ACK delay timer is scheduled on.
+            send_ack: sends ACK frame, e.g. built with
+                ack.ReceivedPackets.ack_frame().
+            max_ack_delay: longest time an ACK is held back, in seconds.
+            ack_every: number of retransmittable packets acknowledged
+                immediately.
+        """
+        self.timers = timers
+        self.send_ack = send_ack
+        self.max_ack_delay = max_ack_delay
+        self.ack_every = ack_every
+
+        self.unacked = 0
+        self._timer = None
+
+    def on_packet_received(self, retransmittable: bool=True) -> None:
+        """
+        Args:
+            retransmittable: whether packet must be acknowledged. Packets
+                with only ACK frames are acknowledged along with others.
+        """
+        if not retransmittable:
+            return
+
+        self.unacked += 1
+        if self.unacked >= self.ack_every:
+            self._send()
+        elif self._timer is None:
+            self._timer = self.timers.call_later(self.max_ack_delay,
+                self._send)
+
+    def on_ack_sent(self) -> None:
+        """Resets the state when ACK was sent along with other frames."""
+        self.unacked = 0
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _send(self) -> None:
+        self.on_ack_sent()
+        self.send_ack()
@@ -0,0 +1,431 @@
+"""Replays captured QUIC traffic through the packet and handshake parsers.
+
+Captures are memory mapped and UDP payloads are handed to the parsers as
+memoryviews over the mapping, so multi-gigabyte captures are replayed
+without reading them into memory. Two capture formats are supported:
+
+* pcap - classic libpcap files with Ethernet, Linux cooked, raw IP or BSD
+  loopback link layer.
+* raw dump - UDP payloads each prefixed with 32 bit little endian length.
+
+Usage:
+    python -m quic.replay capture.pcap [--processes 4]
+"""
+
+import argparse
+from collections import Counter
+import mmap
+import multiprocessing
+import struct
+import time
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from quic.handshake import decode_handshake_message
+from quic.packet import ViewParser, FRAME_FLAG_STREAM
+
+
+FORMAT_PCAP = 'pcap'
+FORMAT_RAW = 'raw'
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+# Stream which carries crypto handshake messages.
+CRYPTO_STREAM_ID = 1
+
+_PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': '<',
+    b'\xa1\xb2\xc3\xd4': '>',
+    # Nanosecond timestamp resolution.
+    b'\x4d\x3c\xb2\xa1': '<',
+    b'\xa1\xb2\x3c\x4d': '>',
+}
+_PCAP_HEADER_SIZE = 24
+_PCAP_RECORD_HEADER_SIZE = 16
+
+_RAW_RECORD_HEADER = struct.Struct('<I')
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86dd
+_ETHERTYPE_VLAN = (0x8100, 0x88a8)
+_IP_PROTO_UDP = 17
+_UINT16 = struct.Struct('!H')
+
+_COUNTERS = ('datagrams', 'bytes', 'invalid_packets', 'invalid_hashes',
+    'handshake_messages', 'handshake_errors')
+
+
+class ReplayStats:
+    """Counters collected while replaying a capture."""
+
+    __slots__ = ('datagrams', 'bytes', 'invalid_packets', 'invalid_hashes',
+        'handshake_messages', 'handshake_errors', 'versions', 'elapsed')
+
+    def __init__(self) -> None:
+        self.datagrams = 0
+        self.bytes = 0
+        self.invalid_packets = 0
+        self.invalid_hashes = 0
+        self.handshake_messages = 0
+        self.handshake_errors = 0
+        # Datagram count by protocol version, e.g. {'Q035': 10}.
+        self.versions = Counter() # type: Counter
+        self.elapsed = 0.0
+
+    def merge(self, other: 'ReplayStats') -> None:
+        """Adds counters of the other stats, e.g. from another process.
+
+        Elapsed time is not summed, since replays run concurrently.
+        """
+        for field in _COUNTERS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.versions.update(other.versions)
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+    @property
+    def datagrams_per_second(self) -> float:
+        return self.datagrams / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / self.elapsed / 1e6 if self.elapsed else 0.0
+
+    def to_dict(self) -> Dict:
+        stats = {field: getattr(self, field) for field in self.__slots__}
+        stats['versions'] = dict(self.versions)
+        stats['datagrams_per_second'] = self.datagrams_per_second
+        stats['megabytes_per_second'] = self.megabytes_per_second
+        return stats
+
+
+class Capture:
+    """Memory mapped pcap file or raw datagram dump."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Raises:
+            ValueError: if file is empty or its pcap link type is not
+                supported.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._mmap)
+
+        self.link_type = None # type: int
+        byteorder = _PCAP_MAGIC.get(bytes(self.data[:4]))
+        if byteorder is None:
+            self.format = FORMAT_RAW
+            self.data_offset = 0
+        else:
+            self.format = FORMAT_PCAP
+            self.data_offset = _PCAP_HEADER_SIZE
+            self._record_header = struct.Struct(byteorder + '8xII')
+            self.link_type = struct.unpack_from(byteorder + 'I', self.data,
+                20)[0]
+            if self.link_type not in _LINK_LAYER_PARSERS:
+                raise ValueError('Unsupported pcap link type {}.'.format(
+                    self.link_type))
+
+    def datagrams(self, start: int=None,
+            end: int=None) -> Iterator[memoryview]:
+        """Iterates UDP payloads without copying them.
+
+        Every view is released when the next one is requested, so consumed
+        datagrams don't keep the file mapped. Copy datagrams to keep them.
+
+        Args:
+            start: offset of the first record. Must be a record boundary,
+                as returned by split(). Defaults to the first record.
+            end: offset to stop at. Defaults to the end of file.
+
+        Raises:
+            ValueError: if a record is truncated.
+        """
+        if self.format == FORMAT_RAW:
+            return self._raw_datagrams(start or 0, end)
+        return self._pcap_datagrams(start or self.data_offset, end)
+
+    def split(self, parts: int) -> List[Tuple[int, int]]:
+        """Splits capture into roughly equal ranges on record boundaries.
+
+        Only record headers are read to find the boundaries.
+
+        Returns:
+            (start, end) offsets of at most parts ranges.
+        """
+        size = len(self.data)
+        part_size = max((size - self.data_offset) // parts, 1)
+        boundaries = [self.data_offset]
+        next_boundary = self.data_offset + part_size
+        for offset in self._record_offsets():
+            if offset >= next_boundary and offset < size:
+                boundaries.append(offset)
+                next_boundary = offset + part_size
+        boundaries.append(size)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def close(self) -> None:
+        """Unmaps the file.
+
+        Raises:
+            BufferError: if datagram views are still referenced.
+        """
+        self.data.release()
+        self._mmap.close()
+
+    def __enter__(self) -> 'Capture':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+            return
+
+        # Traceback frames may still reference datagram views, which must
+        # not mask the original error. The mapping is then closed when the
+        # views are garbage collected.
+        try:
+            self.close()
+        except BufferError:
+            pass
+
+    def _records(self, start: int, end: int, header_size: int,
+            record_length) -> Iterator[Tuple[int, int]]:
+        """Walks records yielding their data start and end offsets."""
+        data = self.data
+        end = len(data) if end is None else end
+        offset = start
+        while offset < end:
+            if offset + header_size > len(data):
+                raise ValueError('Record header at {} is truncated.'.format(
+                    offset))
+            data_start = offset + header_size
+            offset = data_start + record_length(data, offset)
+            if offset > len(data):
+                raise ValueError('Record at {} is truncated.'.format(
+                    data_start - header_size))
+            yield data_start, offset
+
+    def _record_offsets(self) -> Iterator[int]:
+        if self.format == FORMAT_RAW:
+            records = self._records(0, None, _RAW_RECORD_HEADER.size,
+                _raw_record_length)
+        else:
+            records = self._records(self.data_offset, None,
+                _PCAP_RECORD_HEADER_SIZE, self._pcap_record_length)
+        for _, record_end in records:
+            yield record_end
+
+    def _raw_datagrams(self, start: int,
+            end: Optional[int]) -> Iterator[memoryview]:
+        data = self.data
+        for record_start, record_end in self._records(start, end,
+                _RAW_RECORD_HEADER.size, _raw_record_length):
+            datagram = data[record_start:record_end]
+            yield datagram
+            datagram.release()
+
+    def _pcap_datagrams(self, start: int,
+            end: Optional[int]) -> Iterator[memoryview]:
+        data = self.data
+        udp_payload = _LINK_LAYER_PARSERS[self.link_type]
+        for record_start, record_end in self._records(start, end,
+                _PCAP_RECORD_HEADER_SIZE, self._pcap_record_length):
+            frame = data[record_start:record_end]
+            payload = udp_payload(frame)
+            if payload is not None:
+                yield payload
+                payload.release()
+            frame.release()
+
+    def _pcap_record_length(self, data: memoryview, offset: int) -> int:
+        return self._record_header.unpack_from(data, offset)[0]
+
+
+def write_raw_dump(f: BinaryIO, datagrams: Iterable[bytes]) -> None:
+    """Writes datagrams in raw dump format Capture reads."""
+    for datagram in datagrams:
+        f.write(_RAW_RECORD_HEADER.pack(len(datagram)))
+        f.write(datagram)
+
+
+def replay(datagrams: Iterable[memoryview]) -> ReplayStats:
+    """Runs datagrams through packet and handshake message parsers.
+
+    Every datagram gets its public header parsed and packet hash verified.
+    Datagrams starting a crypto stream frame at stream offset 0 also get
+    the handshake message decoded.
+    """
+    stats = ReplayStats()
+    versions = stats.versions
+    started_at = time.perf_counter()
+    for datagram in datagrams:
+        stats.datagrams += 1
+        stats.bytes += len(datagram)
+
+        parser = ViewParser(datagram)
+        try:
+            header = parser.parse_public_header()
+            packet_hash = parser.parse_packet_hash()
+        except (IndexError, ValueError):
+            stats.invalid_packets += 1
+            continue
+        # Parser doesn't check bounds, short packets yield short fields.
+        if parser.data_offset > len(datagram):
+            stats.invalid_packets += 1
+            continue
+        hash_is_valid = packet_hash == parser.calc_packet_hash()
+
+        if header.has_version:
+            versions[str(header.protocol_version, 'ascii', 'replace')] += 1
+        if not hash_is_valid:
+            stats.invalid_hashes += 1
+            continue
+
+        if parser.data_offset < len(datagram) \
+                and datagram[parser.data_offset] & FRAME_FLAG_STREAM:
+            _replay_handshake_message(parser, stats)
+
+    stats.elapsed = time.perf_counter() - started_at
+    return stats
+
+
+def replay_file(path: str, processes: int=1) -> ReplayStats:
+    """Replays capture file optionally splitting it across processes.
+
+    Every process maps the file itself and replays its own range of
+    records, only the stats are sent back.
+    """
+    started_at = time.perf_counter()
+    with Capture(path) as capture:
+        ranges = capture.split(processes) if processes > 1 \
+            else [(None, None)]
+    if len(ranges) == 1:
+        stats = _replay_range(path, *ranges[0])
+    else:
+        stats = ReplayStats()
+        context = multiprocessing.get_context('fork')
+        with context.Pool(len(ranges)) as pool:
+            for range_stats in pool.starmap(_replay_range,
+                    [(path, start, end) for start, end in ranges]):
+                stats.merge(range_stats)
+
+    stats.elapsed = time.perf_counter() - started_at
+    return stats
+
+
+def _replay_range(path: str, start: Optional[int],
+        end: Optional[int]) -> ReplayStats:
+    with Capture(path) as capture:
+        return replay(capture.datagrams(start, end))
+
+
+def _replay_handshake_message(parser: ViewParser, stats: ReplayStats) -> None:
+    try:
+        frame = parser.parse_stream_frame_header()
+        if frame.id != CRYPTO_STREAM_ID or frame.offset != 0:
+            return
+        decode_handshake_message(frame.data)
+    except (IndexError, ValueError, struct.error):
+        stats.handshake_errors += 1
+        return
+    stats.handshake_messages += 1
+
+
+def _raw_record_length(data: memoryview, offset: int) -> int:
+    return _RAW_RECORD_HEADER.unpack_from(data, offset)[0]
+
+
+def _ethernet_payload(frame: memoryview) -> Optional[memoryview]:
+    offset = 12
+    if len(frame) < offset + 2:
+        return None
+    ethertype = _UINT16.unpack_from(frame, offset)[0]
+    while ethertype in _ETHERTYPE_VLAN and len(frame) >= offset + 6:
+        offset += 4
+        ethertype = _UINT16.unpack_from(frame, offset)[0]
+    return _ip_payload(frame[offset + 2:], ethertype)
+
+
+def _linux_sll_payload(frame: memoryview) -> Optional[memoryview]:
+    if len(frame) < 16:
+        return None
+    return _ip_payload(frame[16:], _UINT16.unpack_from(frame, 14)[0])
+
+
+def _raw_ip_payload(frame: memoryview) -> Optional[memoryview]:
+    return _ip_payload(frame, None)
+
+
+def _null_payload(frame: memoryview) -> Optional[memoryview]:
+    return _ip_payload(frame[4:], None)
+
+
+def _ip_payload(packet: memoryview,
+        ethertype: Optional[int]) -> Optional[memoryview]:
+    """Extracts UDP payload from IPv4 or IPv6 packet.
+
+    Args:
+        ethertype: IP version is taken from the packet itself if None.
+
+    Returns:
+        UDP payload or None if packet is not an unfragmented UDP datagram.
+    """
+    if not packet:
+        return None
+
+    version = packet[0] >> 4
+    if (ethertype == _ETHERTYPE_IPV4 or ethertype is None) and version == 4:
+        if len(packet) < 20:
+            return None
+        header_length = (packet[0] & 0x0f) * 4
+        total_length = _UINT16.unpack_from(packet, 2)[0]
+        fragment = _UINT16.unpack_from(packet, 6)[0]
+        if packet[9] != _IP_PROTO_UDP or fragment & 0x3fff:
+            return None
+        udp = packet[header_length:total_length]
+    elif (ethertype == _ETHERTYPE_IPV6 or ethertype is None) and version == 6:
+        if len(packet) < 40 or packet[6] != _IP_PROTO_UDP:
+            return None
+        udp = packet[40:40 + _UINT16.unpack_from(packet, 4)[0]]
+    else:
+        return None
+
+    if len(udp) < 8:
+        return None
+    return udp[8:_UINT16.unpack_from(udp, 4)[0]]
+
+
+_LINK_LAYER_PARSERS = {
+    LINKTYPE_NULL: _null_payload,
+    LINKTYPE_ETHERNET: _ethernet_payload,
+    LINKTYPE_RAW: _raw_ip_payload,
+    LINKTYPE_LINUX_SLL: _linux_sll_payload,
+}
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(
+        description='Replays captured QUIC traffic through the parsers.')
+    arg_parser.add_argument('capture', help='pcap file or raw dump')
+    arg_parser.add_argument('--processes', type=int, default=1,
+        help='split capture across this many processes')
+    args = arg_parser.parse_args()
+
+    stats = replay_file(args.capture, args.processes)
+    print('{} datagrams, {} bytes in {:.3f} s: {:.0f} datagrams/s, '
+        '{:.1f} MB/s'.format(stats.datagrams, stats.bytes, stats.elapsed,
+            stats.datagrams_per_second, stats.megabytes_per_second))
+    print('invalid packets: {}, invalid hashes: {}'.format(
+        stats.invalid_packets, stats.invalid_hashes))
+    print('handshake messages: {}, handshake errors: {}'.format(
+        stats.handshake_messages, stats.handshake_errors))
+    for version, count in stats.versions.most_common():
+        print('{}: {}'.format(version, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Batched UDP socket I/O.
+
+Received datagrams are read into a preallocated ring of buffers and handed
+out as memoryviews, which ViewParser wraps without copying. Outgoing
+datagrams are queued and flushed in batches, coalescing runs of equally
+sized datagrams to the same address into a single UDP GSO send where the
+kernel supports it.
+"""
+
+import errno
+import socket
+import struct
+from typing import List, Tuple
+
+
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+# Kernel limits on a single UDP GSO send.
+GSO_MAX_SEGMENTS = 64
+GSO_MAX_SIZE = 65507
+
+_SEGMENT_SIZE = struct.Struct('H')
+
+
+class ReceiveRing:
+    """Ring of preallocated receive buffers.
+
+    Every slot is a fixed size region of a single bytearray. A view handed
+    out by receive() stays valid until its slot is reused, i.e. for the
+    next slots - 1 received datagrams. Slots have a spare byte, so a
+    datagram filling it is known to be longer than slot size and dropped,
+    since a truncated packet fails hash check anyway.
+    """
+
+    def __init__(self, sock: socket.socket, slots: int=64,
+            slot_size: int=1500) -> None:
+        """
+        Args:
+            sock: non-blocking UDP socket.
+            slots: number of receive buffers.
+            slot_size: maximum datagram size. Longer datagrams are
+                dropped and counted in truncated.
+        """
+        self.sock = sock
+        self.slot_size = slot_size
+        # Spare byte per slot reveals truncated datagrams.
+        stride = slot_size + 1
+        self._buffer = bytearray(slots * stride)
+        view = memoryview(self._buffer)
+        self._slots = [view[i * stride:(i + 1) * stride]
+            for i in range(slots)]
+        self._next_slot = 0
+
+        self.truncated = 0
+
+    def receive(self, max_datagrams: int=None) \
+            -> List[Tuple[memoryview, Tuple[str, int]]]:
+        """Reads datagrams until socket has no more or batch is full.
+
+        Args:
+            max_datagrams: batch size. Can not exceed slot count, which is
+                the default.
+
+        Returns:
+            received datagram views and their source addresses.
+        """
+        slots = self._slots
+        max_datagrams = min(max_datagrams or len(slots), len(slots))
+        recvfrom_into = self.sock.recvfrom_into
+        slot_size = self.slot_size
+        next_slot = self._next_slot
+
+        datagrams = []
+        while len(datagrams) < max_datagrams:
+            slot = slots[next_slot]
+            try:
+                size, address = recvfrom_into(slot)
+            except (BlockingIOError, InterruptedError):
+                break
+            if size > slot_size:
+                # Slot is free to take the next datagram.
+                self.truncated += 1
+                continue
+            datagrams.append((slot[:size], address))
+            next_slot += 1
+            if next_slot == len(slots):
+                next_slot = 0
+
+        self._next_slot = next_slot
+        return datagrams
+
+
+class SendBatcher:
+    """Queues outgoing datagrams and sends them in batches.
+
+    Consecutive datagrams to the same address are coalesced into one
+    sendmsg() with UDP_SEGMENT control message when all but the last one
+    have the same size. Datagram buffers are gathered by the kernel, they
+    are not concatenated. If the kernel rejects GSO, batcher falls back to
+    one sendto() per datagram.
+
+    syscalls counts send calls which passed datagrams to the kernel, so a
+    GSO send rejected by the kernel is not counted, its fallback sends are.
+    """
+
+    def __init__(self, sock: socket.socket, use_gso: bool=True) -> None:
+        """
+        Args:
+            sock: UDP socket.
+            use_gso: whether to try UDP generic segmentation offload.
+        """
+        self.sock = sock
+        self.use_gso = use_gso
+        self._queue = [] # type: List[Tuple[bytes, Tuple[str, int]]]
+
+        self.datagrams_sent = 0
+        self.syscalls = 0
+
+    def send(self, data: bytes, address: Tuple[str, int]) -> None:
+        """Queues datagram. It's sent on the next flush()."""
+        self._queue.append((data, address))
+
+    def flush(self) -> int:
+        """Sends all queued datagrams.
+
+        Returns:
+            number of datagrams sent. Datagrams that don't fit into socket
+            buffer are dropped.
+        """
+        queue = self._queue
+        self._queue = []
+
+        sent = 0
+        start = 0
+        while start < len(queue):
+            end = self._coalesced_run_end(queue, start) if self.use_gso \
+                else start + 1
+            if end - start > 1:
+                sent += self._send_segments(queue[start:end])
+            else:
+                sent += self._sendto(*queue[start])
+            start = end
+
+        self.datagrams_sent += sent
+        return sent
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def _coalesced_run_end(self, queue: List[Tuple[bytes, Tuple[str, int]]],
+            start: int) -> int:
+        """Finds where the run of datagrams coalescable with GSO ends."""
+        segment_size = len(queue[start][0])
+        address = queue[start][1]
+        total_size = segment_size
+        end = start + 1
+        while end < len(queue) and end - start < GSO_MAX_SEGMENTS:
+            data, next_address = queue[end]
+            if next_address != address or len(data) > segment_size \
+                    or total_size + len(data) > GSO_MAX_SIZE:
+                break
+            total_size += len(data)
+            end += 1
+            if len(data) < segment_size:
+                # Only the last segment may be shorter.
+                break
+        return end
+
+    def _send_segments(self,
+            datagrams: List[Tuple[bytes, Tuple[str, int]]]) -> int:
+        address = datagrams[0][1]
+        segment_size = len(datagrams[0][0])
+        try:
+            self.sock.sendmsg([data for data, _ in datagrams],
+                [(socket.SOL_UDP, UDP_SEGMENT,
+                    _SEGMENT_SIZE.pack(segment_size))], 0, address)
+        except (BlockingIOError, InterruptedError):
+            self.syscalls += 1
+            return 0
+        except OSError as e:
+            if e.errno not in (errno.EIO, errno.EINVAL, errno.ENOPROTOOPT,
+                    errno.EOPNOTSUPP):
+                raise
+            self.use_gso = False
+            return sum(self._sendto(data, address) for data, _ in datagrams)
+        self.syscalls += 1
+        return len(datagrams)
+
+    def _sendto(self, data: bytes, address: Tuple[str, int]) -> int:
+        self.syscalls += 1
+        try:
+            self.sock.sendto(data, address)
+        except (BlockingIOError, InterruptedError):
+            return 0
+        return 1
@@ -0,0 +1,247 @@
+"""Stream data reassembly.
+
+STREAM frames may arrive out of order, duplicated or overlapping. Received
+data is kept as sorted non-overlapping chunks. Every incoming frame is
+trimmed against the chunks already buffered, so each stream byte is copied
+exactly once no matter how many times it was retransmitted.
+"""
+
+from bisect import bisect_right
+from typing import List
+
+from quic.packet import StreamFrameView
+
+
+class BufferLimitExceeded(Exception):
+    """Stream data doesn't fit into stream window or connection budget."""
+
+
+class MemoryBudget:
+    """Memory limit shared by all stream buffers of a connection."""
+
+    __slots__ = ('limit', 'used')
+
+    def __init__(self, limit: int=16 * 1024 * 1024) -> None:
+        """
+        Args:
+            limit: maximum number of bytes buffered by all streams.
+        """
+        self.limit = limit
+        self.used = 0
+
+    def reserve(self, size: int) -> None:
+        """
+        Raises:
+            BufferLimitExceeded: if limit would be exceeded.
+        """
+        if self.used + size > self.limit:
+            raise BufferLimitExceeded(
+                'Connection buffer limit of {} bytes exceeded.'.format(
+                    self.limit))
+        self.used += size
+
+    def release(self, size: int) -> None:
+        self.used -= size
+
+    @property
+    def available(self) -> int:
+        return self.limit - self.used
+
+
+class ReassemblyBuffer:
+    """Per stream buffer which puts stream data back in order.
+
+    Data below read offset is considered delivered: frames carrying it are
+    ignored. Data above read offset + max_buffered is rejected, which bounds
+    stream memory the same way a flow control window does.
+    """
+
+    __slots__ = ('max_buffered', 'budget', 'read_offset', 'final_size',
+        'buffered', '_starts', '_chunks')
+
+    def __init__(self, max_buffered: int=1024 * 1024,
+            budget: MemoryBudget=None) -> None:
+        """
+        Args:
+            max_buffered: stream window size in bytes, counting from the
+                read offset.
+            budget: connection wide memory budget shared with other streams.
+        """
+        self.max_buffered = max_buffered
+        self.budget = budget
+        self.read_offset = 0
+        self.final_size = None # type: int
+        self.buffered = 0
+
+        # Sorted, non-overlapping and non-empty chunks. _starts[i] is the
+        # stream offset of _chunks[i].
+        self._starts = [] # type: List[int]
+        self._chunks = [] # type: List[memoryview]
+
+    def write(self, offset: int, data: bytes, finish: bool=False) -> int:
+        """Buffers stream data received at the given stream offset.
+
+        Args:
+            offset: stream offset of the first data byte.
+            data: any object supporting buffer protocol. Only the parts not
+                buffered or read yet are copied.
+            finish: whether data ends the stream.
+
+        Returns:
+            number of newly buffered bytes.
+
+        Raises:
+            BufferLimitExceeded: if data exceeds stream window or connection
+                budget. Nothing is buffered in that case.
+            ValueError: if data contradicts the known stream final size.
+        """
+        data = memoryview(data)
+        end = offset + len(data)
+        self._check_final_size(end, finish)
+
+        start = max(offset, self.read_offset)
+        if end <= start:
+            if finish:
+                self.final_size = end
+            return 0
+        if end > self.read_offset + self.max_buffered:
+            raise BufferLimitExceeded(
+                'Stream data at {}..{} exceeds stream window of {} bytes.'\
+                    .format(offset, end, self.max_buffered))
+
+        gaps = self._gaps(start, end)
+        new_size = sum(gap_end - gap_start for _, gap_start, gap_end in gaps)
+        if self.budget is not None and new_size:
+            self.budget.reserve(new_size)
+
+        # Insert in reverse order, so the earlier insertion indexes stay
+        # valid.
+        for index, gap_start, gap_end in reversed(gaps):
+            self._starts.insert(index, gap_start)
+            self._chunks.insert(index, memoryview(
+                data[gap_start - offset:gap_end - offset].tobytes()))
+        self.buffered += new_size
+        if finish:
+            self.final_size = end
+        return new_size
+
+    def write_frame(self, frame: StreamFrameView) -> int:
+        """Buffers STREAM frame data.
+
+        Returns:
+            number of newly buffered bytes.
+        """
+        return self.write(frame.offset, frame.data, frame.finish)
+
+    @property
+    def readable(self) -> int:
+        """
+        Returns:
+            number of contiguous bytes available at the read offset.
+        """
+        return sum(len(chunk) for chunk in self.peek())
+
+    def peek(self) -> List[memoryview]:
+        """
+        Returns:
+            views of contiguous data available at the read offset. Data is
+            not consumed. Views stay valid after the data is consumed.
+        """
+        views = []
+        expected = self.read_offset
+        for start, chunk in zip(self._starts, self._chunks):
+            if start != expected:
+                break
+            views.append(chunk)
+            expected += len(chunk)
+        return views
+
+    def consume(self, size: int) -> None:
+        """Advances read offset discarding the consumed data.
+
+        Raises:
+            ValueError: if less than size contiguous bytes are available.
+        """
+        if size > self.readable:
+            raise ValueError('Only {} contiguous bytes are available.'.format(
+                self.readable))
+
+        self.read_offset += size
+        self.buffered -= size
+        if self.budget is not None:
+            self.budget.release(size)
+
+        dropped = 0
+        while size:
+            chunk = self._chunks[dropped]
+            if len(chunk) > size:
+                self._chunks[dropped] = chunk[size:]
+                self._starts[dropped] += size
+                break
+            size -= len(chunk)
+            dropped += 1
+        del self._starts[:dropped]
+        del self._chunks[:dropped]
+
+    def read(self, size: int=-1) -> bytes:
+        """Reads and consumes contiguous data at the read offset.
+
+        Args:
+            size: maximum number of bytes to read. All available by default.
+        """
+        data = b''.join(self.peek())
+        if size >= 0:
+            data = data[:size]
+        self.consume(len(data))
+        return data
+
+    @property
+    def at_eof(self) -> bool:
+        """
+        Returns:
+            True if all the stream data up to the final size was read.
+        """
+        return self.read_offset == self.final_size
+
+    def clear(self) -> None:
+        """Discards all buffered data returning it to connection budget."""
+        if self.budget is not None:
+            self.budget.release(self.buffered)
+        self.buffered = 0
+        self._starts = []
+        self._chunks = []
+
+    def _check_final_size(self, end: int, finish: bool) -> None:
+        if self.final_size is None:
+            if finish:
+                highest = self._starts[-1] + len(self._chunks[-1]) \
+                    if self._chunks else self.read_offset
+                if end < highest:
+                    raise ValueError('Stream final size {} is below already '
+                        'received data.'.format(end))
+        elif end > self.final_size or (finish and end != self.final_size):
+            raise ValueError('Stream data at {} contradicts final size {}.'\
+                .format(end, self.final_size))
+
+    def _gaps(self, start: int, end: int) -> List[tuple]:
+        """Finds the parts of [start, end) which are not buffered yet.
+
+        Returns:
+            (insertion index, gap start, gap end) tuples in ascending order.
+        """
+        starts = self._starts
+        chunks = self._chunks
+        index = bisect_right(starts, start)
+        if index and starts[index - 1] + len(chunks[index - 1]) > start:
+            start = starts[index - 1] + len(chunks[index - 1])
+
+        gaps = []
+        while start < end:
+            if index == len(starts) or starts[index] >= end:
+                gaps.append((index, start, end))
+                break
+            if starts[index] > start:
+                gaps.append((index, start, starts[index]))
+            start = max(start, starts[index] + len(chunks[index]))
+            index += 1
+        return gaps
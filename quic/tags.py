@@ -1,6 +1,67 @@
-from collections import OrderedDict
+from bisect import bisect_left
+from copy import deepcopy
+from typing import Any, Callable, Dict, Iterator, Union, List, Tuple
 
-from typing import Iterator, Union, List, Tuple
+
+def tag_number(tag: Union[str, int]) -> int:
+    """Ensures that given tag name is integer.
+
+    If it's not integer, it's converted to one. Tag numbers are what tags
+    are ordered by. Well known tag names are looked up in a precomputed
+    table.
+    """
+    if type(tag) == str:
+        number = _TAG_NUMBERS.get(tag)
+        if number is None:
+            number = int.from_bytes(bytes(tag, 'ascii'), byteorder='little')
+        return number
+    return tag
+
+
+def tag_name(tag: int) -> str:
+    """Converts 32 bit tag number back to tag name."""
+    name = _TAG_NAMES.get(tag)
+    if name is None:
+        name = str(tag.to_bytes(4, byteorder='little'), 'ascii').rstrip('\x00')
+    return name
+
+
+_TAG_NUMBERS = {} # type: dict
+_TAG_NAMES = {} # type: dict
+
+
+def _well_known_tag(name: str) -> int:
+    number = tag_number(name)
+    _TAG_NUMBERS[name] = number
+    _TAG_NAMES[number] = name
+    return number
+
+
+AEAD = _well_known_tag('AEAD')
+CCRT = _well_known_tag('CCRT')
+CCS = _well_known_tag('CCS')
+CETV = _well_known_tag('CETV')
+CFCW = _well_known_tag('CFCW')
+COPT = _well_known_tag('COPT')
+CSCT = _well_known_tag('CSCT')
+CTIM = _well_known_tag('CTIM')
+ICSL = _well_known_tag('ICSL')
+KEXS = _well_known_tag('KEXS')
+MIDS = _well_known_tag('MIDS')
+MSPC = _well_known_tag('MSPC')
+NONC = _well_known_tag('NONC')
+NONP = _well_known_tag('NONP')
+PAD = _well_known_tag('PAD')
+PDMD = _well_known_tag('PDMD')
+PUBS = _well_known_tag('PUBS')
+SCID = _well_known_tag('SCID')
+SCLS = _well_known_tag('SCLS')
+SFCW = _well_known_tag('SFCW')
+SNI = _well_known_tag('SNI')
+STK = _well_known_tag('STK')
+UAID = _well_known_tag('UAID')
+VER = _well_known_tag('VER')
+XLCT = _well_known_tag('XLCT')
 
 
 class Container(dict):
@@ -8,8 +69,16 @@ class Container(dict):
 
     It keeps tags ordered in increasing order by tag name.
     Which is a 32 bit number.
+
+    Sorted tag numbers are maintained on insert and removal, so iteration
+    in tag order never re-sorts the container.
     """
+
+    __slots__ = ('_tags', '_items')
+
     def __init__(self, init_tags: dict=None) -> None:
+        self._tags = [] # type: List[int]
+        self._items = None # type: List[Tuple[int, bytes]]
         if init_tags:
             for key, value in init_tags.items():
                 self.__setitem__(key, value)
@@ -19,34 +88,109 @@ class Container(dict):
         Returns:
             tags key value pairs sorted by tag in ascending order.
         """
-        return sorted(super().items())
+        if self._items is None:
+            get = super().__getitem__
+            self._items = [(tag, get(tag)) for tag in self._tags]
+        return list(self._items)
 
     def keys(self) -> List[int]:
         """
         Returns:
             tag sorted in ascending order.
         """
-        return sorted(super().keys())
+        return list(self._tags)
 
     def values(self) -> List[int]:
         """
         Returns:
             tag values sorted in ascending order by tag name.
         """
-        return map(lambda key_val: key_val[1], self.items())
+        return [value for _, value in self.items()]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._tags)
 
     def __setitem__(self, key: Union[str, int], value: str) -> None:
-        super().__setitem__(_int_tag_name(key), value)
+        tag = tag_number(key)
+        if not super().__contains__(tag):
+            self._tags.insert(bisect_left(self._tags, tag), tag)
+        super().__setitem__(tag, value)
+        self._items = None
 
     def __getitem__(self, key: Union[str, int]) -> bytes:
-        return super().__getitem__(_int_tag_name(key))
+        return super().__getitem__(tag_number(key))
 
+    def __delitem__(self, key: Union[str, int]) -> None:
+        tag = tag_number(key)
+        super().__delitem__(tag)
+        del self._tags[bisect_left(self._tags, tag)]
+        self._items = None
 
-def _int_tag_name(tag: Union[str, int]) -> int:
-    """Ensures that given tag name is integer.
+    def __contains__(self, key: Union[str, int]) -> bool:
+        return super().__contains__(tag_number(key))
 
-    If it's not integer, it's converted to one.
-    """
-    if type(tag) == str:
-        tag = int.from_bytes(bytes(tag, 'ascii'), byteorder='little')
-    return tag
+    def get(self, key: Union[str, int], default: bytes=None) -> bytes:
+        return super().get(tag_number(key), default)
+
+    def pop(self, key: Union[str, int], *default) -> bytes:
+        tag = tag_number(key)
+        if not super().__contains__(tag):
+            return super().pop(tag, *default)
+
+        value = super().__getitem__(tag)
+        self.__delitem__(tag)
+        return value
+
+    def popitem(self) -> Tuple[int, bytes]:
+        """Removes and returns the tag with the highest tag number."""
+        if not self._tags:
+            raise KeyError('popitem(): tags container is empty')
+
+        tag = self._tags[-1]
+        return tag, self.pop(tag)
+
+    def setdefault(self, key: Union[str, int], default: bytes=None) -> bytes:
+        tag = tag_number(key)
+        if not super().__contains__(tag):
+            self.__setitem__(tag, default)
+        return super().__getitem__(tag)
+
+    def update(self, other_tags: dict=(), **kwargs) -> None:
+        if hasattr(other_tags, 'items'):
+            other_tags = other_tags.items()
+        for key, value in other_tags:
+            self.__setitem__(key, value)
+        for key, value in kwargs.items():
+            self.__setitem__(key, value)
+
+    def clear(self) -> None:
+        super().clear()
+        self._tags = []
+        self._items = None
+
+    def copy(self) -> 'Container':
+        return Container(self)
+
+    def __copy__(self) -> 'Container':
+        return Container(self)
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'Container':
+        tags_copy = Container()
+        memo[id(self)] = tags_copy
+        for tag, value in self.items():
+            tags_copy[tag] = deepcopy(value, memo)
+        return tags_copy
+
+    def __reduce__(self) -> Tuple[Callable, Tuple[dict]]:
+        return self.__class__, (dict(self.items()),)
+
+    def __or__(self, other_tags: dict) -> 'Container':
+        if not isinstance(other_tags, dict):
+            return NotImplemented
+        merged = Container(self)
+        merged.update(other_tags)
+        return merged
+
+    def __ior__(self, other_tags: dict) -> 'Container':
+        self.update(other_tags)
+        return self
@@ -0,0 +1,295 @@
+"""Hierarchical timer wheel.
+
+Timers of all connections share one wheel driven by a single event loop
+handle. Scheduling and cancelling a timer are O(1): a timer goes into the
+slot of the lowest level wheel whose span covers its delay and is moved to
+lower levels as its deadline approaches. Cancelled timers are not removed,
+they are skipped when their slot comes up. This suits retransmission and
+ACK delay timers which are rescheduled or cancelled far more often than
+they fire. The event loop only wakes the wheel when its earliest occupied
+slot comes up, however far away that is.
+"""
+
+import asyncio
+import math
+import time
+from typing import Callable
+
+
+# Fraction of a tick ignored when converting times to ticks, so that float
+# division error doesn't push timers a tick late.
+_TICK_EPSILON = 1e-6
+
+
+class Timer:
+    """Scheduled callback."""
+
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled', '_wheel')
+
+    def __init__(self, wheel: 'TimerWheel', deadline: int,
+            callback: Callable, args: tuple) -> None:
+        """
+        Args:
+            wheel: wheel the timer is scheduled on.
+            deadline: tick the timer fires at.
+            callback: called with args when the timer fires.
+        """
+        self._wheel = wheel
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Stops the timer from firing. Does nothing if it already fired."""
+        if not self.cancelled:
+            self.cancelled = True
+            self._wheel._active -= 1
+
+    @property
+    def when(self) -> float:
+        """
+        Returns:
+            time the timer fires at, rounded up to the wheel resolution.
+        """
+        return self.deadline * self._wheel.resolution
+
+
+class TimerWheel:
+    """Timers with fixed resolution spread over levels of slot arrays.
+
+    Level i slot spans slots^i ticks, so the wheel covers slots^levels ticks
+    without cascading. Timers beyond that wait in the last level and are
+    rescheduled on every round.
+    """
+
+    def __init__(self, resolution: float=0.001, slots: int=64,
+            levels: int=4,
+            clock: Callable[[], float]=time.monotonic) -> None:
+        """
+        Args:
+            resolution: tick length in seconds. Timers never fire early, but
+                may fire up to a tick late.
+            slots: number of slots per level, must be a power of 2.
+            levels: number of levels.
+            clock: returns current time in seconds.
+
+        Raises:
+            ValueError: if number of slots is not a power of 2.
+        """
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError('Number of slots must be a power of 2.')
+
+        self.resolution = resolution
+        self.clock = clock
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._wheels = [[[] for _ in range(slots)]
+            for _ in range(levels)] # type: list
+        self._span = 1 << (self._bits * levels)
+        self._now = self._tick_of(clock())
+        # Number of timers scheduled and not cancelled.
+        self._active = 0
+
+        self._loop = None # type: asyncio.AbstractEventLoop
+        self._handle = None # type: asyncio.TimerHandle
+        # Tick the event loop handle wakes the wheel at.
+        self._wake_tick = None # type: int
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        """Schedules callback to be called after delay seconds."""
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def call_at(self, when: float, callback: Callable, *args) -> Timer:
+        """Schedules callback to be called at the given clock time.
+
+        Timers in the past fire on the next tick.
+        """
+        timer = Timer(self,
+            math.ceil(when / self.resolution - _TICK_EPSILON), callback, args)
+        self._insert(timer)
+        self._active += 1
+        if self._loop is not None and (self._wake_tick is None
+                or timer.deadline < self._wake_tick):
+            self._schedule_wake(max(timer.deadline, self._now + 1))
+        return timer
+
+    def advance(self, now: float=None) -> int:
+        """Fires every timer due by now.
+
+        Stretches of ticks with no timers are skipped.
+
+        Args:
+            now: current time. Defaults to the wheel clock.
+
+        Returns:
+            number of fired timers.
+
+        Raises:
+            Exception: raised by a timer callback when the wheel is not
+                driven by an event loop. Timers left in the slot fire on
+                the next advance.
+        """
+        target = self._tick_of(self.clock() if now is None else now)
+        fired = 0
+        while self._now < target and self._active:
+            next_tick = self._next_tick()
+            if next_tick is None or next_tick > target:
+                break
+            # Slots in between are empty, so are the levels cascading there.
+            self._now = next_tick
+            self._cascade()
+            fired += self._fire()
+        self._now = max(self._now, target)
+        return fired
+
+    def start(self, loop: asyncio.AbstractEventLoop=None) -> None:
+        """Drives the wheel from the event loop.
+
+        The loop sleeps until the earliest occupied slot comes up, using a
+        single handle however many timers there are. Exceptions raised by
+        timer callbacks are passed to the loop exception handler.
+
+        Args:
+            loop: defaults to the running event loop.
+        """
+        self._loop = loop or asyncio.get_running_loop()
+        self.advance()
+        self._schedule_next()
+
+    def stop(self) -> None:
+        """Stops driving the wheel. Scheduled timers are kept."""
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = None
+        self._wake_tick = None
+        self._loop = None
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            number of scheduled timers which are not cancelled.
+        """
+        return self._active
+
+    def _tick_of(self, when: float) -> int:
+        return math.floor(when / self.resolution + _TICK_EPSILON)
+
+    def _insert(self, timer: Timer) -> None:
+        delay = timer.deadline - self._now
+        if delay <= 0:
+            # Current slot is being fired or is already done.
+            self._wheels[0][(self._now + 1) & self._mask].append(timer)
+            return
+
+        deadline = timer.deadline
+        if delay >= self._span:
+            deadline = self._now + self._span - 1
+            delay = self._span - 1
+
+        level = (delay.bit_length() - 1) // self._bits
+        slot = (deadline >> (self._bits * level)) & self._mask
+        self._wheels[level][slot].append(timer)
+
+    def _cascade(self) -> None:
+        """Moves timers of higher level slots the wheel reached down."""
+        for level in range(1, len(self._wheels)):
+            shift = self._bits * level
+            if self._now & ((1 << shift) - 1):
+                break
+            wheel = self._wheels[level]
+            slot = (self._now >> shift) & self._mask
+            timers, wheel[slot] = wheel[slot], []
+            for timer in timers:
+                if timer.cancelled:
+                    continue
+                if timer.deadline <= self._now:
+                    # Current slot is fired right after cascading.
+                    self._wheels[0][self._now & self._mask].append(timer)
+                else:
+                    self._insert(timer)
+
+    def _next_tick(self) -> int:
+        """Finds the earliest tick a timer may fire or cascade at.
+
+        Slots holding only cancelled timers are purged on the way.
+
+        Returns:
+            tick of the first occupied slot of any level after the current
+            one, or None if the wheel is empty.
+        """
+        earliest = None
+        for level, wheel in enumerate(self._wheels):
+            shift = self._bits * level
+            position = self._now >> shift
+            if earliest is not None and (position + 1) << shift >= earliest:
+                # Higher levels only cascade later.
+                break
+            for position in range(position + 1, position + self._mask + 2):
+                if earliest is not None and position << shift >= earliest:
+                    break
+                slot = wheel[position & self._mask]
+                if slot:
+                    slot[:] = [timer for timer in slot if not timer.cancelled]
+                if slot:
+                    earliest = position << shift
+                    break
+        return earliest
+
+    def _fire(self) -> int:
+        wheel = self._wheels[0]
+        slot = self._now & self._mask
+        timers, wheel[slot] = wheel[slot], []
+
+        fired = 0
+        for i, timer in enumerate(timers):
+            if timer.cancelled:
+                continue
+            if timer.deadline > self._now:
+                # Was beyond the wheel span when scheduled.
+                self._insert(timer)
+                continue
+            timer.cancelled = True
+            self._active -= 1
+            fired += 1
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                if self._loop is None:
+                    for unfired in timers[i + 1:]:
+                        if not unfired.cancelled:
+                            self._insert(unfired)
+                    raise
+                self._loop.call_exception_handler({
+                    'message': 'Exception in timer callback {!r}'.format(
+                        timer.callback),
+                    'exception': e,
+                })
+        return fired
+
+    def _schedule_wake(self, tick: int) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        self._wake_tick = tick
+        self._handle = self._loop.call_at(
+            tick * self.resolution - self.clock() + self._loop.time(),
+            self._on_wake)
+
+    def _schedule_next(self) -> None:
+        next_tick = self._next_tick() if self._active else None
+        if next_tick is None:
+            if self._handle is not None:
+                self._handle.cancel()
+            self._handle = None
+            self._wake_tick = None
+        else:
+            self._schedule_wake(next_tick)
+
+    def _on_wake(self) -> None:
+        self._handle = None
+        self._wake_tick = None
+        try:
+            self.advance()
+        finally:
+            if self._loop is not None:
+                self._schedule_next()
@@ -0,0 +1,127 @@
+"""Supported protocol versions and version negotiation.
+
+Incoming datagrams are classified by their public flags and version bytes
+only, before any other parsing. Datagrams with unsupported versions are
+answered with a version negotiation packet built from a cached buffer,
+malformed ones are dropped, so neither pays for packet hash verification.
+"""
+
+import struct
+from typing import Iterable
+
+from quic.packet import PUBLIC_FLAG_VERSION, PUBLIC_FLAG_RESET, \
+    PUBLIC_FLAG_CONNECTION_ID_8_BYTES
+
+
+ACCEPT = 0
+NEGOTIATE = 1
+DROP = 2
+
+# In order of preference. Client hellos ask for the first one.
+SUPPORTED_VERSIONS = (b'Q034', b'Q035')
+
+# Public flags bit which must always be unset.
+_PUBLIC_FLAG_RESERVED = 0x80
+
+_VERSION = struct.Struct('<I')
+_CONNECTION_ID_SIZE = 8
+
+
+def version_number(version: bytes) -> int:
+    """Converts 4 byte version tag, e.g. b'Q035', to integer.
+
+    Numbers match batch.PublicHeaders.protocol_versions.
+    """
+    return _VERSION.unpack(version)[0]
+
+
+class VersionRegistry:
+    """Set of versions the endpoint speaks."""
+
+    __slots__ = ('versions', 'numbers', '_negotiation_reply')
+
+    def __init__(self, versions: Iterable[bytes]=SUPPORTED_VERSIONS) -> None:
+        """
+        Args:
+            versions: 4 byte version tags in order of preference.
+
+        Raises:
+            ValueError: if version tag is not 4 bytes long or no versions
+                are given.
+        """
+        self.versions = tuple(versions) # type: tuple
+        if not self.versions:
+            raise ValueError('At least one version must be supported.')
+        for version in self.versions:
+            if len(version) != _VERSION.size:
+                raise ValueError('Invalid version tag: {!r}'.format(version))
+
+        self.numbers = frozenset(version_number(version)
+            for version in self.versions)
+        self._negotiation_reply = bytearray(
+            bytes([PUBLIC_FLAG_VERSION | PUBLIC_FLAG_CONNECTION_ID_8_BYTES])
+            + bytes(_CONNECTION_ID_SIZE) + b''.join(self.versions))
+
+    @property
+    def preferred(self) -> bytes:
+        """
+        Returns:
+            the most preferred version, which clients put into hellos.
+        """
+        return self.versions[0]
+
+    def is_supported(self, version: bytes) -> bool:
+        return version_number(version) in self.numbers
+
+    def classify(self, datagram: bytes) -> int:
+        """Decides what to do with a datagram looking at its first bytes.
+
+        Datagrams without version flag are accepted, they belong to
+        already negotiated connections. Connection ID and version fields
+        are located by public flags.
+
+        Returns:
+            ACCEPT, NEGOTIATE or DROP.
+        """
+        if not datagram:
+            return DROP
+
+        public_flags = datagram[0]
+        if public_flags & _PUBLIC_FLAG_RESERVED:
+            return DROP
+        version_offset = _version_offset(public_flags)
+        if len(datagram) < version_offset:
+            return DROP
+        if not public_flags & PUBLIC_FLAG_VERSION \
+                or public_flags & PUBLIC_FLAG_RESET:
+            return ACCEPT
+
+        if len(datagram) < version_offset + _VERSION.size:
+            return DROP
+        version = _VERSION.unpack_from(datagram, version_offset)[0]
+        return ACCEPT if version in self.numbers else NEGOTIATE
+
+    def negotiation_reply(self, datagram: bytes) -> bytearray:
+        """Builds version negotiation packet for the given client datagram.
+
+        Only the connection ID is written into the cached reply, which lists
+        all supported versions. Datagrams without connection ID get a reply
+        with zero connection ID.
+
+        Returns:
+            shared reply buffer, valid until the next call.
+        """
+        reply = self._negotiation_reply
+        if datagram[0] & PUBLIC_FLAG_CONNECTION_ID_8_BYTES:
+            reply[1:1 + _CONNECTION_ID_SIZE] = \
+                datagram[1:1 + _CONNECTION_ID_SIZE]
+        else:
+            reply[1:1 + _CONNECTION_ID_SIZE] = bytes(_CONNECTION_ID_SIZE)
+        return reply
+
+
+def _version_offset(public_flags: int) -> int:
+    """Version follows public flags and connection ID, if there is one."""
+    if public_flags & PUBLIC_FLAG_CONNECTION_ID_8_BYTES:
+        return 1 + _CONNECTION_ID_SIZE
+    return 1
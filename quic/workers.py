@@ -0,0 +1,337 @@
+"""Multi-process QUIC server with connection ID affine worker sharding.
+
+Two modes are supported:
+
+* reuseport - every worker has its own UDP socket bound to the same address
+  with SO_REUSEPORT. A classic BPF program attached to the socket group
+  makes the kernel pick the socket from connection ID bytes, so packets of
+  a connection always reach the same worker. Linux only.
+* dispatcher - a dispatcher process receives all datagrams and forwards
+  them to workers over Unix datagram sockets picking the worker from the
+  connection ID. Replies travel back through the dispatcher.
+"""
+
+import asyncio
+import ctypes
+import multiprocessing
+import signal
+import socket
+import struct
+from typing import Callable, Dict, List, Tuple
+
+from quic.connections import connection_id_of
+from quic.endpoint import Connection, Endpoint, PacketHandler
+
+
+MODE_REUSEPORT = 'reuseport'
+MODE_DISPATCHER = 'dispatcher'
+
+STATS_FIELDS = ('received', 'invalid', 'dropped', 'handler_errors',
+    'version_negotiations', 'connections')
+
+SO_ATTACH_REUSEPORT_CBPF = getattr(socket, 'SO_ATTACH_REUSEPORT_CBPF', 51)
+
+_BPF_LD_W_ABS = 0x20
+_BPF_ALU_MOD_K = 0x94
+_BPF_RET_A = 0x16
+_BPF_INSTRUCTION = struct.Struct('HBBI')
+
+_ADDRESS = struct.Struct('!B16sH')
+
+
+class WorkerPool:
+    """Forks worker processes each running an Endpoint.
+
+    Worker stats are published to shared memory every stats_interval
+    seconds and on shutdown, so they can be read from the parent at any
+    time with stats().
+    """
+
+    def __init__(self,
+            handler_factory: Callable[[Connection], PacketHandler],
+            address: Tuple[str, int], workers: int=None,
+            mode: str=MODE_REUSEPORT, stats_interval: float=0.5,
+            **endpoint_kwargs) -> None:
+        """
+        Args:
+            handler_factory: creates packet handler for a new connection.
+                Called in worker processes.
+            address: UDP address to listen on. Port 0 picks a free port.
+            workers: number of worker processes. Defaults to CPU count.
+            mode: MODE_REUSEPORT or MODE_DISPATCHER.
+            stats_interval: how often workers publish their stats.
+            endpoint_kwargs: passed to Endpoint constructor.
+        """
+        if mode not in (MODE_REUSEPORT, MODE_DISPATCHER):
+            raise ValueError('Unknown worker pool mode: {}'.format(mode))
+
+        self.handler_factory = handler_factory
+        self.address = address
+        self.workers = workers or multiprocessing.cpu_count()
+        self.mode = mode
+        self.stats_interval = stats_interval
+        self.endpoint_kwargs = endpoint_kwargs
+
+        self._context = multiprocessing.get_context('fork')
+        self._stats = self._context.Array('Q',
+            self.workers * len(STATS_FIELDS), lock=False)
+        self._processes = [] # type: List[multiprocessing.Process]
+
+    def start(self) -> None:
+        """Binds sockets and forks worker processes.
+
+        After this call address holds the actual bound address.
+        """
+        if self.mode == MODE_REUSEPORT:
+            worker_socks = reuseport_sockets(self.address, self.workers)
+            self.address = worker_socks[0].getsockname()
+        else:
+            udp_sock = socket.socket(_family_of(self.address),
+                socket.SOCK_DGRAM)
+            udp_sock.bind(self.address)
+            self.address = udp_sock.getsockname()
+            pairs = [socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+                for _ in range(self.workers)]
+            worker_socks = [worker_sock for _, worker_sock in pairs]
+            dispatcher_socks = [dispatcher_sock for dispatcher_sock, _ in pairs]
+
+            self._fork(_run_dispatcher, udp_sock, dispatcher_socks,
+                worker_socks)
+            udp_sock.close()
+            for sock in dispatcher_socks:
+                sock.close()
+
+        for worker_nr in range(self.workers):
+            self._fork(_run_worker, worker_nr, worker_socks, self)
+        for sock in worker_socks:
+            sock.close()
+
+    def stop(self, timeout: float=5.0) -> None:
+        """Asks every process to shut down and waits for them to exit."""
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._processes = []
+
+    def worker_stats(self) -> List[Dict[str, int]]:
+        """
+        Returns:
+            most recently published stats of every worker.
+        """
+        field_count = len(STATS_FIELDS)
+        return [
+            dict(zip(STATS_FIELDS,
+                self._stats[worker_nr * field_count
+                    :(worker_nr + 1) * field_count]))
+            for worker_nr in range(self.workers)
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            stats summed over all workers.
+        """
+        totals = dict.fromkeys(STATS_FIELDS, 0)
+        for stats in self.worker_stats():
+            for field, value in stats.items():
+                totals[field] += value
+        return totals
+
+    def __enter__(self) -> 'WorkerPool':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _fork(self, target: Callable, *args) -> None:
+        process = self._context.Process(target=target, args=args,
+            daemon=True)
+        process.start()
+        self._processes.append(process)
+
+    def _publish_stats(self, worker_nr: int, endpoint: Endpoint) -> None:
+        offset = worker_nr * len(STATS_FIELDS)
+        for i, field in enumerate(STATS_FIELDS[:-1]):
+            self._stats[offset + i] = getattr(endpoint, field)
+        self._stats[offset + len(STATS_FIELDS) - 1] = len(endpoint.connections)
+
+
+def reuseport_sockets(address: Tuple[str, int],
+        count: int) -> List[socket.socket]:
+    """Binds UDP sockets to the same address steering by connection ID.
+
+    Kernel picks the receiving socket by taking 32 bits of connection ID
+    modulo socket count. Sockets are indexed in bind order.
+    """
+    socks = []
+    for _ in range(count):
+        sock = socket.socket(_family_of(address), socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(address)
+        address = sock.getsockname()
+        socks.append(sock)
+
+    attach_connection_id_steering(socks[0], count)
+    return socks
+
+
+def attach_connection_id_steering(sock: socket.socket, count: int) -> None:
+    """Attaches reuseport BPF program which shards by connection ID.
+
+    Program loads 4 bytes following public flags, which are part of the
+    connection ID, and returns them modulo socket count.
+    """
+    program = b''.join(_BPF_INSTRUCTION.pack(*instruction) for instruction in (
+        (_BPF_LD_W_ABS, 0, 0, 1),
+        (_BPF_ALU_MOD_K, 0, 0, count),
+        (_BPF_RET_A, 0, 0, 0),
+    ))
+    program_buff = ctypes.create_string_buffer(program)
+    sock_fprog = struct.pack('HL', len(program) // _BPF_INSTRUCTION.size,
+        ctypes.addressof(program_buff))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_REUSEPORT_CBPF, sock_fprog)
+
+
+def pack_address(address: Tuple) -> bytes:
+    """Serializes IPv4 or IPv6 socket address to fixed size header."""
+    host, port = address[:2]
+    if ':' in host:
+        return _ADDRESS.pack(6, socket.inet_pton(socket.AF_INET6, host), port)
+    return _ADDRESS.pack(4, socket.inet_pton(socket.AF_INET, host), port)
+
+
+def unpack_address(data: bytes) -> Tuple[str, int]:
+    """Deserializes socket address packed with pack_address()."""
+    version, host, port = _ADDRESS.unpack_from(data)
+    if version == 6:
+        return socket.inet_ntop(socket.AF_INET6, host), port
+    return socket.inet_ntop(socket.AF_INET, host[:4]), port
+
+
+class _DispatchedEndpoint(Endpoint):
+    """Endpoint fed by dispatcher with address prefixed datagrams.
+
+    asyncio transports can't send over unnamed Unix sockets, so replies are
+    written to the socket directly.
+    """
+
+    def __init__(self, sock: socket.socket, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.sock = sock
+
+    def datagram_received(self, data: bytes, address: Tuple) -> None:
+        view = memoryview(data)
+        super().datagram_received(view[_ADDRESS.size:],
+            unpack_address(view))
+
+    def _sendto(self, data: bytes, address: Tuple[str, int]) -> None:
+        _send_nowait(self.sock, pack_address(address) + data)
+
+
+class _Dispatcher(asyncio.DatagramProtocol):
+    """Forwards datagrams to workers by connection ID."""
+
+    def __init__(self, workers: List[socket.socket]) -> None:
+        self.workers = workers
+        self.transport = None # type: asyncio.DatagramTransport
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, address: Tuple) -> None:
+        if len(data) < 9:
+            return
+        worker = self.workers[connection_id_of(data) % len(self.workers)]
+        _send_nowait(worker, pack_address(address) + data)
+
+
+class _Replies(asyncio.DatagramProtocol):
+    """Sends worker replies out of the dispatcher UDP socket."""
+
+    def __init__(self, dispatcher: _Dispatcher) -> None:
+        self.dispatcher = dispatcher
+
+    def datagram_received(self, data: bytes, address: Tuple) -> None:
+        view = memoryview(data)
+        self.dispatcher.transport.sendto(view[_ADDRESS.size:],
+            unpack_address(view))
+
+
+def _run_worker(worker_nr: int, worker_socks: List[socket.socket],
+        pool: WorkerPool) -> None:
+    sock = worker_socks[worker_nr]
+    _close_all_but(sock, worker_socks)
+    if pool.mode == MODE_REUSEPORT:
+        new_endpoint = lambda: Endpoint(pool.handler_factory,
+            **pool.endpoint_kwargs)
+    else:
+        new_endpoint = lambda: _DispatchedEndpoint(sock,
+            pool.handler_factory, **pool.endpoint_kwargs)
+
+    async def serve(stopped: asyncio.Future) -> None:
+        loop = asyncio.get_running_loop()
+        _, endpoint = await loop.create_datagram_endpoint(new_endpoint,
+            sock=sock)
+        while not stopped.done():
+            pool._publish_stats(worker_nr, endpoint)
+            await asyncio.wait([stopped], timeout=pool.stats_interval)
+        endpoint.close()
+        pool._publish_stats(worker_nr, endpoint)
+
+    _run_until_terminated(serve)
+
+
+def _run_dispatcher(udp_sock: socket.socket,
+        dispatcher_socks: List[socket.socket],
+        worker_socks: List[socket.socket]) -> None:
+    _close_all_but(None, worker_socks)
+
+    async def serve(stopped: asyncio.Future) -> None:
+        loop = asyncio.get_running_loop()
+        dispatcher = _Dispatcher(dispatcher_socks)
+        for sock in dispatcher_socks:
+            await loop.create_datagram_endpoint(lambda: _Replies(dispatcher),
+                sock=sock)
+        await loop.create_datagram_endpoint(lambda: dispatcher, sock=udp_sock)
+        await stopped
+
+    _run_until_terminated(serve)
+
+
+def _run_until_terminated(
+        serve: Callable[[asyncio.Future], asyncio.Future]) -> None:
+    """Runs coroutine in a new event loop until SIGTERM is received."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    stopped = loop.create_future()
+    loop.add_signal_handler(signal.SIGTERM, stopped.set_result, None)
+    try:
+        loop.run_until_complete(serve(stopped))
+    finally:
+        loop.close()
+
+
+def _send_nowait(sock: socket.socket, data: bytes) -> None:
+    """Sends datagram over Unix socket dropping it if socket buffer is full."""
+    try:
+        sock.send(data)
+    except BlockingIOError:
+        pass
+
+
+def _close_all_but(sock: socket.socket,
+        socks: List[socket.socket]) -> None:
+    """Closes sockets inherited from parent which this process doesn't use."""
+    for other_sock in socks:
+        if other_sock is not sock:
+            other_sock.close()
+
+
+def _family_of(address: Tuple) -> int:
+    return socket.AF_INET6 if ':' in address[0] else socket.AF_INET
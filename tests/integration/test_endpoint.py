@@ -0,0 +1,103 @@
+import asyncio
+
+from hamcrest import assert_that, is_, has_length
+
+from quic import chlo
+from quic.endpoint import serve
+from quic.recovery import DelayedAck
+
+
+class Client(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.replies = asyncio.Queue()
+
+    def datagram_received(self, data, address):
+        self.replies.put_nowait(data)
+
+
+async def run_with_client(handler_factory, packets, **kwargs):
+    loop = asyncio.get_running_loop()
+    endpoint = await serve(handler_factory, '127.0.0.1', 0, **kwargs)
+    server_address = endpoint.transport.get_extra_info('sockname')
+    transport, client = await loop.create_datagram_endpoint(Client,
+        remote_addr=server_address)
+
+    for packet in packets:
+        transport.sendto(packet)
+
+    try:
+        reply = await asyncio.wait_for(client.replies.get(), 5)
+    except asyncio.TimeoutError:
+        reply = None
+
+    transport.close()
+    endpoint.close()
+    await asyncio.sleep(0)
+    return endpoint, reply
+
+
+def describe_endpoint():
+    def it_dispatches_client_hello_to_connection_handler():
+        received = []
+
+        def handler_factory(connection):
+            async def handle(packet):
+                frame = packet.parser.parse_stream_frame_header()
+                received.append((connection.connection_id, frame.id))
+                await connection.send(b'reply')
+            return handle
+
+        packet = chlo.make_message()
+        endpoint, reply = asyncio.run(
+            run_with_client(handler_factory, [packet]))
+
+        assert_that(reply, is_(b'reply'))
+        assert_that(received,
+            is_([(int.from_bytes(packet[1:9], 'little'), 1)]))
+
+    def it_runs_connection_timers_on_endpoint_timer_wheel():
+        def handler_factory(connection):
+            delayed_ack = DelayedAck(connection.timers, lambda:
+                asyncio.ensure_future(connection.send(b'ack')))
+
+            async def handle(packet):
+                delayed_ack.on_packet_received()
+            return handle
+
+        _, reply = asyncio.run(run_with_client(handler_factory,
+            [chlo.make_message()]))
+
+        assert_that(reply, is_(b'ack'))
+
+    def it_drops_packets_with_invalid_hash():
+        received = []
+
+        def handler_factory(connection):
+            async def handle(packet):
+                received.append(packet)
+                await connection.send(b'reply')
+            return handle
+
+        corrupted = bytearray(chlo.make_message())
+        corrupted[-1] ^= 0xff
+        endpoint, _ = asyncio.run(run_with_client(handler_factory,
+            [bytes(corrupted), chlo.make_message()]))
+
+        assert_that(received, has_length(1))
+        assert_that(endpoint.invalid, is_(1))
+
+    def it_creates_separate_handler_for_every_connection_id():
+        connections = []
+
+        def handler_factory(connection):
+            connections.append(connection.connection_id)
+
+            async def handle(packet):
+                if len(connections) == 3:
+                    await connection.send(b'reply')
+            return handle
+
+        endpoint, _ = asyncio.run(run_with_client(handler_factory,
+            [chlo.make_message() for _ in range(3)]))
+
+        assert_that(connections, has_length(3))
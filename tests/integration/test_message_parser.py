@@ -1,7 +1,8 @@
 from hamcrest import assert_that, is_, has_entries
 
 import quic.handshake as handshake
-from quic.handshake import read_packet, decode_handshake_message
+from quic.handshake import read_packet, decode_handshake_message, \
+    decode_tag_values, MessageView, MessageDecoder
 import quic.tags as tags
 
 
@@ -48,3 +49,39 @@ def describe_decode_handhsake_message():
             deserialized_msg.tags,
             has_entries({'SNI': b'www.example.com', 'VER': b'Q034'})
         )
+
+
+def describe_decode_tag_values():
+    def it_decodes_all_tags_of_a_real_client_hello():
+        tag_values = decode_tag_values(fixture_packet('chlo')[30:])
+
+        assert_that(len(tag_values), is_(15))
+        assert_that(tag_values['SNI'], is_(b'www.example.com'))
+        assert_that(tag_values['VER'], is_(b'Q035'))
+
+
+def describe_message_view():
+    def it_looks_up_tags_of_a_real_client_hello():
+        msg = MessageView(fixture_packet('chlo')[30:])
+
+        assert_that(msg.tag, is_(b'CHLO'))
+        assert_that(msg.tag_count, is_(15))
+        assert_that(msg.tags['SNI'], is_(b'www.example.com'))
+        assert_that(msg.tags['VER'], is_(b'Q035'))
+        assert_that(msg.tags['CCS'], is_(
+            b'\x7b\x26\xe9\xe7\xe4\x5c\x71\xff\x01\xe8\x81\x60\x92\x92\x1a\xe8'))
+
+
+def describe_message_decoder():
+    def it_decodes_real_client_hello_fed_in_chunks():
+        data = fixture_packet('chlo')[30:1330]
+        decoder = MessageDecoder()
+
+        messages = []
+        for i in range(0, len(data), 100):
+            messages += decoder.feed(data[i:i + 100])
+
+        assert_that(len(messages), is_(1))
+        assert_that(messages[0].tag, is_(b'CHLO'))
+        assert_that(messages[0].tag_count, is_(15))
+        assert_that(messages[0].tags['SNI'], is_(b'www.example.com'))
@@ -1,6 +1,7 @@
 from hamcrest import assert_that, is_, has_entries
 
-from quic.packet import Parser
+from quic.packet import Parser, ViewParser
+from quic.frames import iter_frames
 from quic.handshake import read_packet
 
 
@@ -19,3 +20,29 @@ def describe_parser():
                 packet_hash = parser.calc_packet_hash()
 
                 assert_that(packet_hash, is_(0xda4e6a9c4b3af51927e22fdc))
+
+
+def describe_view_parser():
+    def describe_calc_packet_hash():
+        def it_calculates_the_same_hash_as_copying_parser():
+            parser = ViewParser(fixture_packet('chlo_q034'))
+            parser.parse_public_header()
+            parser.parse_packet_hash()
+
+            packet_hash = parser.calc_packet_hash()
+
+            assert_that(packet_hash, is_(0xda4e6a9c4b3af51927e22fdc))
+
+
+def describe_iter_frames():
+    def it_walks_frames_of_a_real_client_hello():
+        parser = Parser(fixture_packet('chlo'))
+        header = parser.parse_public_header()
+        parser.parse_packet_hash()
+
+        frames = list(iter_frames(parser.data, parser.data_offset,
+            header.packet_number_length))
+
+        assert_that([frame.frame_type for frame in frames],
+            is_(['STREAM', 'PADDING']))
+        assert_that(frames[0].data[:4], is_(b'CHLO'))
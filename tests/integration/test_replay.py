@@ -0,0 +1,33 @@
+from hamcrest import assert_that, is_
+
+from quic.handshake import read_packet
+from quic.replay import replay_file, write_raw_dump
+
+
+def fixture_packet(fixture_name):
+    return read_packet('tests/integration/fixtures/{}.raw'.format(fixture_name))
+
+
+def describe_replay_file():
+    def it_decodes_client_hello_from_raw_dump(tmpdir):
+        path = tmpdir.join('capture.raw')
+        with open(str(path), 'wb') as f:
+            write_raw_dump(f, [fixture_packet('chlo')] * 3)
+
+        stats = replay_file(str(path))
+
+        assert_that(stats.datagrams, is_(3))
+        assert_that(stats.invalid_hashes, is_(0))
+        assert_that(stats.handshake_messages, is_(3))
+        assert_that(stats.versions, is_({'Q035': 3}))
+
+    def it_merges_stats_of_multiple_processes(tmpdir):
+        path = tmpdir.join('capture.raw')
+        with open(str(path), 'wb') as f:
+            write_raw_dump(f, [fixture_packet('chlo')] * 10)
+
+        stats = replay_file(str(path), processes=4)
+
+        assert_that(stats.datagrams, is_(10))
+        assert_that(stats.handshake_messages, is_(10))
+        assert_that(stats.versions, is_({'Q035': 10}))
@@ -0,0 +1,155 @@
+import errno
+import socket
+import time
+
+from hamcrest import assert_that, is_, has_length, instance_of
+import pytest
+
+from quic import chlo
+from quic.packet import ViewParser
+from quic.sockio import ReceiveRing, SendBatcher
+
+
+@pytest.fixture
+def receiver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.setblocking(False)
+    yield sock
+    sock.close()
+
+
+@pytest.fixture
+def sender():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    yield sock
+    sock.close()
+
+
+class GsoRejectingSocket(socket.socket):
+    """Socket of a kernel without UDP GSO support."""
+
+    def sendmsg(self, *args):
+        raise OSError(errno.EIO, 'UDP GSO is not supported')
+
+
+def receive_all(ring, count):
+    datagrams = []
+    deadline = time.monotonic() + 2
+    while len(datagrams) < count and time.monotonic() < deadline:
+        datagrams += [(bytes(data), address)
+            for data, address in ring.receive()]
+    return datagrams
+
+
+def describe_receive_ring():
+    def it_returns_received_datagrams_as_memoryviews(receiver, sender):
+        sender.sendto(b'datagram', receiver.getsockname())
+        time.sleep(0.05)
+
+        datagrams = ReceiveRing(receiver).receive()
+
+        assert_that(datagrams, has_length(1))
+        assert_that(datagrams[0][0], instance_of(memoryview))
+        assert_that(datagrams[0][0], is_(b'datagram'))
+        assert_that(datagrams[0][1][1], is_(sender.getsockname()[1]))
+
+    def it_returns_at_most_max_datagrams(receiver, sender):
+        for i in range(5):
+            sender.sendto(b'datagram', receiver.getsockname())
+        time.sleep(0.05)
+        ring = ReceiveRing(receiver, slots=8)
+
+        assert_that(ring.receive(3), has_length(3))
+        assert_that(ring.receive(), has_length(2))
+
+    def it_returns_empty_batch_when_nothing_was_received(receiver):
+        assert_that(ReceiveRing(receiver).receive(), is_([]))
+
+    def it_reuses_slots_in_ring_order(receiver, sender):
+        ring = ReceiveRing(receiver, slots=2, slot_size=100)
+        for data in (b'one', b'two', b'three'):
+            sender.sendto(data, receiver.getsockname())
+        time.sleep(0.05)
+
+        first, second = ring.receive()
+        third, = ring.receive()
+
+        assert_that(third[0], is_(b'three'))
+        assert_that(first[0], is_(b'thr'))
+        assert_that(second[0], is_(b'two'))
+
+    def it_drops_datagrams_longer_than_a_slot(receiver, sender):
+        ring = ReceiveRing(receiver, slots=2, slot_size=10)
+        for data in (b'longer than slot', b'slot sized', b'elevenbytes'):
+            sender.sendto(data, receiver.getsockname())
+        time.sleep(0.05)
+
+        datagrams = ring.receive()
+
+        assert_that([bytes(data) for data, _ in datagrams],
+            is_([b'slot sized']))
+        assert_that(ring.truncated, is_(2))
+
+    def it_hands_out_views_parsable_without_copying(receiver, sender):
+        packet = chlo.make_message()
+        sender.sendto(packet, receiver.getsockname())
+        time.sleep(0.05)
+
+        data, _ = ReceiveRing(receiver).receive()[0]
+        parser = ViewParser(data)
+        parser.parse_public_header()
+
+        assert_that(parser.parse_packet_hash(), is_(parser.calc_packet_hash()))
+
+
+def describe_send_batcher():
+    @pytest.mark.parametrize('use_gso', [True, False])
+    def it_sends_every_queued_datagram(receiver, sender, use_gso):
+        batcher = SendBatcher(sender, use_gso=use_gso)
+        datagrams = [bytes([i]) * 100 for i in range(10)] + [b'short']
+        for data in datagrams:
+            batcher.send(data, receiver.getsockname())
+
+        sent = batcher.flush()
+        received = receive_all(ReceiveRing(receiver), len(datagrams))
+
+        assert_that(sent, is_(len(datagrams)))
+        assert_that([data for data, _ in received], is_(datagrams))
+
+    def it_coalesces_equally_sized_datagrams_to_the_same_address(
+            receiver, sender):
+        batcher = SendBatcher(sender)
+        for i in range(10):
+            batcher.send(b'x' * 100, receiver.getsockname())
+
+        batcher.flush()
+
+        if batcher.use_gso:
+            assert_that(batcher.syscalls, is_(1))
+
+    def it_does_not_coalesce_datagrams_to_different_addresses(
+            receiver, sender):
+        other = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        other.bind(('127.0.0.1', 0))
+        batcher = SendBatcher(sender)
+        batcher.send(b'x' * 100, receiver.getsockname())
+        batcher.send(b'x' * 100, other.getsockname())
+
+        batcher.flush()
+        other.close()
+
+        assert_that(batcher.syscalls, is_(2))
+
+    def it_counts_one_syscall_per_datagram_when_gso_is_rejected(receiver):
+        sender = GsoRejectingSocket(socket.AF_INET, socket.SOCK_DGRAM)
+        batcher = SendBatcher(sender)
+        for i in range(3):
+            batcher.send(b'x' * 100, receiver.getsockname())
+
+        sent = batcher.flush()
+        sender.close()
+
+        assert_that(sent, is_(3))
+        assert_that(batcher.use_gso, is_(False))
+        assert_that(batcher.syscalls, is_(3))
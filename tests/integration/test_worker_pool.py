@@ -0,0 +1,76 @@
+import os
+import socket
+import time
+
+from hamcrest import assert_that, is_, has_length, greater_than
+import pytest
+
+from quic import chlo
+from quic.workers import WorkerPool, MODE_REUSEPORT, MODE_DISPATCHER, \
+    pack_address, unpack_address
+
+
+def reply_with_worker_pid(connection):
+    async def handle(packet):
+        await connection.send(packet.header.connection_id.tobytes()
+            + bytes(str(os.getpid()), 'ascii'))
+    return handle
+
+
+def flood(address, packets, repeat):
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(2)
+    for _ in range(repeat):
+        for packet in packets:
+            client.sendto(packet, address)
+            time.sleep(0.001)
+
+    replies = []
+    try:
+        while len(replies) < len(packets) * repeat:
+            replies.append(client.recv(100))
+    except socket.timeout:
+        pass
+    client.close()
+    return replies
+
+
+def wait_for_stats(pool, received):
+    deadline = time.monotonic() + 5
+    while pool.stats()['received'] < received \
+            and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def describe_worker_pool():
+    @pytest.mark.parametrize('mode', [MODE_REUSEPORT, MODE_DISPATCHER])
+    def it_delivers_all_packets_of_a_connection_to_the_same_worker(mode):
+        packets = [chlo.make_message() for _ in range(20)]
+
+        with WorkerPool(reply_with_worker_pid, ('127.0.0.1', 0), workers=2,
+                mode=mode, stats_interval=0.05) as pool:
+            replies = flood(pool.address, packets, repeat=3)
+            wait_for_stats(pool, len(replies))
+            stats = pool.stats()
+            worker_stats = pool.worker_stats()
+
+        workers_by_connection = {}
+        for reply in replies:
+            workers_by_connection.setdefault(reply[:8], set()).add(reply[8:])
+
+        assert_that(replies, has_length(greater_than(0)))
+        assert_that(all(len(pids) == 1
+            for pids in workers_by_connection.values()), is_(True))
+        assert_that(len(set.union(*workers_by_connection.values())), is_(2))
+        assert_that(stats['received'], is_(len(replies)))
+        assert_that(stats['connections'], is_(len(workers_by_connection)))
+        assert_that(worker_stats, has_length(2))
+
+    def it_rejects_unknown_modes():
+        with pytest.raises(ValueError):
+            WorkerPool(reply_with_worker_pid, ('127.0.0.1', 0), mode='magic')
+
+def describe_pack_address():
+    @pytest.mark.parametrize('address', [('127.0.0.1', 443), ('::1', 8443)])
+    def it_packs_address_so_that_it_can_be_unpacked(address):
+        assert_that(unpack_address(pack_address(address)), is_(address))
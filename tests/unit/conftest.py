@@ -0,0 +1,16 @@
+import pytest
+
+
+class FakeClock:
+    """Clock standing still until its time is set."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,131 @@
+from hamcrest import assert_that, is_, calling, raises
+
+from quic.ack import ReceivedPackets
+from quic.builder import PacketBuilder
+from quic.frames import iter_frames
+from quic.packet import ViewParser, PUBLIC_FLAG_VERSION, \
+    PUBLIC_FLAG_CONNECTION_ID_8_BYTES
+
+
+def received(*packet_numbers, **kwargs):
+    packets = ReceivedPackets(**kwargs)
+    for packet_number in packet_numbers:
+        packets.add(packet_number)
+    return packets
+
+
+def decode_ack(frame):
+    ack, = iter_frames(frame)
+    return ack
+
+
+def describe_ReceivedPackets():
+    def describe_add():
+        def it_merges_consecutive_packet_numbers_into_single_range():
+            packets = received(1, 2, 3, 5)
+
+            assert_that(packets.ranges(), is_([(5, 5), (1, 3)]))
+
+        def it_merges_ranges_when_gap_is_filled():
+            packets = received(1, 3, 2)
+
+            assert_that(packets.ranges(), is_([(1, 3)]))
+
+        def it_extends_range_downwards():
+            packets = received(5, 4)
+
+            assert_that(packets.ranges(), is_([(4, 5)]))
+
+        def it_returns_false_for_duplicates():
+            packets = received(1, 2, 3)
+
+            assert_that(packets.add(2), is_(False))
+            assert_that(packets.ranges(), is_([(1, 3)]))
+
+        def it_drops_lowest_ranges_when_range_limit_is_exceeded():
+            packets = received(1, 3, 5, 7, max_ranges=3)
+
+            assert_that(packets.ranges(), is_([(7, 7), (5, 5), (3, 3)]))
+
+    def it_checks_if_packet_was_received():
+        packets = received(1, 2, 5)
+
+        assert_that([n in packets for n in range(7)],
+            is_([False, True, True, False, False, True, False]))
+
+    def it_forgets_packets_below_given_packet_number():
+        packets = received(1, 2, 3, 5, 6, 9)
+
+        packets.remove_below(6)
+
+        assert_that(packets.ranges(), is_([(9, 9), (6, 6)]))
+
+    def describe_ack_frame():
+        def it_acknowledges_single_range():
+            ack = decode_ack(received(1, 2, 3).ack_frame())
+
+            assert_that(ack.largest_acked, is_(3))
+            assert_that(ack.acked_ranges(), is_([(1, 3)]))
+
+        def it_reports_missing_packets_as_gaps():
+            packets = received(*[1, 2, 3, 7, 8, 10, 300])
+
+            ack = decode_ack(packets.ack_frame())
+
+            assert_that(ack.acked_ranges(), is_(packets.ranges()))
+
+        def it_bridges_long_gaps_with_empty_blocks():
+            packets = received(1, 2, 1000, 1001)
+
+            ack = decode_ack(packets.ack_frame())
+
+            assert_that(ack.ack_blocks, is_([(0, 2), (255, 0), (255, 0),
+                (255, 0), (232, 2)]))
+            assert_that(ack.acked_ranges(), is_([(1000, 1001), (1, 2)]))
+
+        def it_uses_wider_fields_for_large_values():
+            packets = received(*range(70000, 70300))
+
+            ack = decode_ack(packets.ack_frame())
+
+            assert_that(ack.largest_acked_length, is_(4))
+            assert_that(ack.ack_block_length_length, is_(2))
+            assert_that(ack.acked_ranges(), is_([(70000, 70299)]))
+
+        def it_leaves_out_lowest_ranges_which_do_not_fit():
+            packets = received(1, 3, 5, 7)
+
+            ack = decode_ack(packets.ack_frame(max_blocks=2))
+
+            assert_that(ack.acked_ranges(), is_([(7, 7), (5, 5), (3, 3)]))
+
+        def it_encodes_time_since_largest_packet_was_received():
+            now = [10.0]
+            packets = ReceivedPackets(clock=lambda: now[0])
+            packets.add(2)
+            now[0] += 0.002
+            packets.add(1)
+            now[0] += 0.001
+
+            ack = decode_ack(packets.ack_frame())
+
+            assert_that(ack.ack_delay, is_(3000))
+
+        def it_raises_error_when_nothing_was_received():
+            assert_that(calling(ReceivedPackets().ack_frame),
+                raises(ValueError))
+
+        def it_can_be_sent_with_packet_builder():
+            packets = received(1, 2, 4)
+            builder = PacketBuilder(1, public_flags=PUBLIC_FLAG_VERSION
+                | PUBLIC_FLAG_CONNECTION_ID_8_BYTES)
+            builder.add_frame(packets.ack_frame())
+
+            packet, = builder.build()
+
+            parser = ViewParser(packet)
+            parser.parse_public_header()
+            assert_that(parser.parse_packet_hash(),
+                is_(parser.calc_packet_hash()))
+            ack, = iter_frames(packet, parser.data_offset)
+            assert_that(ack.acked_ranges(), is_([(4, 4), (1, 2)]))
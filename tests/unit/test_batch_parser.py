@@ -0,0 +1,65 @@
+from hamcrest import assert_that, is_
+
+from quic.batch import parse_public_headers, parse_packed_public_headers
+
+
+CHLO_HEADER = b'\x09\x08\x07\x06\x05\x04\x03\x02\x01Q034\x01'
+SHORT_HEADER = b'\x18\x01\x02\x03\x04\x05\x06\x07\x08\x34\x12'
+
+
+def describe_parse_public_headers():
+    def it_returns_as_many_rows_as_there_are_datagrams():
+        headers = parse_public_headers([CHLO_HEADER, SHORT_HEADER])
+
+        assert_that(len(headers), is_(2))
+
+    def it_decodes_public_flags():
+        headers = parse_public_headers([CHLO_HEADER, SHORT_HEADER])
+
+        assert_that(list(headers.public_flags), is_([0x09, 0x18]))
+
+    def it_decodes_connection_ids_as_little_endian_ints():
+        headers = parse_public_headers([CHLO_HEADER, SHORT_HEADER])
+
+        assert_that(list(headers.connection_ids),
+            is_([0x0102030405060708, 0x0807060504030201]))
+
+    def it_decodes_protocol_version_only_when_version_flag_is_set():
+        headers = parse_public_headers([CHLO_HEADER, SHORT_HEADER])
+
+        assert_that(list(headers.protocol_versions),
+            is_([int.from_bytes(b'Q034', 'little'), 0]))
+
+    def it_decodes_packet_numbers_of_various_lengths():
+        six_bytes = b'\x38\x01\x02\x03\x04\x05\x06\x07\x08\x01\x02\x03\x04\x05\x06'
+
+        headers = parse_public_headers([CHLO_HEADER, SHORT_HEADER, six_bytes])
+
+        assert_that(list(headers.packet_numbers),
+            is_([1, 0x1234, 0x060504030201]))
+
+    def it_skips_diversification_nonce_before_packet_number():
+        nonce_header = b'\x1c\x01\x02\x03\x04\x05\x06\x07\x08' \
+            + b'n' * 32 + b'\x34\x12'
+
+        headers = parse_public_headers([nonce_header, nonce_header[:-1]])
+
+        assert_that(list(headers.connection_ids),
+            is_([0x0807060504030201, 0]))
+        assert_that(list(headers.packet_numbers), is_([0x1234, 0]))
+        assert_that(list(headers.valid), is_([1, 0]))
+
+    def it_marks_truncated_datagrams_as_invalid():
+        headers = parse_public_headers([CHLO_HEADER, CHLO_HEADER[:10], b''])
+
+        assert_that(list(headers.valid), is_([1, 0, 0]))
+
+def describe_parse_packed_public_headers():
+    def it_decodes_datagrams_at_given_offsets():
+        buff = CHLO_HEADER + b'payload' + SHORT_HEADER
+
+        headers = parse_packed_public_headers(buff,
+            [0, len(CHLO_HEADER) + len(b'payload')])
+
+        assert_that(list(headers.packet_numbers), is_([1, 0x1234]))
+        assert_that(list(headers.valid), is_([1, 1]))
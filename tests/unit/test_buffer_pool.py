@@ -0,0 +1,95 @@
+from hamcrest import assert_that, is_, calling, raises, same_instance, \
+    contains_string
+
+from quic.buffers import BufferPool
+
+
+def describe_buffer_pool():
+    def describe_acquire():
+        def it_allocates_buffer_of_the_smallest_fitting_size_class():
+            pool = BufferPool((100, 1000))
+
+            buff = pool.acquire(101)
+
+            assert_that(len(buff), is_(1000))
+            assert_that(pool.allocated, is_(1))
+
+        def it_reuses_released_buffers_of_the_same_size_class():
+            pool = BufferPool((100, 1000))
+            buff = pool.acquire(100)
+            pool.release(buff)
+
+            assert_that(pool.acquire(50), same_instance(buff))
+            assert_that(pool.reused, is_(1))
+
+        def it_allocates_exact_size_buffer_over_the_largest_class():
+            pool = BufferPool(100)
+
+            buff = pool.acquire(150)
+
+            assert_that(len(buff), is_(150))
+
+    def describe_release():
+        def it_keeps_at_most_max_free_buffers_per_size_class():
+            pool = BufferPool((100, 1000), max_free=1)
+
+            for size in (100, 100, 1000, 1000):
+                pool.release(bytearray(size))
+
+            assert_that(len(pool), is_(2))
+
+        def it_drops_buffers_bigger_than_the_largest_class():
+            pool = BufferPool(100)
+
+            pool.release(pool.acquire(150))
+
+            assert_that(len(pool), is_(0))
+
+        def it_rejects_buffers_of_other_size():
+            pool = BufferPool(100)
+
+            assert_that(calling(pool.release).with_args(bytearray(10)),
+                raises(ValueError))
+
+        def describe_when_debug_mode_is_on():
+            def it_rejects_buffers_released_twice():
+                pool = BufferPool(100, debug=True)
+                buff = pool.acquire(100)
+                pool.release(buff)
+
+                assert_that(calling(pool.release).with_args(buff),
+                    raises(ValueError))
+
+            def it_rejects_buffers_not_acquired_from_pool():
+                pool = BufferPool(100, debug=True)
+
+                assert_that(calling(pool.release).with_args(bytearray(100)),
+                    raises(ValueError))
+
+    def describe_buffer():
+        def it_releases_buffer_after_with_block():
+            pool = BufferPool(100)
+
+            with pool.buffer(10) as buff:
+                assert_that(len(buff), is_(100))
+
+            assert_that(len(pool), is_(1))
+
+    def describe_leaks():
+        def it_reports_where_unreleased_buffers_were_acquired():
+            pool = BufferPool(100, debug=True)
+            pool.acquire(10)
+            with pool.buffer(10):
+                pass
+
+            leaks = pool.leaks()
+
+            assert_that(len(leaks), is_(1))
+            assert_that(leaks[0], contains_string(
+                'it_reports_where_unreleased_buffers_were_acquired'))
+
+        def it_reports_nothing_outside_debug_mode():
+            pool = BufferPool(100)
+            pool.acquire(10)
+
+            assert_that(pool.leaks(), is_([]))
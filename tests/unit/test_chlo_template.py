@@ -0,0 +1,90 @@
+from hamcrest import assert_that, is_, calling, raises
+
+from quic import chlo
+from quic.packet import Parser
+from quic.handshake import decode_handshake_message
+from quic.versions import VersionRegistry
+
+
+def parse(packet):
+    parser = Parser(bytes(packet))
+    header = parser.parse_public_header()
+    packet_hash = parser.parse_packet_hash()
+    frame_header = parser.parse_stream_frame_header()
+    msg = decode_handshake_message(parser.data[parser.data_offset:
+        parser.data_offset + frame_header.data_length])
+    return header, packet_hash == parser.calc_packet_hash(), msg
+
+
+def describe_make_message():
+    def it_asks_for_the_preferred_supported_version():
+        header, _, msg = parse(chlo.make_message())
+
+        preferred = VersionRegistry().preferred
+        assert_that(header.protocol_version, is_(preferred))
+        assert_that(msg.tags['VER'], is_(preferred))
+
+
+def describe_template():
+    def describe_render():
+        def it_renders_the_same_packet_as_make_message(monkeypatch):
+            monkeypatch.setattr(chlo.random, 'randint',
+                lambda start, end: 0x0102030405060708)
+            template = chlo.Template()
+
+            packet = template.render(0x0102030405060708)
+
+            assert_that(bytes(packet), is_(chlo.make_message()))
+
+        def it_patches_connection_id_and_packet_number():
+            template = chlo.Template()
+
+            header, _, _ = parse(template.render(0x1122334455667788, 5))
+
+            assert_that(header.connection_id,
+                is_((0x1122334455667788).to_bytes(8, 'little')))
+            assert_that(header.packet_number, is_(5))
+
+        def it_updates_packet_hash():
+            template = chlo.Template()
+            template.render(1)
+
+            _, hash_is_valid, _ = parse(template.render(2))
+
+            assert_that(hash_is_valid, is_(True))
+
+        def it_patches_variable_tag_values():
+            template = chlo.Template({'SNI': 'www.example.com'},
+                variable_tags=['SNI'])
+
+            _, hash_is_valid, msg = parse(
+                template.render(1, tag_values={'SNI': 'www.example.org'}))
+
+            assert_that(msg.tags['SNI'], is_(b'www.example.org'))
+            assert_that(hash_is_valid, is_(True))
+
+        def describe_when_tag_is_not_variable():
+            def it_raises_an_exception():
+                template = chlo.Template()
+
+                assert_that(calling(template.render).with_args(1,
+                    tag_values={'VER': 'Q035'}), raises(ValueError))
+
+        def describe_when_tag_value_length_differs():
+            def it_raises_an_exception():
+                template = chlo.Template({'SNI': 'www.example.com'},
+                    variable_tags=['SNI'])
+
+                assert_that(calling(template.render).with_args(1,
+                    tag_values={'SNI': 'example.com'}), raises(ValueError))
+
+    def describe_constructor():
+        def describe_when_variable_tag_is_missing_from_template():
+            def it_raises_an_exception():
+                assert_that(calling(chlo.Template).with_args(
+                    variable_tags=['SNI']), raises(ValueError))
+
+        def describe_when_message_does_not_fit_into_packet():
+            def it_raises_an_exception():
+                assert_that(calling(chlo.Template).with_args(
+                    {'SNI': 'x' * 400}), raises(ValueError))
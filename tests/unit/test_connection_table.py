@@ -0,0 +1,121 @@
+from hamcrest import assert_that, is_, none
+
+from quic.connections import ConnectionTable, connection_id_of
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def describe_connection_id_of():
+    def it_extracts_connection_id_as_little_endian_int():
+        datagram = b'\x08\x01\x02\x03\x04\x05\x06\x07\x08Q034\x01'
+
+        assert_that(connection_id_of(datagram), is_(0x0807060504030201))
+
+def describe_connection_table():
+    def describe_get():
+        def it_returns_stored_connection_state():
+            table = ConnectionTable()
+            table.put(1, 'state')
+
+            assert_that(table.get(1), is_('state'))
+
+        def it_returns_none_for_unknown_connections():
+            assert_that(ConnectionTable().get(1), is_(none()))
+
+        def it_counts_hits_and_misses():
+            table = ConnectionTable()
+            table.put(1, 'state')
+
+            table.get(1)
+            table.get(2)
+            table.get(3)
+
+            assert_that((table.hits, table.misses), is_((1, 2)))
+
+    def describe_when_capacity_is_exceeded():
+        def it_evicts_least_recently_used_connection():
+            table = ConnectionTable(capacity=2)
+            table.put(1, 'state1')
+            table.put(2, 'state2')
+            table.get(1)
+
+            table.put(3, 'state3')
+
+            assert_that(2 in table, is_(False))
+            assert_that(len(table), is_(2))
+            assert_that(table.evictions, is_(1))
+
+        def it_notifies_about_evicted_connection():
+            evicted = []
+            table = ConnectionTable(capacity=1,
+                on_evict=lambda cid, state: evicted.append((cid, state)))
+            table.put(1, 'state1')
+
+            table.put(2, 'state2')
+
+            assert_that(evicted, is_([(1, 'state1')]))
+
+    def describe_idle_eviction():
+        def it_evicts_idle_connections_on_lookup():
+            clock = Clock()
+            table = ConnectionTable(idle_timeout=10, clock=clock)
+            table.put(1, 'state1')
+            clock.now = 5
+            table.put(2, 'state2')
+
+            clock.now = 11
+            table.get(2)
+
+            assert_that(1 in table, is_(False))
+            assert_that(2 in table, is_(True))
+
+        def it_evicts_a_bounded_number_of_connections_per_call():
+            clock = Clock()
+            table = ConnectionTable(idle_timeout=10, clock=clock,
+                evictions_per_call=2)
+            for cid in range(5):
+                table.put(cid, 'state')
+
+            clock.now = 20
+            table.get(0)
+
+            assert_that(table.evictions, is_(2))
+
+        def it_keeps_connections_which_were_active_recently():
+            clock = Clock()
+            table = ConnectionTable(idle_timeout=10, clock=clock)
+            table.put(1, 'state1')
+            clock.now = 9
+            table.get(1)
+
+            clock.now = 15
+            table.get(2)
+
+            assert_that(1 in table, is_(True))
+
+    def describe_expire():
+        def it_evicts_all_idle_connections():
+            clock = Clock()
+            table = ConnectionTable(idle_timeout=10, clock=clock)
+            for cid in range(5):
+                table.put(cid, 'state')
+
+            clock.now = 20
+            evicted = table.expire()
+
+            assert_that(evicted, is_(5))
+            assert_that(len(table), is_(0))
+
+    def describe_remove():
+        def it_removes_connection_without_counting_eviction():
+            table = ConnectionTable()
+            table.put(1, 'state')
+
+            assert_that(table.remove(1), is_('state'))
+            assert_that(table.evictions, is_(0))
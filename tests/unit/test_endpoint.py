@@ -0,0 +1,122 @@
+import asyncio
+
+from hamcrest import assert_that, is_
+
+from quic import chlo
+from quic.endpoint import Endpoint
+from quic.instrumentation import Metrics, STAGE_PUBLIC_HEADER, \
+    STAGE_HASH_VERIFY
+from quic.versions import VersionRegistry
+
+
+class Transport(asyncio.DatagramTransport):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def sendto(self, data, address=None):
+        self.sent.append((data, address))
+
+    def close(self):
+        pass
+
+
+def never_served(connection):
+    async def handle(packet):
+        await asyncio.Event().wait()
+    return handle
+
+
+async def receive(endpoint, packets):
+    endpoint.connection_made(Transport())
+    for packet in packets:
+        endpoint.datagram_received(packet, ('127.0.0.1', 1234))
+    endpoint.connection_lost(None)
+
+
+def describe_endpoint():
+    def describe_datagram_received():
+        def it_counts_received_datagrams():
+            endpoint = Endpoint(never_served)
+
+            asyncio.run(receive(endpoint, [chlo.make_message(), b'junk']))
+
+            assert_that(endpoint.received, is_(2))
+
+        def it_counts_malformed_datagrams_as_invalid():
+            endpoint = Endpoint(never_served)
+
+            asyncio.run(receive(endpoint, [b'', b'\x0d\x01\x02']))
+
+            assert_that(endpoint.invalid, is_(2))
+
+        def describe_when_protocol_version_is_not_supported():
+            def it_replies_with_version_negotiation_packet():
+                endpoint = Endpoint(never_served,
+                    versions=VersionRegistry([b'Q099']))
+                transport = Transport()
+
+                async def receive_unsupported_version():
+                    endpoint.connection_made(transport)
+                    endpoint.datagram_received(chlo.make_message(),
+                        ('127.0.0.1', 1234))
+
+                asyncio.run(receive_unsupported_version())
+
+                assert_that(endpoint.version_negotiations, is_(1))
+                assert_that(len(endpoint.connections), is_(0))
+                reply, address = transport.sent[0]
+                assert_that(reply[9:], is_(b'Q099'))
+                assert_that(address, is_(('127.0.0.1', 1234)))
+
+        def describe_when_connection_queue_is_full():
+            def it_drops_packets():
+                endpoint = Endpoint(never_served, max_queue_size=2)
+                packet = chlo.make_message()
+
+                asyncio.run(receive(endpoint, [packet] * 5))
+
+                assert_that(endpoint.dropped, is_(3))
+
+        def describe_when_too_many_packets_are_pending():
+            def it_drops_packets_regardless_of_connection():
+                endpoint = Endpoint(never_served, max_pending=2)
+                packets = [chlo.make_message() for _ in range(4)]
+
+                asyncio.run(receive(endpoint, packets))
+
+                assert_that(endpoint.dropped, is_(2))
+
+    def describe_connection_lost():
+        def it_forgets_queued_packets():
+            endpoint = Endpoint(never_served)
+
+            asyncio.run(receive(endpoint, [chlo.make_message()] * 3))
+
+            assert_that(endpoint.pending, is_(0))
+            assert_that(len(endpoint.connections), is_(0))
+
+    def describe_when_connection_limit_is_reached():
+        def it_evicts_least_recently_active_connection():
+            endpoint = Endpoint(never_served, max_connections=2)
+            packets = [chlo.make_message() for _ in range(3)]
+
+            async def receive_and_check():
+                endpoint.connection_made(Transport())
+                for packet in packets:
+                    endpoint.datagram_received(packet, ('127.0.0.1', 1234))
+                return endpoint.connections.evictions
+
+            evictions = asyncio.run(receive_and_check())
+
+            assert_that(evictions, is_(1))
+
+    def describe_when_metrics_are_given():
+        def it_records_parsing_stages():
+            metrics = Metrics()
+            endpoint = Endpoint(never_served, metrics=metrics)
+
+            asyncio.run(receive(endpoint, [chlo.make_message()]))
+
+            assert_that(metrics.calls[STAGE_PUBLIC_HEADER], is_(1))
+            assert_that(metrics.calls[STAGE_HASH_VERIFY], is_(1))
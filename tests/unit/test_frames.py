@@ -0,0 +1,122 @@
+from hamcrest import assert_that, is_, same_instance, calling, raises
+import pytest
+
+from quic.frames import iter_frames, decode_ufloat16, encode_ufloat16, \
+    FRAME_CLASSES, AckFrame, StreamFrame, Frame
+
+
+def frame_types(payload, packet_number_length=1):
+    return [frame.frame_type
+        for frame in iter_frames(payload, 0, packet_number_length)]
+
+
+def describe_iter_frames():
+    def it_walks_every_frame_in_packet_payload():
+        payload = b'\x07' \
+            + b'\x05\x01\x00\x00\x00' \
+            + b'\x04\x03\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00' \
+            + b'\x06\x02' \
+            + b'\xa0\x01\x03\x00abc' \
+            + b'\x00\x00\x00'
+
+        assert_that(frame_types(payload), is_(['PING', 'BLOCKED',
+            'WINDOW_UPDATE', 'STOP_WAITING', 'STREAM', 'PADDING']))
+
+    def it_starts_at_given_offset():
+        assert_that(list(iter_frames(b'junk\x07', 4))[0].frame_type,
+            is_('PING'))
+
+    def it_decodes_rst_stream_frame():
+        frame, = iter_frames(b'\x01\x03\x00\x00\x00'
+            b'\x10\x00\x00\x00\x00\x00\x00\x00\x07\x00\x00\x00')
+
+        assert_that((frame.stream_id, frame.byte_offset, frame.error_code),
+            is_((3, 16, 7)))
+
+    def it_decodes_connection_close_frame():
+        frame, = iter_frames(b'\x02\x19\x00\x00\x00\x03\x00bye')
+
+        assert_that(frame.error_code, is_(25))
+        assert_that(frame.reason, is_(b'bye'))
+
+    def it_decodes_goaway_frame():
+        frame, = iter_frames(b'\x03\x01\x00\x00\x00\x05\x00\x00\x00'
+            b'\x02\x00ok')
+
+        assert_that((frame.error_code, frame.last_good_stream_id),
+            is_((1, 5)))
+        assert_that(frame.reason, is_(b'ok'))
+
+    def it_decodes_stop_waiting_using_packet_number_length():
+        frame, = iter_frames(b'\x06\x02\x01', 0, packet_number_length=2)
+
+        assert_that(frame.least_unacked_delta, is_(0x0102))
+
+    def it_decodes_stream_frames():
+        frame, = iter_frames(b'\xa0\x05\x03\x00abc')
+
+        assert_that(frame.id, is_(5))
+        assert_that(frame.data, is_(b'abc'))
+        assert_that(frame.length, is_(7))
+
+    def it_returns_whole_frame_bytes():
+        frame, = iter_frames(b'\x05\x01\x00\x00\x00')
+
+        assert_that(frame.to_bytes(), is_(b'\x05\x01\x00\x00\x00'))
+
+    def describe_when_frame_type_is_unknown():
+        def it_raises_an_exception():
+            assert_that(calling(list).with_args(iter_frames(b'\x08')),
+                raises(ValueError))
+
+    def describe_when_frame_is_truncated():
+        @pytest.mark.parametrize('payload', [
+            b'\x04\x03\x00\x00',
+            b'\x02\x19\x00\x00\x00\x03\x00by',
+            b'\x40\x01',
+            b'\xa0\x05\x03\x00ab',
+        ])
+        def it_raises_an_exception(payload):
+            assert_that(calling(list).with_args(iter_frames(payload)),
+                raises(ValueError))
+
+def describe_ack_frame():
+    def it_decodes_single_block_ack():
+        frame, = iter_frames(b'\x40\x0a\x00\x00\x05\x00')
+
+        assert_that(frame.largest_acked, is_(10))
+        assert_that(frame.ack_blocks, is_([(0, 5)]))
+        assert_that(frame.acked_ranges(), is_([(6, 10)]))
+
+    def it_decodes_multiple_blocks_and_timestamps():
+        payload = b'\x65\x64\x00\x10\x00\x02\x03\x00' \
+            b'\x04\x02\x00\x00\x06\x00' \
+            b'\x02\x01\x10\x00\x00\x00\x02\x05\x00'
+        frame, = iter_frames(payload)
+
+        assert_that(frame.length, is_(len(payload)))
+        assert_that(frame.largest_acked, is_(100))
+        assert_that(frame.ack_delay, is_(16))
+        assert_that(frame.ack_blocks, is_([(0, 3), (4, 2), (0, 6)]))
+        assert_that(frame.acked_ranges(), is_([(98, 100), (92, 93), (86, 91)]))
+
+def describe_frame_classes():
+    def it_maps_every_type_byte_to_frame_class():
+        assert_that(len(FRAME_CLASSES), is_(256))
+        assert_that(FRAME_CLASSES[0x40], same_instance(AckFrame))
+        assert_that(FRAME_CLASSES[0xff], same_instance(StreamFrame))
+        assert_that(FRAME_CLASSES[0x20], is_(None))
+
+    def it_requires_frame_classes_to_determine_frame_length():
+        class IncompleteFrame(Frame):
+            __slots__ = ()
+
+        assert_that(calling(IncompleteFrame).with_args(memoryview(b''), 0, 0),
+            raises(TypeError))
+
+def describe_ufloat16():
+    @pytest.mark.parametrize('value', [0, 1, 4095, 4096, 123456, 2 ** 40])
+    def it_encodes_values_rounding_them_down_to_11_bit_precision(value):
+        decoded = decode_ufloat16(encode_ufloat16(value))
+
+        assert_that(value - value // 2048 <= decoded <= value, is_(True))
@@ -1,10 +1,28 @@
-from hamcrest import assert_that, is_
+from hamcrest import assert_that, is_, calling, raises
 
+from quic.buffers import BufferPool
 import quic.handshake as handshake
 import quic.tags as tags
 
 
 def describe_handshake_message():
+    def describe_constructor():
+        def it_accepts_message_tag_and_tags():
+            msg_tags = tags.Container({'SNI': 'www.example.com'})
+
+            msg = handshake.Message(b'CHLO', msg_tags)
+
+            assert_that(msg.tag, is_(b'CHLO'))
+            assert_that(msg.tags, is_(msg_tags))
+
+        def it_creates_separate_tags_container_for_every_message():
+            msg1 = handshake.Message()
+            msg2 = handshake.Message()
+
+            msg1.tags['SNI'] = 'www.example.com'
+
+            assert_that(msg2.tag_count, is_(0))
+
     def describe_values_offset():
         def it_returns_offset_in_serialized_message_where_tag_values_start():
             msg = handshake.Message()
@@ -48,3 +66,46 @@ def describe_handshake_message():
             buff = msg.to_bytes()
 
             assert_that(buff[16:31], is_(b'www.example.com'))
+
+    def describe_serialize_into():
+        def it_writes_the_same_bytes_as_to_bytes_at_given_offset():
+            msg = handshake.Message(b'CHLO',
+                tags.Container({'SNI': 'www.example.com', 'VER': 'Q034'}))
+            buff = bytearray(100)
+
+            written = msg.serialize_into(buff, 10)
+
+            assert_that(bytes(buff[10:10 + written]), is_(msg.to_bytes()))
+
+        def it_returns_number_of_bytes_written():
+            msg = handshake.Message(b'CHLO', tags.Container({'VER': 'Q034'}))
+
+            written = msg.serialize_into(bytearray(100))
+
+            assert_that(written, is_(20))
+
+        def it_writes_into_memoryview_of_a_bigger_buffer():
+            msg = handshake.Message(b'CHLO', tags.Container({'VER': 'Q034'}))
+            packet = bytearray(30)
+
+            msg.serialize_into(memoryview(packet)[5:])
+
+            assert_that(bytes(packet[5:25]), is_(msg.to_bytes()))
+
+        def describe_when_message_does_not_fit_into_buffer():
+            def it_raises_an_exception():
+                msg = handshake.Message(b'CHLO',
+                    tags.Container({'VER': 'Q034'}))
+
+                assert_that(calling(msg.serialize_into).with_args(
+                    bytearray(30), 15), raises(ValueError))
+
+    def describe_to_buffer():
+        def it_serializes_message_into_pooled_buffer():
+            pool = BufferPool(128)
+            msg = handshake.Message(b'CHLO', tags.Container({'VER': 'Q034'}))
+
+            view = msg.to_buffer(pool)
+
+            assert_that(bytes(view), is_(msg.to_bytes()))
+            assert_that(len(view.obj), is_(128))
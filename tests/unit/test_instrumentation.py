@@ -0,0 +1,137 @@
+import json
+
+from hamcrest import assert_that, is_, calling, raises, contains_string
+import pytest
+
+from quic import chlo
+from quic.handshake import decode_handshake_message
+from quic.instrumentation import Metrics, InstrumentedParser, \
+    STAGE_PUBLIC_HEADER, STAGE_PACKET_HASH, STAGE_HASH_VERIFY, STAGE_FRAME, \
+    STAGE_HANDSHAKE, HISTOGRAM_BUCKETS
+
+
+def describe_metrics():
+    def describe_record():
+        def it_counts_calls_and_bytes():
+            metrics = Metrics()
+
+            metrics.record(STAGE_FRAME, 100, 20)
+            metrics.record(STAGE_FRAME, 300, 30)
+
+            assert_that(metrics.calls[STAGE_FRAME], is_(2))
+            assert_that(metrics.bytes[STAGE_FRAME], is_(50))
+            assert_that(metrics.total_ns[STAGE_FRAME], is_(400))
+
+        def it_puts_latency_into_power_of_two_bucket():
+            metrics = Metrics()
+
+            metrics.record(STAGE_FRAME, 100)
+
+            histogram = metrics.snapshot()['frame']['histogram']
+            assert_that(histogram[7], is_(1))
+            assert_that(sum(histogram), is_(1))
+
+        def it_puts_very_long_latencies_into_the_last_bucket():
+            metrics = Metrics()
+
+            metrics.record(STAGE_FRAME, 1 << 40)
+
+            histogram = metrics.snapshot()['frame']['histogram']
+            assert_that(histogram[HISTOGRAM_BUCKETS - 1], is_(1))
+
+    def describe_wrap():
+        def it_records_calls_of_wrapped_function():
+            metrics = Metrics()
+            decode = metrics.wrap(STAGE_HANDSHAKE, decode_handshake_message)
+            data = chlo.make_message()[30:]
+
+            msg = decode(data)
+
+            assert_that(msg.tag, is_(b'CHLO'))
+            assert_that(metrics.calls[STAGE_HANDSHAKE], is_(1))
+            assert_that(metrics.bytes[STAGE_HANDSHAKE], is_(len(data)))
+
+        def it_counts_errors():
+            metrics = Metrics()
+            decode = metrics.wrap(STAGE_HANDSHAKE, decode_handshake_message)
+
+            assert_that(calling(decode).with_args(b'CHLO'), raises(ValueError))
+            assert_that(metrics.errors[STAGE_HANDSHAKE], is_(1))
+            assert_that(metrics.calls[STAGE_HANDSHAKE], is_(0))
+
+    def describe_reset():
+        def it_zeroes_all_metrics():
+            metrics = Metrics()
+            metrics.record(STAGE_FRAME, 100, 20)
+
+            metrics.reset()
+
+            assert_that(metrics.snapshot()['frame']['calls'], is_(0))
+            assert_that(sum(metrics.histograms), is_(0))
+
+    def describe_to_json():
+        def it_exports_snapshot():
+            metrics = Metrics()
+            metrics.record(STAGE_PUBLIC_HEADER, 100, 20)
+
+            exported = json.loads(metrics.to_json())
+
+            assert_that(exported['public_header']['calls'], is_(1))
+
+    def describe_to_prometheus():
+        def it_exports_counters_and_cumulative_histogram():
+            metrics = Metrics()
+            metrics.record(STAGE_PUBLIC_HEADER, 100, 20)
+
+            exported = metrics.to_prometheus()
+
+            assert_that(exported, contains_string(
+                'quic_stage_calls_total{stage="public_header"} 1\n'))
+            assert_that(exported, contains_string(
+                'quic_stage_duration_seconds_bucket{stage="public_header",'
+                'le="0.000000064"} 0\n'))
+            assert_that(exported, contains_string(
+                'quic_stage_duration_seconds_bucket{stage="public_header",'
+                'le="0.000000128"} 1\n'))
+            assert_that(exported, contains_string(
+                'quic_stage_duration_seconds_count{stage="public_header"} 1\n'))
+
+
+def describe_instrumented_parser():
+    @pytest.fixture
+    def metrics():
+        return Metrics()
+
+    @pytest.fixture
+    def packet():
+        return chlo.make_message()
+
+    def it_records_every_parsing_stage(metrics, packet):
+        parser = InstrumentedParser(packet, metrics)
+
+        parser.parse_public_header()
+        parser.parse_packet_hash()
+        parser.calc_packet_hash()
+        parser.parse_stream_frame_header()
+
+        for stage in (STAGE_PUBLIC_HEADER, STAGE_PACKET_HASH,
+                STAGE_HASH_VERIFY, STAGE_FRAME):
+            assert_that(metrics.calls[stage], is_(1))
+
+    def it_counts_bytes_of_the_whole_stream_frame(metrics, packet):
+        parser = InstrumentedParser(packet, metrics)
+        parser.parse_public_header()
+        parser.parse_packet_hash()
+
+        frame = parser.parse_stream_frame_header()
+
+        assert_that(metrics.bytes[STAGE_FRAME],
+            is_(frame.header_length + frame.data_length))
+
+    def it_counts_stage_errors(metrics):
+        parser = InstrumentedParser(b'\x01', metrics)
+        parser.parse_public_header()
+
+        assert_that(calling(parser.parse_stream_frame_header),
+            raises(IndexError))
+        assert_that(metrics.errors[STAGE_FRAME], is_(1))
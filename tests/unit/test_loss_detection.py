@@ -0,0 +1,213 @@
+from hamcrest import assert_that, is_, close_to
+import pytest
+
+from quic.recovery import RttEstimator, LossDetector, DelayedAck
+from quic.timers import TimerWheel
+
+
+@pytest.fixture
+def timers(clock):
+    return TimerWheel(clock=clock)
+
+
+@pytest.fixture
+def lost():
+    return []
+
+
+@pytest.fixture
+def detector(timers, lost):
+    return LossDetector(timers, lambda packets: lost.extend(
+        packet.packet_number for packet in packets))
+
+
+def send(detector, *packet_numbers, **kwargs):
+    for packet_number in packet_numbers:
+        detector.on_packet_sent(packet_number, 1000, **kwargs)
+
+
+def describe_RttEstimator():
+    def it_takes_first_sample_as_smoothed_rtt():
+        rtt = RttEstimator()
+
+        rtt.update(0.2)
+
+        assert_that((rtt.smoothed, rtt.variance, rtt.min_rtt),
+            is_((0.2, 0.1, 0.2)))
+
+    def it_smooths_later_samples():
+        rtt = RttEstimator()
+        rtt.update(0.2)
+
+        rtt.update(0.1)
+
+        assert_that(rtt.smoothed, close_to(0.1875, 1e-9))
+        assert_that(rtt.variance, close_to(0.1, 1e-9))
+
+    def it_subtracts_ack_delay_unless_sample_drops_below_min_rtt():
+        rtt = RttEstimator()
+        rtt.update(0.1)
+
+        rtt.update(0.15, ack_delay=0.03)
+        assert_that(rtt.latest, close_to(0.12, 1e-9))
+        rtt.update(0.11, ack_delay=0.03)
+        assert_that(rtt.latest, close_to(0.11, 1e-9))
+
+    def it_uses_initial_rtt_for_timeout_until_first_sample():
+        assert_that(RttEstimator(0.05).retransmission_timeout, is_(0.1))
+
+
+def describe_LossDetector():
+    def describe_on_ack_received():
+        def it_returns_newly_acked_packets(detector):
+            send(detector, 1, 2, 3)
+
+            acked = detector.on_ack_received([(2, 3)])
+
+            assert_that([p.packet_number for p in acked], is_([2, 3]))
+            assert_that(sorted(detector.sent), is_([1]))
+            assert_that(detector.bytes_in_flight, is_(1000))
+
+        def it_ignores_already_acked_packets(detector):
+            send(detector, 1, 2, 3)
+            detector.on_ack_received([(1, 2)])
+
+            acked = detector.on_ack_received([(1, 3)])
+
+            assert_that([p.packet_number for p in acked], is_([3]))
+
+        def it_skips_acked_ranges_below_least_unacked(detector):
+            send(detector, *range(1, 101))
+            detector.on_ack_received([(1, 90)])
+
+            assert_that(detector.least_unacked, is_(91))
+            acked = detector.on_ack_received([(1, 10**12)])
+            assert_that(len(acked), is_(10))
+
+        def it_updates_rtt_from_largest_newly_acked_packet(detector, clock):
+            detector.rtt.update(0.1)
+            send(detector, 1)
+            clock.now = 0.05
+            send(detector, 2)
+            clock.now = 0.2
+
+            detector.on_ack_received([(1, 2)], ack_delay=0.01)
+
+            assert_that(detector.rtt.latest, close_to(0.14, 1e-9))
+
+        def it_does_not_update_rtt_when_largest_was_acked_before(detector,
+                clock):
+            send(detector, 1, 2)
+            detector.on_ack_received([(2, 2)])
+            clock.now = 1
+
+            detector.on_ack_received([(2, 2), (1, 1)])
+
+            assert_that(detector.rtt.latest, is_(0.0))
+
+    def describe_loss_detection():
+        def it_declares_packets_lost_by_packet_threshold(detector, lost):
+            send(detector, 1, 2, 3, 4, 5)
+
+            detector.on_ack_received([(5, 5)])
+
+            assert_that(lost, is_([1, 2]))
+            assert_that(sorted(detector.sent), is_([3, 4]))
+            assert_that(detector.least_unacked, is_(3))
+
+        def it_declares_packets_lost_by_time_threshold(detector, lost,
+                clock):
+            send(detector, 1)
+            clock.now = 0.1
+            send(detector, 2)
+            clock.now = 0.2
+
+            detector.on_ack_received([(2, 2)])
+
+            assert_that(lost, is_([1]))
+
+        def it_declares_packets_lost_when_loss_timer_fires(detector, lost,
+                clock, timers):
+            send(detector, 1)
+            clock.now = 0.01
+            send(detector, 2)
+            clock.now = 0.1
+            detector.on_ack_received([(2, 2)])
+            assert_that(lost, is_([]))
+
+            clock.now = 0.2
+            timers.advance()
+
+            assert_that(lost, is_([1]))
+
+        def it_retransmits_all_packets_on_timeout_and_backs_off(detector,
+                lost, clock, timers):
+            send(detector, 1, 2)
+            send(detector, 3, retransmittable=False)
+
+            clock.now = 0.199
+            timers.advance()
+            assert_that(lost, is_([]))
+            clock.now = 0.2
+            timers.advance()
+
+            assert_that(lost, is_([1, 2]))
+            assert_that(detector.timeouts, is_(1))
+            assert_that(detector.least_unacked, is_(3))
+
+        def it_does_not_arm_timer_without_retransmittable_packets(detector,
+                timers):
+            send(detector, 1, retransmittable=False)
+
+            assert_that(len(timers), is_(0))
+
+    def it_cancels_timer_when_cleared(detector, timers):
+        send(detector, 1, 2)
+
+        detector.clear()
+
+        assert_that(len(timers), is_(0))
+        assert_that(detector.least_unacked, is_(3))
+        assert_that(detector.bytes_in_flight, is_(0))
+
+
+def describe_DelayedAck():
+    @pytest.fixture
+    def acks():
+        return []
+
+    @pytest.fixture
+    def delayed_ack(timers, acks):
+        return DelayedAck(timers, lambda: acks.append(1))
+
+    def it_acks_every_second_packet_immediately(delayed_ack, acks):
+        for _ in range(4):
+            delayed_ack.on_packet_received()
+
+        assert_that(len(acks), is_(2))
+
+    def it_acks_single_packet_after_max_ack_delay(delayed_ack, acks, clock,
+            timers):
+        delayed_ack.on_packet_received()
+
+        clock.now = 0.024
+        timers.advance()
+        assert_that(acks, is_([]))
+        clock.now = 0.025
+        timers.advance()
+        assert_that(acks, is_([1]))
+
+    def it_ignores_packets_which_are_not_retransmittable(delayed_ack, acks,
+            timers):
+        delayed_ack.on_packet_received(retransmittable=False)
+
+        assert_that(len(timers), is_(0))
+
+    def it_cancels_timer_when_ack_is_sent_with_other_frames(delayed_ack,
+            timers):
+        delayed_ack.on_packet_received()
+
+        delayed_ack.on_ack_sent()
+
+        assert_that(len(timers), is_(0))
+        assert_that(delayed_ack.unacked, is_(0))
@@ -0,0 +1,95 @@
+from hamcrest import assert_that, is_, has_entries, calling, raises
+
+from quic.buffers import BufferPool
+from quic.handshake import Message, MessageDecoder
+import quic.tags as tags
+
+
+def make_message(tag_values):
+    msg = Message(b'CHLO', tags.Container(tag_values))
+    return msg.to_bytes()
+
+
+def describe_message_decoder():
+    def describe_feed():
+        def it_decodes_message_fed_at_once():
+            decoder = MessageDecoder()
+
+            messages = decoder.feed(make_message({'SNI': 'example.com'}))
+
+            assert_that(len(messages), is_(1))
+            assert_that(messages[0].tag, is_(b'CHLO'))
+            assert_that(messages[0].tags, has_entries({'SNI': b'example.com'}))
+
+        def it_decodes_message_fed_byte_by_byte():
+            data = make_message({'SNI': 'example.com', 'VER': 'Q034'})
+            decoder = MessageDecoder()
+
+            messages = []
+            for i in range(len(data)):
+                messages += decoder.feed(data[i:i + 1])
+
+            assert_that(len(messages), is_(1))
+            assert_that(messages[0].tags,
+                has_entries({'SNI': b'example.com', 'VER': b'Q034'}))
+
+        def it_decodes_several_messages_from_one_chunk():
+            data = make_message({'SNI': 'a'}) + make_message({'SNI': 'b'})
+
+            messages = MessageDecoder().feed(data)
+
+            assert_that([msg.tags['SNI'] for msg in messages],
+                is_([b'a', b'b']))
+
+        def it_decodes_message_without_tags():
+            messages = MessageDecoder().feed(make_message({}))
+
+            assert_that(len(messages), is_(1))
+            assert_that(messages[0].tags, is_({}))
+
+        def it_raises_error_when_end_offsets_decrease():
+            data = bytearray(make_message({'SNI': 'ab', 'VER': 'Q034'}))
+            data[20:24] = (1).to_bytes(4, 'little')
+
+            assert_that(calling(MessageDecoder().feed).with_args(data),
+                raises(ValueError))
+
+        def it_raises_error_when_message_is_too_big():
+            data = make_message({'PAD': b'\x00' * 100})
+
+            assert_that(
+                calling(MessageDecoder(max_message_size=64).feed)\
+                    .with_args(data),
+                raises(ValueError))
+
+    def describe_message_length():
+        def it_is_known_once_tag_index_is_received():
+            data = make_message({'SNI': 'example.com', 'VER': 'Q034'})
+            decoder = MessageDecoder()
+
+            decoder.feed(data[:20])
+            assert_that(decoder.message_length, is_(None))
+            decoder.feed(data[20:24])
+
+            assert_that(decoder.message_length, is_(len(data)))
+
+    def describe_required_length():
+        def it_returns_number_of_bytes_missing_for_message():
+            data = make_message({'SNI': 'example.com'})
+            decoder = MessageDecoder()
+
+            decoder.feed(data[:18])
+
+            assert_that(decoder.required_length, is_(len(data) - 18))
+
+    def describe_when_buffer_pool_is_given():
+        def it_reuses_message_buffers():
+            pool = BufferPool(debug=True)
+            decoder = MessageDecoder(pool=pool)
+            data = make_message({'SNI': 'example.com'})
+
+            decoder.feed(data)
+            decoder.feed(data)
+
+            assert_that(pool.allocated, is_(1))
+            assert_that(len(pool.leaks()), is_(1))
@@ -1,6 +1,13 @@
-from hamcrest import assert_that, is_, has_length
+from hamcrest import assert_that, is_, has_length, has_entries, \
+    instance_of, calling, raises
 
-from quic.handshake import tag_at, int32_little_endian, tag_positions
+from quic.handshake import tag_at, int32_little_endian, tag_positions, \
+    decode_tag_values, MessageView
+
+
+MESSAGE = b'CHLO\x02\x00\x00\x00' \
+    b'SNI\x00\x03\x00\x00\x00VER\x00\x07\x00\x00\x00' \
+    b'abcQ034'
 
 
 def describe_tag_at():
@@ -31,3 +38,72 @@ def describe_tag_positions():
         positions = list(tag_positions(3))
 
         assert_that(positions, is_([8, 16, 24]))
+
+def describe_decode_tag_values():
+    def it_returns_tag_values_by_tag_name():
+        tag_values = decode_tag_values(MESSAGE)
+
+        assert_that(tag_values, has_entries({'SNI': b'abc', 'VER': b'Q034'}))
+
+    def it_returns_tag_values_as_memoryviews():
+        tag_values = decode_tag_values(MESSAGE)
+
+        assert_that(tag_values['SNI'], instance_of(memoryview))
+
+    def describe_when_message_is_truncated():
+        def it_raises_an_exception():
+            assert_that(calling(decode_tag_values).with_args(MESSAGE[:20]),
+                raises(ValueError))
+
+    def describe_when_tag_value_exceeds_message():
+        def it_raises_an_exception():
+            assert_that(calling(decode_tag_values).with_args(MESSAGE[:-1]),
+                raises(ValueError))
+
+    def describe_when_end_offsets_decrease():
+        def it_raises_an_exception():
+            message = MESSAGE[:20] + b'\x02' + MESSAGE[21:]
+
+            assert_that(calling(decode_tag_values).with_args(message),
+                raises(ValueError))
+
+def describe_message_view():
+    def it_decodes_message_tag():
+        assert_that(MessageView(MESSAGE).tag, is_(b'CHLO'))
+
+    def it_decodes_tag_count():
+        assert_that(MessageView(MESSAGE).tag_count, is_(2))
+
+    def it_looks_up_tag_values_by_tag_name():
+        msg = MessageView(MESSAGE)
+
+        assert_that(msg.tags['SNI'], is_(b'abc'))
+        assert_that(msg.tags['VER'], is_(b'Q034'))
+
+    def it_looks_up_tag_values_by_tag_number():
+        msg = MessageView(MESSAGE)
+
+        assert_that(msg.tags[0x00524556], is_(b'Q034'))
+
+    def it_iterates_over_tag_names_in_index_order():
+        assert_that(list(MessageView(MESSAGE).tags), is_(['SNI', 'VER']))
+
+    def it_raises_key_error_for_missing_tags():
+        msg = MessageView(MESSAGE)
+
+        assert_that(calling(msg.tags.__getitem__).with_args('PAD'),
+            raises(KeyError))
+
+    def describe_when_tag_index_is_not_sorted():
+        def it_raises_an_exception():
+            message = MESSAGE[:8] + MESSAGE[16:24] + MESSAGE[8:16] + MESSAGE[24:]
+
+            assert_that(calling(MessageView).with_args(message),
+                raises(ValueError))
+
+    def describe_when_tag_value_exceeds_message():
+        def it_raises_an_exception_on_access():
+            msg = MessageView(MESSAGE[:-1])
+
+            assert_that(calling(msg.tags.__getitem__).with_args('VER'),
+                raises(ValueError))
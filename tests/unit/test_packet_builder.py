@@ -0,0 +1,169 @@
+from hamcrest import assert_that, is_, calling, raises, same_instance
+import pytest
+
+from quic.buffers import BufferPool
+from quic.builder import PacketBuilder
+from quic.frames import iter_frames
+from quic.packet import ViewParser, PUBLIC_FLAG_VERSION, \
+    PUBLIC_FLAG_CONNECTION_ID_8_BYTES
+from quic.stream import ReassemblyBuffer
+
+
+CLIENT_FLAGS = PUBLIC_FLAG_VERSION | PUBLIC_FLAG_CONNECTION_ID_8_BYTES
+
+
+def parse(packet):
+    """Verifies packet hash and returns its frames."""
+    parser = ViewParser(packet)
+    header = parser.parse_public_header()
+    assert_that(parser.parse_packet_hash(), is_(parser.calc_packet_hash()))
+    return header, list(iter_frames(packet, parser.data_offset,
+        header.packet_number_length))
+
+
+@pytest.fixture
+def builder():
+    return PacketBuilder(0x0102030405060708, max_packet_size=100,
+        public_flags=CLIENT_FLAGS)
+
+
+def describe_packet_builder():
+    def describe_build():
+        def it_coalesces_frames_of_many_streams_into_one_packet(builder):
+            builder.add_stream_data(3, 0, b'first')
+            builder.add_stream_data(5, 10, b'second')
+            builder.add_frame(b'\x07')
+
+            packets = builder.build()
+
+            assert_that(len(packets), is_(1))
+            _, frames = parse(packets[0])
+            assert_that([frame.frame_type for frame in frames],
+                is_(['STREAM', 'STREAM', 'PING']))
+            assert_that(frames[0].id, is_(3))
+            assert_that(bytes(frames[0].data), is_(b'first'))
+            assert_that(frames[1].id, is_(5))
+            assert_that(frames[1].offset, is_(10))
+            assert_that(bytes(frames[1].data), is_(b'second'))
+
+        def it_splits_stream_data_across_packets(builder):
+            data = bytes(range(250))
+            builder.add_stream_data(1, 0, data, finish=True)
+
+            packets = builder.build()
+
+            buff = ReassemblyBuffer()
+            for packet in packets:
+                assert_that(len(packet) <= 100, is_(True))
+                _, frames = parse(packet)
+                for frame in frames:
+                    buff.write_frame(frame)
+            assert_that(len(packets), is_(4))
+            assert_that(buff.read(), is_(data))
+            assert_that(buff.at_eof, is_(True))
+
+        def it_fills_every_packet_but_the_last(builder):
+            builder.add_stream_data(1, 0, bytes(250))
+
+            packets = builder.build()
+
+            assert_that([len(packet) for packet in packets[:-1]],
+                is_([100] * (len(packets) - 1)))
+
+        @pytest.mark.parametrize('extra', [-1, 0, 1, 2])
+        def it_never_exceeds_max_packet_size_around_frame_capacity(builder,
+                extra):
+            # Room for frames in a packet: PING frame takes a single byte.
+            builder.add_frame(b'\x07')
+            available = 100 - len(builder.build()[0]) + 1
+            # Stream frame header with data length field takes 4 bytes.
+            data = bytes(range(available - 4 + extra))
+            builder.add_stream_data(1, 0, data, finish=True)
+
+            packets = builder.build()
+
+            buff = ReassemblyBuffer()
+            for packet in packets:
+                assert_that(len(packet) <= 100, is_(True))
+                assert_that(len(packet.obj), is_(100))
+                _, frames = parse(packet)
+                for frame in frames:
+                    buff.write_frame(frame)
+            assert_that(buff.read(), is_(data))
+            assert_that(buff.at_eof, is_(True))
+
+        def it_sends_stream_finish_without_data(builder):
+            builder.add_stream_data(1, 7, b'', finish=True)
+
+            _, frames = parse(builder.build()[0])
+
+            assert_that(frames[0].finish, is_(True))
+            assert_that(frames[0].offset, is_(7))
+
+        def it_pads_packets_when_asked(builder):
+            builder.add_stream_data(1, 0, b'CHLO')
+
+            packet = builder.build(pad=True)[0]
+
+            assert_that(len(packet), is_(100))
+            _, frames = parse(packet)
+            assert_that(frames[-1].frame_type, is_('PADDING'))
+
+        def it_increments_packet_number(builder):
+            builder.add_stream_data(1, 0, bytes(250))
+
+            packets = builder.build()
+
+            assert_that([parse(packet)[0].packet_number for packet in packets],
+                is_([1, 2, 3, 4]))
+            assert_that(builder.packet_number, is_(5))
+
+        def it_picks_packet_number_length_from_least_unacked(builder):
+            builder.header.packet_number = 1000
+            builder.least_unacked = 800
+            builder.add_frame(b'\x07')
+
+            header, _ = parse(builder.build()[0])
+
+            assert_that(header.packet_number_length, is_(2))
+            assert_that(header.packet_number, is_(1000))
+
+        def it_assembles_packets_in_pooled_buffers():
+            pool = BufferPool(100)
+            buff = pool.acquire(100)
+            pool.release(buff)
+            builder = PacketBuilder(1, pool, max_packet_size=100)
+            builder.add_frame(b'\x07')
+
+            packet = builder.build()[0]
+
+            assert_that(packet.obj, same_instance(buff))
+
+    def describe_add_stream_data():
+        def it_raises_error_when_frame_can_not_fit_into_a_packet():
+            # 31 bytes of packet overhead leave room for 9 bytes of frames.
+            builder = PacketBuilder(1, max_packet_size=40,
+                public_flags=CLIENT_FLAGS)
+
+            assert_that(calling(builder.add_stream_data).with_args(
+                0xffffffff, 1 << 56, b'data'), raises(ValueError))
+            assert_that(len(builder), is_(0))
+
+        def it_accepts_frames_with_a_single_byte_fitting_into_a_packet():
+            builder = PacketBuilder(1, max_packet_size=40,
+                public_flags=CLIENT_FLAGS)
+            builder.add_stream_data(0xffffffff, 1 << 8, bytes(range(20)))
+
+            packets = builder.build()
+
+            data = b''
+            for packet in packets:
+                assert_that(len(packet) <= 40, is_(True))
+                data += b''.join(bytes(frame.data)
+                    for frame in parse(packet)[1])
+            assert_that(data, is_(bytes(range(20))))
+
+    def describe_add_frame():
+        def it_raises_error_when_frame_can_not_fit_into_a_packet(builder):
+            assert_that(calling(builder.add_frame).with_args(bytes(80)),
+                raises(ValueError))
@@ -0,0 +1,65 @@
+from hamcrest import assert_that, is_
+import fnv
+
+from quic.packet import PacketHasher, hash_packet, verify_many, \
+    PACKET_HASH_MASK
+
+
+def describe_packet_hasher():
+    def it_calculates_96_bit_fnv1a_hash():
+        hasher = PacketHasher().update(b'some packet data')
+
+        assert_that(hasher.digest(),
+            is_(fnv.hash(b'some packet data') & PACKET_HASH_MASK))
+
+    def it_produces_the_same_hash_when_data_is_fed_in_chunks():
+        hasher = PacketHasher().update(b'some ').update(memoryview(b'packet '))\
+            .update(bytearray(b'data'))
+
+        assert_that(hasher.digest(),
+            is_(fnv.hash(b'some packet data') & PACKET_HASH_MASK))
+
+    def describe_update_zeros():
+        def it_hashes_a_run_of_zero_bytes():
+            hasher = PacketHasher().update(b'data').update_zeros(100)
+
+            assert_that(hasher.digest(),
+                is_(fnv.hash(b'data' + b'\x00' * 100) & PACKET_HASH_MASK))
+
+    def describe_copy():
+        def it_returns_independent_hasher_with_the_same_state():
+            hasher = PacketHasher().update(b'data')
+
+            copied = hasher.copy().update(b'more')
+
+            assert_that(hasher.digest(),
+                is_(fnv.hash(b'data') & PACKET_HASH_MASK))
+            assert_that(copied.digest(),
+                is_(fnv.hash(b'datamore') & PACKET_HASH_MASK))
+
+def describe_hash_packet():
+    def it_hashes_packet_without_the_hash_field():
+        packet = b'head' + b'\xff' * 12 + b'tail'
+
+        assert_that(hash_packet(packet, 4),
+            is_(fnv.hash(b'headtail') & PACKET_HASH_MASK))
+
+def make_packet(payload):
+    header = b'\x08\x01\x02\x03\x04\x05\x06\x07\x08Q025\x01'
+    packet_hash = fnv.hash(header + payload) & PACKET_HASH_MASK
+    return header + packet_hash.to_bytes(12, 'little') + payload
+
+
+def describe_verify_many():
+    def it_returns_true_for_packets_with_valid_hash():
+        results = verify_many([make_packet(b'data1'), make_packet(b'data2')])
+
+        assert_that(results, is_([True, True]))
+
+    def it_returns_false_for_corrupted_packets():
+        corrupted = make_packet(b'data')[:-1] + b'X'
+
+        assert_that(verify_many([corrupted]), is_([False]))
+
+    def it_returns_false_for_packets_too_short_to_hold_hash():
+        assert_that(verify_many([make_packet(b'')[:20]]), is_([False]))
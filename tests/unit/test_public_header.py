@@ -1,4 +1,4 @@
-from hamcrest import assert_that, is_
+from hamcrest import assert_that, is_, calling, raises
 import pytest
 
 from quic.packet import PublicHeader, PUBLIC_FLAG_VERSION, \
@@ -15,6 +15,16 @@ def describe_public_header():
 
                 assert_that(header.public_flags, is_(0x0d))
 
+        def it_accepts_header_fields_as_keyword_arguments():
+            header = PublicHeader(public_flags=PUBLIC_FLAG_VERSION,
+                connection_id=0x0102, protocol_version=b'Q035',
+                packet_number=5)
+
+            assert_that(header.public_flags, is_(PUBLIC_FLAG_VERSION))
+            assert_that(header.connection_id, is_(0x0102))
+            assert_that(header.protocol_version, is_(b'Q035'))
+            assert_that(header.packet_number, is_(5))
+
     def describe_version_set():
         @pytest.mark.parametrize('flags, expected_value', [
             (0, False),
@@ -56,3 +66,115 @@ def describe_public_header():
 
             assert_that(serialized,
                 is_(b'\x0d\x08\x07\x06\x05\x04\x03\x02\x01Q034\x01'))
+
+    def describe_write_into():
+        def it_writes_the_same_fields_as_to_bytes_for_default_header():
+            header = PublicHeader(connection_id=0x0102030405060708,
+                packet_number=1)
+            buff = bytearray(20)
+
+            written = header.write_into(buff, 2)
+
+            assert_that(written, is_(14))
+            assert_that(bytes(buff[3:16]), is_(header.to_bytes()[1:]))
+
+        def it_clears_diversification_nonce_flag_when_there_is_no_nonce():
+            header = PublicHeader(connection_id=0x0102030405060708,
+                packet_number=1)
+            buff = bytearray(14)
+
+            header.write_into(buff)
+
+            assert_that(buff[0], is_(header.public_flags
+                & ~PUBLIC_FLAG_DIVERSIFICATION_NONCE))
+            assert_that(header.public_flags
+                & PUBLIC_FLAG_DIVERSIFICATION_NONCE, is_(
+                    PUBLIC_FLAG_DIVERSIFICATION_NONCE))
+
+        def it_omits_connection_id_and_version_when_flags_are_not_set():
+            header = PublicHeader(
+                public_flags=PUBLIC_FLAG_PACKET_NUMBER_2_BYTE,
+                connection_id=0x0102, packet_number=0x0304)
+            buff = bytearray(3)
+
+            header.write_into(buff)
+
+            assert_that(bytes(buff), is_(b'\x10\x04\x03'))
+
+        def it_accepts_connection_id_as_bytes():
+            header = PublicHeader(
+                public_flags=PUBLIC_FLAG_CONNECTION_ID_8_BYTES,
+                connection_id=b'\x01\x02\x03\x04\x05\x06\x07\x08')
+            buff = bytearray(10)
+
+            header.write_into(buff)
+
+            assert_that(bytes(buff),
+                is_(b'\x08\x01\x02\x03\x04\x05\x06\x07\x08\x00'))
+
+        def it_writes_diversification_nonce_when_header_has_one():
+            header = PublicHeader(
+                public_flags=PUBLIC_FLAG_DIVERSIFICATION_NONCE,
+                diversification_nonces=[b'n' * 32], packet_number=7)
+            buff = bytearray(34)
+
+            written = header.write_into(buff)
+
+            assert_that(written, is_(34))
+            assert_that(bytes(buff), is_(b'\x04' + b'n' * 32 + b'\x07'))
+
+        def it_writes_6_byte_packet_number():
+            header = PublicHeader(
+                public_flags=PUBLIC_FLAG_PACKET_NUMBER_6_BYTE,
+                packet_number=0x010203040506)
+            buff = bytearray(7)
+
+            header.write_into(buff)
+
+            assert_that(bytes(buff), is_(b'\x30\x06\x05\x04\x03\x02\x01'))
+
+        @pytest.mark.parametrize(
+                'packet_number, least_unacked, expected_flag', [
+            (10, 1, PUBLIC_FLAG_PACKET_NUMBER_1_BYTE),
+            (300, 100, PUBLIC_FLAG_PACKET_NUMBER_2_BYTE),
+            (70000, 1, PUBLIC_FLAG_PACKET_NUMBER_4_BYTE),
+            (1 << 33, 1, PUBLIC_FLAG_PACKET_NUMBER_6_BYTE),
+        ])
+        def it_picks_the_smallest_packet_number_length_for_unacked_gap(
+                packet_number, least_unacked, expected_flag):
+            header = PublicHeader(
+                public_flags=PUBLIC_FLAG_VERSION
+                    | PUBLIC_FLAG_CONNECTION_ID_8_BYTES
+                    | PUBLIC_FLAG_PACKET_NUMBER_6_BYTE,
+                connection_id=1, packet_number=packet_number)
+            buff = bytearray(32)
+
+            written = header.write_into(buff, least_unacked=least_unacked)
+
+            assert_that(header.public_flags & 0x30, is_(expected_flag))
+            assert_that(written, is_(13 + header.packet_number_length))
+
+        def it_raises_error_when_buffer_is_too_small():
+            header = PublicHeader(connection_id=1)
+
+            assert_that(calling(header.write_into).with_args(bytearray(10)),
+                raises(ValueError))
+
+        @pytest.mark.parametrize('connection_id, protocol_version', [
+            (b'', b'Q034'),
+            (b'\x01' * 9, b'Q034'),
+            (1, b'Q03'),
+            (1, b'Q0345'),
+        ])
+        def it_raises_error_when_field_has_wrong_length(connection_id,
+                protocol_version):
+            header = PublicHeader(
+                public_flags=PUBLIC_FLAG_VERSION
+                    | PUBLIC_FLAG_CONNECTION_ID_8_BYTES,
+                connection_id=connection_id,
+                protocol_version=protocol_version)
+            buff = bytearray(32)
+
+            assert_that(calling(header.write_into).with_args(buff),
+                raises(ValueError))
+            assert_that(len(buff), is_(32))
@@ -106,6 +106,11 @@ def describe_parser():
 
                 assert_that(header.id, is_(0x0102))
 
+            def it_parses_stream_offset(parser):
+                header = parser.parse_stream_frame_header()
+
+                assert_that(header.offset, is_(0x2e2e))
+
             def it_parses_data_length(parser):
                 header = parser.parse_stream_frame_header()
 
@@ -137,3 +142,19 @@ def describe_bytes_excluded():
 def describe_frame_type():
     def it_returns_frame_type_from_first_byte_after_packet_hash():
         assert_that(frame_type(0xa0), is_('STREAM'))
+
+    @pytest.mark.parametrize('type_byte, expected_type', [
+        (0x00, 'PADDING'),
+        (0x01, 'RST_STREAM'),
+        (0x02, 'CONNECTION_CLOSE'),
+        (0x03, 'GOAWAY'),
+        (0x04, 'WINDOW_UPDATE'),
+        (0x05, 'BLOCKED'),
+        (0x06, 'STOP_WAITING'),
+        (0x07, 'PING'),
+        (0x40, 'ACK'),
+        (0x7f, 'ACK'),
+        (0x20, None),
+    ])
+    def it_recognises_all_frame_types(type_byte, expected_type):
+        assert_that(frame_type(type_byte), is_(expected_type))
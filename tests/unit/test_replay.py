@@ -0,0 +1,172 @@
+import struct
+
+from hamcrest import assert_that, is_, contains_exactly, calling, raises
+import pytest
+
+from quic.packet import PacketHasher
+from quic.replay import Capture, replay, write_raw_dump, FORMAT_PCAP, \
+    FORMAT_RAW, LINKTYPE_ETHERNET, LINKTYPE_RAW
+
+
+def make_packet(payload=b'\x00', public_flags=b'\x09'):
+    """Makes QUIC packet with version and valid packet hash."""
+    header = public_flags + b'\x01' * 8 + b'Q035' + b'\x01'
+    packet_hash = PacketHasher().update(header).update(payload).digest()
+    return header + packet_hash.to_bytes(12, 'little') + payload
+
+
+def udp_ipv4(payload):
+    udp = struct.pack('!HHHH', 1234, 443, 8 + len(payload), 0) + payload
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(udp), 0, 0x4000,
+        64, 17, 0, b'\x7f\x00\x00\x01', b'\x7f\x00\x00\x01') + udp
+
+
+def ethernet(ip_packet, ethertype=0x0800):
+    return b'\x00' * 12 + struct.pack('!H', ethertype) + ip_packet
+
+
+def write_pcap(path, frames, link_type=LINKTYPE_ETHERNET):
+    with open(str(path), 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535,
+            link_type))
+        for frame in frames:
+            f.write(struct.pack('<IIII', 0, 0, len(frame), len(frame)))
+            f.write(frame)
+
+
+def describe_capture():
+    def describe_datagrams():
+        def it_iterates_udp_payloads_of_ethernet_pcap(tmpdir):
+            path = tmpdir.join('capture.pcap')
+            write_pcap(path, [ethernet(udp_ipv4(b'first')),
+                ethernet(udp_ipv4(b'second'))])
+
+            with Capture(str(path)) as capture:
+                datagrams = [bytes(d) for d in capture.datagrams()]
+
+                assert_that(capture.format, is_(FORMAT_PCAP))
+            assert_that(datagrams, contains_exactly(b'first', b'second'))
+
+        def it_iterates_udp_payloads_of_raw_ip_pcap(tmpdir):
+            path = tmpdir.join('capture.pcap')
+            write_pcap(path, [udp_ipv4(b'data')], LINKTYPE_RAW)
+
+            with Capture(str(path)) as capture:
+                datagrams = [bytes(d) for d in capture.datagrams()]
+
+            assert_that(datagrams, contains_exactly(b'data'))
+
+        def it_skips_non_udp_frames(tmpdir):
+            path = tmpdir.join('capture.pcap')
+            write_pcap(path, [ethernet(b'\x00' * 28, 0x0806),
+                ethernet(udp_ipv4(b'data'))])
+
+            with Capture(str(path)) as capture:
+                datagrams = [bytes(d) for d in capture.datagrams()]
+
+            assert_that(datagrams, contains_exactly(b'data'))
+
+        def it_iterates_raw_dump_datagrams(tmpdir):
+            path = tmpdir.join('capture.raw')
+            with open(str(path), 'wb') as f:
+                write_raw_dump(f, [b'first', b'second'])
+
+            with Capture(str(path)) as capture:
+                datagrams = [bytes(d) for d in capture.datagrams()]
+
+                assert_that(capture.format, is_(FORMAT_RAW))
+            assert_that(datagrams, contains_exactly(b'first', b'second'))
+
+        def it_raises_error_when_record_is_truncated(tmpdir):
+            path = tmpdir.join('capture.raw')
+            path.write_binary(b'\x10\x00\x00\x00data')
+
+            with Capture(str(path)) as capture:
+                assert_that(calling(list).with_args(capture.datagrams()),
+                    raises(ValueError))
+
+    def describe_context_manager():
+        def it_does_not_mask_errors_with_views_still_referenced(tmpdir):
+            path = tmpdir.join('capture.raw')
+            with open(str(path), 'wb') as f:
+                write_raw_dump(f, [b'first'])
+
+            def read_and_fail():
+                with Capture(str(path)) as capture:
+                    datagram = next(capture.datagrams())
+                    raise RuntimeError(bytes(datagram))
+
+            assert_that(calling(read_and_fail), raises(RuntimeError))
+
+        def it_releases_consumed_datagram_views(tmpdir):
+            path = tmpdir.join('capture.raw')
+            with open(str(path), 'wb') as f:
+                write_raw_dump(f, [b'first', b'second'])
+
+            with Capture(str(path)) as capture:
+                datagrams = capture.datagrams()
+                first = next(datagrams)
+                next(datagrams)
+                datagrams.close()
+
+            assert_that(calling(len).with_args(first), raises(ValueError))
+
+    def describe_split():
+        @pytest.fixture
+        def path(tmpdir):
+            path = tmpdir.join('capture.raw')
+            with open(str(path), 'wb') as f:
+                write_raw_dump(f, [bytes([i]) * 10 for i in range(10)])
+            return str(path)
+
+        def it_splits_capture_on_record_boundaries(path):
+            with Capture(path) as capture:
+                ranges = capture.split(3)
+                datagrams = [bytes(d) for start, end in ranges
+                    for d in capture.datagrams(start, end)]
+
+            assert_that(len(ranges), is_(3))
+            assert_that(datagrams,
+                is_([bytes([i]) * 10 for i in range(10)]))
+
+        def it_returns_single_range_when_not_split(path):
+            with Capture(path) as capture:
+                assert_that(capture.split(1), is_([(0, 140)]))
+
+
+def describe_replay():
+    def it_counts_datagrams_and_bytes():
+        stats = replay([memoryview(make_packet()), memoryview(make_packet())])
+
+        assert_that(stats.datagrams, is_(2))
+        assert_that(stats.bytes, is_(2 * len(make_packet())))
+
+    def it_counts_datagrams_by_protocol_version():
+        stats = replay([memoryview(make_packet())])
+
+        assert_that(stats.versions, is_({'Q035': 1}))
+
+    def it_does_not_count_versions_of_packets_without_version_flag():
+        stats = replay([memoryview(make_packet(public_flags=b'\x08'))])
+
+        assert_that(stats.versions, is_({}))
+
+    def it_counts_packets_with_invalid_hash():
+        packet = bytearray(make_packet())
+        packet[-1] ^= 0xff
+
+        stats = replay([memoryview(packet)])
+
+        assert_that(stats.invalid_hashes, is_(1))
+
+    def it_counts_truncated_packets_as_invalid():
+        stats = replay([memoryview(b'\x09\x01')])
+
+        assert_that(stats.invalid_packets, is_(1))
+
+    def it_counts_malformed_handshake_messages():
+        stream_frame = b'\xa0\x01\x08\x00CHLO\x05\x00\x00\x00'
+
+        stats = replay([memoryview(make_packet(stream_frame))])
+
+        assert_that(stats.handshake_errors, is_(1))
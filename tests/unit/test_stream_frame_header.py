@@ -1,9 +1,16 @@
-from hamcrest import assert_that, is_
+from hamcrest import assert_that, is_, calling, raises
 
 from quic.packet import StreamFrameHeader
 
 
 def describe_stream_frame_header():
+    def describe_constructor():
+        def it_accepts_header_fields_as_keyword_arguments():
+            header = StreamFrameHeader(id=1, has_data_length=True,
+                data_length=1300, id_length=1)
+
+            assert_that(header.to_bytes(), is_(b'\xa0\x01\x14\x05'))
+
     def describe_to_bytes():
         def it_returns_serialized_frame_header_to_bytes():
             header = StreamFrameHeader()
@@ -17,3 +24,27 @@ def describe_stream_frame_header():
             serialized = header.to_bytes()
 
             assert_that(serialized, is_(b'\xa0\x01\x14\x05'))
+
+        def it_serializes_stream_offset_after_stream_id():
+            header = StreamFrameHeader(id=5, offset=0x0102, offset_length=2,
+                id_length=1)
+
+            assert_that(header.to_bytes(), is_(b'\x84\x05\x02\x01'))
+
+    def describe_write_into():
+        def it_writes_the_same_bytes_as_to_bytes():
+            header = StreamFrameHeader(id=0x0102, offset=0x030405,
+                offset_length=3, id_length=2, has_data_length=True,
+                data_length=1300, finish=True)
+            buff = bytearray(10)
+
+            written = header.write_into(buff, 1)
+
+            assert_that(written, is_(header.length))
+            assert_that(bytes(buff[1:1 + written]), is_(header.to_bytes()))
+
+        def it_raises_error_when_buffer_is_too_small():
+            header = StreamFrameHeader(id=1, id_length=1, has_data_length=True)
+
+            assert_that(calling(header.write_into).with_args(bytearray(3)),
+                raises(ValueError))
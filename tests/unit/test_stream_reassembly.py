@@ -0,0 +1,162 @@
+from hamcrest import assert_that, is_, calling, raises, instance_of
+
+from quic.packet import StreamFrameHeader, StreamFrameView
+from quic.stream import ReassemblyBuffer, MemoryBudget, BufferLimitExceeded
+
+
+def describe_reassembly_buffer():
+    def describe_write():
+        def it_makes_in_order_data_readable():
+            buff = ReassemblyBuffer()
+
+            buff.write(0, b'abc')
+            buff.write(3, b'def')
+
+            assert_that(buff.read(), is_(b'abcdef'))
+
+        def it_holds_out_of_order_data_until_gap_is_filled():
+            buff = ReassemblyBuffer()
+
+            buff.write(3, b'def')
+
+            assert_that(buff.readable, is_(0))
+            buff.write(0, b'abc')
+            assert_that(buff.read(), is_(b'abcdef'))
+
+        def it_buffers_only_the_bytes_not_received_yet():
+            buff = ReassemblyBuffer()
+            buff.write(2, b'cd')
+            buff.write(6, b'gh')
+
+            stored = buff.write(0, b'abcdefghij')
+
+            assert_that(stored, is_(6))
+            assert_that(buff.buffered, is_(10))
+            assert_that(buff.read(), is_(b'abcdefghij'))
+
+        def it_ignores_duplicates():
+            buff = ReassemblyBuffer()
+            buff.write(0, b'abcd')
+
+            assert_that(buff.write(1, b'bc'), is_(0))
+            assert_that(buff.buffered, is_(4))
+
+        def it_ignores_data_which_was_already_read():
+            buff = ReassemblyBuffer()
+            buff.write(0, b'abcd')
+            buff.read()
+
+            assert_that(buff.write(2, b'cdef'), is_(2))
+            assert_that(buff.read(), is_(b'ef'))
+
+        def it_accepts_stream_frame_views():
+            header = StreamFrameHeader(id=1, offset=3, offset_length=2,
+                id_length=1, has_data_length=True, data_length=3)
+            frame = StreamFrameView(memoryview(header.to_bytes() + b'def'), 0)
+            buff = ReassemblyBuffer()
+
+            buff.write(0, b'abc')
+            buff.write_frame(frame)
+
+            assert_that(buff.read(), is_(b'abcdef'))
+
+        def it_raises_error_when_data_exceeds_stream_window():
+            buff = ReassemblyBuffer(max_buffered=4)
+
+            assert_that(calling(buff.write).with_args(2, b'abc'),
+                raises(BufferLimitExceeded))
+            assert_that(buff.buffered, is_(0))
+
+        def describe_when_connection_budget_is_shared():
+            def it_reserves_buffered_bytes_from_budget():
+                budget = MemoryBudget(limit=10)
+                buff1 = ReassemblyBuffer(budget=budget)
+                buff2 = ReassemblyBuffer(budget=budget)
+
+                buff1.write(0, b'abcd')
+                buff2.write(5, b'efgh')
+
+                assert_that(budget.used, is_(8))
+
+            def it_raises_error_when_budget_is_exhausted():
+                budget = MemoryBudget(limit=4)
+                buff1 = ReassemblyBuffer(budget=budget)
+                buff2 = ReassemblyBuffer(budget=budget)
+                buff1.write(0, b'abc')
+
+                assert_that(calling(buff2.write).with_args(0, b'de'),
+                    raises(BufferLimitExceeded))
+
+            def it_returns_consumed_bytes_to_budget():
+                budget = MemoryBudget(limit=10)
+                buff = ReassemblyBuffer(budget=budget)
+                buff.write(0, b'abcd')
+
+                buff.read(3)
+
+                assert_that(budget.used, is_(1))
+
+    def describe_final_size():
+        def it_is_set_by_finishing_frame():
+            buff = ReassemblyBuffer()
+
+            buff.write(0, b'abc', finish=True)
+
+            assert_that(buff.final_size, is_(3))
+            assert_that(buff.at_eof, is_(False))
+            buff.read()
+            assert_that(buff.at_eof, is_(True))
+
+        def it_rejects_data_beyond_final_size():
+            buff = ReassemblyBuffer()
+            buff.write(0, b'abc', finish=True)
+
+            assert_that(calling(buff.write).with_args(2, b'cd'),
+                raises(ValueError))
+
+        def it_rejects_final_size_below_received_data():
+            buff = ReassemblyBuffer()
+            buff.write(4, b'ef')
+
+            assert_that(calling(buff.write).with_args(0, b'ab', True),
+                raises(ValueError))
+
+    def describe_peek():
+        def it_returns_contiguous_data_as_memoryviews():
+            buff = ReassemblyBuffer()
+            buff.write(0, b'ab')
+            buff.write(2, b'cd')
+            buff.write(6, b'gh')
+
+            views = buff.peek()
+
+            assert_that(views[0], instance_of(memoryview))
+            assert_that(b''.join(views), is_(b'abcd'))
+
+    def describe_consume():
+        def it_drops_partially_consumed_chunk_head():
+            buff = ReassemblyBuffer()
+            buff.write(0, b'abcd')
+
+            buff.consume(1)
+
+            assert_that(buff.read_offset, is_(1))
+            assert_that(b''.join(buff.peek()), is_(b'bcd'))
+
+        def it_raises_error_when_not_enough_data_is_available():
+            buff = ReassemblyBuffer()
+            buff.write(0, b'ab')
+            buff.write(3, b'd')
+
+            assert_that(calling(buff.consume).with_args(3), raises(ValueError))
+
+    def describe_clear():
+        def it_returns_buffered_bytes_to_budget():
+            budget = MemoryBudget()
+            buff = ReassemblyBuffer(budget=budget)
+            buff.write(3, b'def')
+
+            buff.clear()
+
+            assert_that(budget.used, is_(0))
+            assert_that(buff.buffered, is_(0))
@@ -1,4 +1,7 @@
-from hamcrest import assert_that, is_
+import copy
+import pickle
+
+from hamcrest import assert_that, is_, instance_of
 
 import quic.tags as tags
 
@@ -56,6 +59,39 @@ def describe_tags_container():
 
             assert_that(stored_tag_values, is_(['value2', 'value3', 'value1']))
 
+    def describe__delitem__():
+        def it_removes_tag_from_ordered_keys():
+            msg_tags = tags.Container({'V': 'value1', 'P': 'value2'})
+
+            del msg_tags['V']
+
+            assert_that(msg_tags.keys(), is_([0x50]))
+
+    def describe__contains__():
+        def it_accepts_tag_names():
+            msg_tags = tags.Container({'SNI': 'www.example.com'})
+
+            assert_that('SNI' in msg_tags, is_(True))
+            assert_that('VER' in msg_tags, is_(False))
+
+    def describe_update():
+        def it_keeps_tags_ordered():
+            msg_tags = tags.Container({'V': 'value1'})
+
+            msg_tags.update({'A': 'value2', 'P': 'value3'})
+
+            assert_that(msg_tags.items(),
+                is_([(0x41, 'value2'), (0x50, 'value3'), (0x56, 'value1')]))
+
+    def describe_items_cache():
+        def it_reflects_values_overwritten_after_iteration():
+            msg_tags = tags.Container({'V': 'value1'})
+            msg_tags.items()
+
+            msg_tags['V'] = 'value2'
+
+            assert_that(msg_tags.items(), is_([(0x56, 'value2')]))
+
     def describe_constructor():
         def describe_when_non_empty_dictionary_is_provided():
             def it_converts_dictionary_keys_into_ints_and_stores_the_values():
@@ -63,3 +99,80 @@ def describe_tags_container():
 
                 assert_that(msg_tags.items(),
                     is_([(0x31, 'value1'), (0x32, 'value2')]))
+
+
+def describe_tag_number():
+    def it_converts_tag_name_to_little_endian_int():
+        assert_that(tags.tag_number('SNI'), is_(0x00494e53))
+
+    def it_returns_ints_unchanged():
+        assert_that(tags.tag_number(0x00494e53), is_(0x00494e53))
+
+def describe_tag_name():
+    def it_converts_tag_number_to_tag_name_without_trailing_zeroes():
+        assert_that(tags.tag_name(0x00494e53), is_('SNI'))
+
+def describe_well_known_tags():
+    def it_provides_precomputed_tag_numbers():
+        assert_that(tags.SNI, is_(tags.tag_number('SNI')))
+        assert_that(tags.PDMD, is_(0x444d4450))
+
+    def it_converts_them_back_to_names():
+        assert_that(tags.tag_name(tags.VER), is_('VER'))
+
+
+def describe_tags_container_copies():
+    def it_copies_tags_independently():
+        msg_tags = tags.Container({'SNI': 'a', 'VER': 'b'})
+
+        tags_copy = copy.copy(msg_tags)
+        tags_copy['SNI'] = 'c'
+        tags_copy['PAD'] = 'd'
+
+        assert_that(msg_tags.keys(), is_([tags.SNI, tags.VER]))
+        assert_that(tags_copy.keys(), is_([tags.PAD, tags.SNI, tags.VER]))
+        assert_that(msg_tags['SNI'], is_('a'))
+
+    def it_copies_with_copy_method():
+        msg_tags = tags.Container({'VER': 'b'})
+
+        tags_copy = msg_tags.copy()
+        tags_copy['SNI'] = 'a'
+
+        assert_that(tags_copy, is_(instance_of(tags.Container)))
+        assert_that(msg_tags.keys(), is_([tags.VER]))
+        assert_that(tags_copy.keys(), is_([tags.SNI, tags.VER]))
+
+    def it_deep_copies_values():
+        msg_tags = tags.Container({'SNI': ['a']})
+
+        tags_copy = copy.deepcopy(msg_tags)
+        tags_copy['SNI'].append('b')
+
+        assert_that(msg_tags['SNI'], is_(['a']))
+        assert_that(tags_copy.keys(), is_([tags.SNI]))
+
+    def it_survives_pickling():
+        msg_tags = tags.Container({'VER': b'Q034', 'SNI': b'example.com'})
+
+        unpickled = pickle.loads(pickle.dumps(msg_tags))
+        unpickled['PAD'] = b'-'
+
+        assert_that(unpickled.items(), is_([(tags.PAD, b'-'),
+            (tags.SNI, b'example.com'), (tags.VER, b'Q034')]))
+
+    def it_keeps_tags_ordered_when_merged():
+        msg_tags = tags.Container({'VER': 'b'})
+
+        merged = msg_tags | {'SNI': 'a'}
+        msg_tags |= {'PAD': 'c'}
+
+        assert_that(merged.keys(), is_([tags.SNI, tags.VER]))
+        assert_that(msg_tags.keys(), is_([tags.PAD, tags.VER]))
+
+    def it_keeps_tags_ordered_on_setdefault():
+        msg_tags = tags.Container({'VER': 'b'})
+
+        msg_tags.setdefault('SNI', 'a')
+
+        assert_that(msg_tags.keys(), is_([tags.SNI, tags.VER]))
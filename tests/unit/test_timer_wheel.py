@@ -0,0 +1,198 @@
+import asyncio
+import operator
+import random
+
+from hamcrest import assert_that, is_, calling, raises
+
+from quic.timers import TimerWheel
+
+
+class CountingWheel(TimerWheel):
+    """Counts how many times the event loop woke the wheel up."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wakeups = 0
+
+    def _on_wake(self):
+        self.wakeups += 1
+        super()._on_wake()
+
+
+def describe_TimerWheel():
+    def it_fires_timers_once_they_are_due(clock):
+        wheel = TimerWheel(clock=clock)
+        fired = []
+        wheel.call_at(0.005, fired.append, 'a')
+
+        wheel.advance(0.004)
+        assert_that(fired, is_([]))
+        wheel.advance(0.005)
+        assert_that(fired, is_(['a']))
+
+    def it_fires_timers_in_deadline_order_across_levels(clock):
+        wheel = TimerWheel(clock=clock, slots=4, levels=3)
+        fired = []
+        for deadline in (0.050, 0.003, 0.020, 0.007, 0.063, 0.100):
+            wheel.call_at(deadline, fired.append, deadline)
+
+        assert_that(wheel.advance(0.2), is_(6))
+        assert_that(fired, is_([0.003, 0.007, 0.020, 0.050, 0.063, 0.100]))
+
+    def it_fires_every_timer_on_its_deadline_tick(clock):
+        wheel = TimerWheel(clock=clock, slots=8, levels=2)
+        fired = []
+        for ms in range(7, 300, 7):
+            wheel.call_at(ms / 1000, lambda ms=ms: fired.append(
+                (ms, clock.now)))
+
+        for tick in range(301):
+            clock.now = tick / 1000
+            wheel.advance()
+
+        assert_that([ms for ms, _ in fired], is_(list(range(7, 300, 7))))
+        assert_that([now for _, now in fired],
+            is_([ms / 1000 for ms, _ in fired]))
+
+    def it_fires_timers_on_the_first_advance_past_their_deadline(clock):
+        rand = random.Random(7)
+        wheel = TimerWheel(clock=clock, slots=4, levels=3)
+        deadlines = [rand.randrange(1, 400) for _ in range(200)]
+        fired = {}
+        for i, deadline in enumerate(deadlines):
+            wheel.call_at(deadline / 1000, fired.__setitem__, i, None)
+
+        steps = []
+        while clock.now < 0.4:
+            clock.now = round(clock.now + rand.randrange(1, 30) / 1000, 3)
+            wheel.advance()
+            steps.append(clock.now)
+            for i in fired:
+                if fired[i] is None:
+                    fired[i] = clock.now
+
+        assert_that(fired, is_({i: min(step for step in steps
+            if step >= deadline / 1000)
+            for i, deadline in enumerate(deadlines)}))
+
+    def it_schedules_relative_to_the_clock(clock):
+        wheel = TimerWheel(clock=clock)
+        clock.now = 1.0
+        fired = []
+        wheel.call_later(0.01, fired.append, 1)
+
+        wheel.advance(1.009)
+        assert_that(fired, is_([]))
+        wheel.advance(1.01)
+        assert_that(fired, is_([1]))
+
+    def it_does_not_fire_cancelled_timers(clock):
+        wheel = TimerWheel(clock=clock)
+        fired = []
+        timer = wheel.call_at(0.002, fired.append, 1)
+
+        timer.cancel()
+        wheel.advance(1)
+
+        assert_that(fired, is_([]))
+        assert_that(len(wheel), is_(0))
+
+    def it_fires_timers_in_the_past_on_the_next_advance(clock):
+        wheel = TimerWheel(clock=clock)
+        wheel.advance(1)
+        fired = []
+
+        wheel.call_at(0.5, fired.append, 1)
+        wheel.advance(1.001)
+
+        assert_that(fired, is_([1]))
+
+    def it_fires_timers_scheduled_from_callbacks_on_later_ticks(clock):
+        wheel = TimerWheel(clock=clock)
+        fired = []
+        wheel.call_at(0.001, lambda: wheel.call_at(0.001, fired.append, 1))
+
+        wheel.advance(0.001)
+        assert_that(fired, is_([]))
+        wheel.advance(0.002)
+        assert_that(fired, is_([1]))
+
+    def it_keeps_timers_beyond_wheel_span(clock):
+        wheel = TimerWheel(clock=clock, slots=4, levels=2)
+        fired = []
+        wheel.call_at(0.1, fired.append, 1)
+
+        wheel.advance(0.099)
+        assert_that(fired, is_([]))
+        wheel.advance(0.1)
+        assert_that(fired, is_([1]))
+
+    def it_counts_active_timers(clock):
+        wheel = TimerWheel(clock=clock)
+        timers = [wheel.call_at(0.01 * i, print) for i in range(1, 4)]
+        timers[0].cancel()
+
+        assert_that(len(wheel), is_(2))
+
+    def it_keeps_firing_slot_timers_after_callback_raises(clock):
+        wheel = TimerWheel(clock=clock)
+        fired = []
+        wheel.call_at(0.001, operator.truediv, 1, 0)
+        wheel.call_at(0.001, fired.append, 1)
+
+        assert_that(calling(wheel.advance).with_args(0.001),
+            raises(ZeroDivisionError))
+        wheel.advance(0.002)
+
+        assert_that(fired, is_([1]))
+        assert_that(len(wheel), is_(0))
+
+    def it_raises_error_when_number_of_slots_is_not_power_of_2():
+        assert_that(calling(TimerWheel).with_args(slots=10),
+            raises(ValueError))
+
+    def it_is_driven_by_event_loop_once_started():
+        async def main():
+            wheel = TimerWheel()
+            wheel.start()
+            fired = asyncio.Event()
+            wheel.call_later(0.005, fired.set)
+            await asyncio.wait_for(fired.wait(), 1)
+            wheel.stop()
+            return len(wheel)
+
+        assert_that(asyncio.run(main()), is_(0))
+
+    def it_sleeps_until_the_earliest_timer():
+        async def main():
+            wheel = CountingWheel()
+            wheel.start()
+            fired = asyncio.Event()
+            wheel.call_later(0.2, print)
+            wheel.call_later(0.05, fired.set)
+            await asyncio.wait_for(fired.wait(), 1)
+            wheel.stop()
+            return wheel.wakeups
+
+        # Event loop may wake the wheel a bit too early once.
+        assert_that(asyncio.run(main()) <= 2, is_(True))
+
+    def it_reports_callback_errors_to_event_loop():
+        async def main():
+            errors = []
+            loop = asyncio.get_running_loop()
+            loop.set_exception_handler(
+                lambda loop, context: errors.append(context['exception']))
+            wheel = TimerWheel()
+            wheel.start()
+            fired = asyncio.Event()
+            wheel.call_later(0.005, operator.truediv, 1, 0)
+            wheel.call_later(0.005, fired.set)
+            await asyncio.wait_for(fired.wait(), 1)
+            wheel.stop()
+            return errors, len(wheel)
+
+        errors, active = asyncio.run(main())
+
+        assert_that([type(e) for e in errors], is_([ZeroDivisionError]))
+        assert_that(active, is_(0))
@@ -0,0 +1,100 @@
+from hamcrest import assert_that, is_, calling, raises
+
+from quic.versions import VersionRegistry, version_number, ACCEPT, \
+    NEGOTIATE, DROP
+
+
+CONNECTION_ID = b'\x01\x02\x03\x04\x05\x06\x07\x08'
+
+
+def describe_version_number():
+    def it_decodes_version_tag_as_little_endian_integer():
+        assert_that(version_number(b'Q035'), is_(0x35333051))
+
+
+def describe_version_registry():
+    def describe_constructor():
+        def it_rejects_invalid_version_tags():
+            assert_that(calling(VersionRegistry).with_args([b'Q03']),
+                raises(ValueError))
+
+        def it_requires_at_least_one_version():
+            assert_that(calling(VersionRegistry).with_args([]),
+                raises(ValueError))
+
+    def describe_preferred():
+        def it_returns_the_first_version():
+            versions = VersionRegistry([b'Q035', b'Q034'])
+
+            assert_that(versions.preferred, is_(b'Q035'))
+
+        def it_prefers_q034_by_default():
+            assert_that(VersionRegistry().preferred, is_(b'Q034'))
+
+    def describe_is_supported():
+        def it_returns_true_for_registered_versions():
+            versions = VersionRegistry([b'Q034', b'Q035'])
+
+            assert_that(versions.is_supported(b'Q035'), is_(True))
+            assert_that(versions.is_supported(b'Q036'), is_(False))
+
+    def describe_classify():
+        def it_accepts_supported_version():
+            versions = VersionRegistry([b'Q035'])
+
+            verdict = versions.classify(b'\x09' + CONNECTION_ID + b'Q035\x01')
+
+            assert_that(verdict, is_(ACCEPT))
+
+        def it_negotiates_unsupported_version():
+            versions = VersionRegistry([b'Q035'])
+
+            verdict = versions.classify(b'\x09' + CONNECTION_ID + b'Q099\x01')
+
+            assert_that(verdict, is_(NEGOTIATE))
+
+        def it_locates_version_of_packets_without_connection_id():
+            versions = VersionRegistry([b'Q035'])
+
+            assert_that(versions.classify(b'\x01Q035\x01'), is_(ACCEPT))
+            assert_that(versions.classify(b'\x01Q099\x01'), is_(NEGOTIATE))
+            assert_that(versions.classify(b'\x01Q0'), is_(DROP))
+
+        def it_accepts_packets_without_version():
+            versions = VersionRegistry([b'Q035'])
+
+            verdict = versions.classify(b'\x08' + CONNECTION_ID + b'\x01')
+
+            assert_that(verdict, is_(ACCEPT))
+
+        def it_drops_packets_too_short_to_hold_version():
+            versions = VersionRegistry([b'Q035'])
+
+            assert_that(versions.classify(b'\x09' + CONNECTION_ID + b'Q0'),
+                is_(DROP))
+            assert_that(versions.classify(b'\x09\x01'), is_(DROP))
+
+        def it_drops_packets_with_reserved_flag_set():
+            versions = VersionRegistry([b'Q035'])
+
+            verdict = versions.classify(b'\x89' + CONNECTION_ID + b'Q035\x01')
+
+            assert_that(verdict, is_(DROP))
+
+    def describe_negotiation_reply():
+        def it_lists_supported_versions_for_client_connection_id():
+            versions = VersionRegistry([b'Q035', b'Q034'])
+
+            reply = versions.negotiation_reply(
+                b'\x09' + CONNECTION_ID + b'Q099\x01')
+
+            assert_that(bytes(reply),
+                is_(b'\x09' + CONNECTION_ID + b'Q035Q034'))
+
+        def it_zeroes_connection_id_when_client_sent_none():
+            versions = VersionRegistry([b'Q035'])
+            versions.negotiation_reply(b'\x09' + CONNECTION_ID + b'Q099\x01')
+
+            reply = versions.negotiation_reply(b'\x01Q099\x01')
+
+            assert_that(bytes(reply), is_(b'\x09' + bytes(8) + b'Q035'))
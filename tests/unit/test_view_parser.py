@@ -0,0 +1,73 @@
+from hamcrest import assert_that, is_, instance_of
+import pytest
+
+from quic.packet import ViewParser
+
+
+def describe_view_parser():
+    @pytest.fixture
+    def parser():
+        data = b'\x08\x01\x02\x03\x04\x05\x06\x07\x08Q025' \
+            b'\x01\x12\x11\x10\x09\x08\x07\x06\x05\x04\x03\x02\x01' \
+            b'\xa5\x02\x01..\x05\x00data!...'
+        return ViewParser(data)
+
+    def describe_parse_public_header():
+        def it_returns_connection_id_as_memoryview(parser):
+            header = parser.parse_public_header()
+
+            assert_that(header.connection_id, instance_of(memoryview))
+            assert_that(header.connection_id,
+                is_(b'\x01\x02\x03\x04\x05\x06\x07\x08'))
+
+        def it_returns_protocol_version_as_memoryview(parser):
+            header = parser.parse_public_header()
+
+            assert_that(header.protocol_version, instance_of(memoryview))
+            assert_that(header.protocol_version, is_(b'Q025'))
+
+    def describe_parse_stream_frame_header():
+        @pytest.fixture
+        def frame(parser):
+            parser.parse_public_header()
+            parser.parse_packet_hash()
+            return parser.parse_stream_frame_header()
+
+        def it_decodes_frame_header_fields_lazily(frame):
+            assert_that(frame.finish, is_(False))
+            assert_that(frame.has_data_length, is_(True))
+            assert_that(frame.offset_length, is_(2))
+            assert_that(frame.id_length, is_(2))
+            assert_that(frame.id, is_(0x0102))
+            assert_that(frame.data_length, is_(5))
+
+        def it_decodes_stream_offset(frame):
+            assert_that(frame.offset, is_(0x2e2e))
+
+        def it_advances_data_offset_to_stream_data(parser, frame):
+            assert_that(parser.data_offset, is_(33))
+
+        def it_returns_stream_data_as_memoryview(frame):
+            assert_that(frame.data, instance_of(memoryview))
+            assert_that(frame.data, is_(b'data!'))
+
+        def it_copies_stream_data_on_request(frame):
+            assert_that(frame.data_bytes(), is_(b'data!'))
+
+        def describe_when_data_length_is_not_present():
+            def it_returns_data_till_the_end_of_packet():
+                parser = ViewParser(b'\x08\x01\x02\x03\x04\x05\x06\x07\x08Q025'
+                    b'\x01\x12\x11\x10\x09\x08\x07\x06\x05\x04\x03\x02\x01'
+                    b'\x80\x01data')
+                parser.parse_public_header()
+                parser.parse_packet_hash()
+
+                frame = parser.parse_stream_frame_header()
+
+                assert_that(frame.data, is_(b'data'))
+
+    def describe_payload():
+        def it_returns_data_from_current_offset(parser):
+            parser.parse_public_header()
+
+            assert_that(parser.payload()[:1], is_(b'\x12'))